@@ -0,0 +1,69 @@
+import mmap
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+import numpy as np
+
+# "[<UTC time>] <src ip> → <dst ip> <protocol> <length>" as written by tshark -t ud -T text and by
+# convert_app.py's native decoder. Time and length are optional so older logs still count packets.
+ROUTE_PATTERN = re.compile(rb'(?:(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d(?:\.\d+)?) +)?'
+                           rb'(\d+\.\d+\.\d+\.\d+) \xe2\x86\x92 (\d+\.\d+\.\d+\.\d+)(?: \S+ (\d+))?')
+
+CHUNK_SIZE = 64 * 1024 * 1024
+
+def accumulate(matches, resolver, pod_count, packets, traffic):
+    # resolver maps IP bytes (and packet times) to pod row/column indices; see ip_index.py.
+    timestamps = np.array([match[0].decode() or "NaT" for match in matches], dtype="datetime64[us]")
+    src = resolver.resolve([match[1] for match in matches], timestamps)
+    dst = resolver.resolve([match[2] for match in matches], timestamps)
+    lengths = np.fromiter((int(match[3] or 0) for match in matches), dtype=np.int64, count=len(matches))
+    known = (src >= 0) & (dst >= 0)
+    cells = src[known] * pod_count + dst[known]
+    size = pod_count * pod_count
+    packets += np.bincount(cells, minlength=size)
+    traffic += np.bincount(cells, weights=lengths[known], minlength=size).astype(np.int64)
+
+def build_file_matrix(filename, resolver, pod_count, chunk_size=CHUNK_SIZE):
+    # Returns flat (packets, bytes) int64 arrays of length pod_count**2 for one log file, where
+    # cell src * pod_count + dst counts packets from src to dst. The file is scanned over an mmap
+    # in newline-aligned chunks, so memory stays bounded by the chunk size.
+    packets = np.zeros(pod_count * pod_count, dtype=np.int64)
+    traffic = np.zeros(pod_count * pod_count, dtype=np.int64)
+    if os.path.getsize(filename) == 0:
+        return packets, traffic
+    with open(filename, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        start = 0
+        while start < len(data):
+            end = data.find(b'\n', min(start + chunk_size, len(data)))
+            end = len(data) if end == -1 else end + 1
+            matches = ROUTE_PATTERN.findall(data, start, end)
+            if matches:
+                accumulate(matches, resolver, pod_count, packets, traffic)
+            start = end
+    return packets, traffic
+
+def build_matrix(filenames, resolver, workers=None):
+    # Builds the pod x pod packet and byte matrices over all files, one file per worker process,
+    # and merges the partial matrices as they complete. At most two files per worker are in
+    # flight, since every partial is a full pod x pod matrix. Returns (pods, packets, bytes) with
+    # matrix[src, dst].
+    pods = resolver.pods
+    pod_count = len(pods)
+    packets = np.zeros(pod_count * pod_count, dtype=np.int64)
+    traffic = np.zeros(pod_count * pod_count, dtype=np.int64)
+    if pod_count and filenames:
+        workers = min(workers or os.cpu_count(), len(filenames))
+        pending = iter(filenames)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            in_flight = {executor.submit(build_file_matrix, filename, resolver, pod_count)
+                         for filename in islice(pending, 2 * workers)}
+            while in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_packets, file_traffic = future.result()
+                    packets += file_packets
+                    traffic += file_traffic
+                in_flight |= {executor.submit(build_file_matrix, filename, resolver, pod_count)
+                              for filename in islice(pending, len(done))}
+    return pods, packets.reshape(pod_count, pod_count), traffic.reshape(pod_count, pod_count)
@@ -0,0 +1,191 @@
+import json
+import os
+import re
+import numpy as np
+import networkx as nx
+import matplotlib.pyplot as plt
+
+# <deployment>-<replicaset hash>-<pod suffix> and <statefulset>-<ordinal>.
+REPLICA_PATTERNS = [re.compile(r'^(.+)-[a-z0-9]{6,10}-[a-z0-9]{5}$'), re.compile(r'^(.+)-\d+$')]
+
+# Above these sizes the per-element decorations cost more than they show.
+ARROW_LIMIT = 200
+NODE_LABEL_LIMIT = 150
+EDGE_LABEL_LIMIT = 50
+
+def workload_name(pod_name):
+    for pattern in REPLICA_PATTERNS:
+        match = pattern.match(pod_name)
+        if match:
+            return match.group(1)
+    return pod_name
+
+def aggregate_replicas(pods, matrix):
+    # Sums the rows and columns of replicas of the same Deployment/StatefulSet. Traffic between
+    # replicas of one workload becomes a self-loop, which is dropped.
+    groups = sorted({workload_name(pod) for pod in pods})
+    group_index = {group: i for i, group in enumerate(groups)}
+    members = np.array([group_index[workload_name(pod)] for pod in pods], dtype=np.int64)
+    aggregated = np.zeros((len(groups), len(groups)), dtype=matrix.dtype)
+    np.add.at(aggregated, (members[:, None], members[None, :]), matrix)
+    np.fill_diagonal(aggregated, 0)
+    return groups, aggregated
+
+def prune_edges(pods, matrix, top_k=None, min_weight=None):
+    # [(src, dst, weight)] for the nonzero cells, heaviest first, keeping those of at least
+    # min_weight and then at most top_k of them.
+    src, dst = matrix.nonzero()
+    weights = matrix[src, dst]
+    keep = np.ones(len(weights), dtype=bool) if min_weight is None else weights >= min_weight
+    src, dst, weights = src[keep], dst[keep], weights[keep]
+    order = np.argsort(-weights, kind="stable")[:top_k]
+    return [(pods[i], pods[j], weights[n].item()) for n, i, j in zip(order, src[order], dst[order])]
+
+def repulsion(pos, k, cells=32, exact_limit=500):
+    # Fruchterman-Reingold repulsion k^2 / d along each pair. Up to exact_limit nodes every pair is
+    # summed, in blocks to bound memory; above it nodes are bucketed into a cells x cells grid and
+    # each node is pushed by the centroid of every cell (its own cell's excluding itself), the
+    # one-level Barnes-Hut approximation, so an iteration is O(V * cells^2) instead of O(V^2).
+    force = np.zeros_like(pos)
+    if len(pos) <= exact_limit:
+        for start in range(0, len(pos), 512):
+            delta = pos[start:start + 512, None, :] - pos[None, :, :]
+            distance2 = np.maximum((delta ** 2).sum(axis=2), 1e-9)
+            force[start:start + 512] = (delta * (k * k / distance2)[:, :, None]).sum(axis=1)
+        return force
+    low = pos.min(axis=0)
+    size = np.maximum(pos.max(axis=0) - low, 1e-9)
+    cell_xy = np.minimum(((pos - low) / size * cells).astype(np.int64), cells - 1)
+    cell = cell_xy[:, 0] * cells + cell_xy[:, 1]
+    counts = np.bincount(cell, minlength=cells * cells).astype(float)
+    sums = np.stack([np.bincount(cell, weights=pos[:, axis], minlength=cells * cells) for axis in (0, 1)], axis=1)
+    occupied = counts > 0
+    centroids, masses = sums[occupied] / counts[occupied, None], counts[occupied]
+    own = np.cumsum(occupied) - 1
+    for start in range(0, len(pos), 4096):
+        block = slice(start, start + 4096)
+        delta = pos[block, None, :] - centroids[None, :, :]
+        distance2 = np.maximum((delta ** 2).sum(axis=2), 1e-9)
+        block_masses = np.broadcast_to(masses, distance2.shape).copy()
+        rows = np.arange(len(distance2))
+        own_cell = own[cell[block]]
+        # The own cell is replaced by the centroid of its other members.
+        others = block_masses[rows, own_cell] - 1
+        other_centroid = (sums[cell[block]] - pos[block]) / np.maximum(others, 1)[:, None]
+        delta[rows, own_cell] = pos[block] - other_centroid
+        distance2[rows, own_cell] = np.maximum((delta[rows, own_cell] ** 2).sum(axis=1), 1e-9)
+        block_masses[rows, own_cell] = others
+        force[block] = (delta * (block_masses * k * k / distance2)[:, :, None]).sum(axis=1)
+    return force
+
+def force_layout(graph, pos=None, fixed=(), iterations=50, seed=42):
+    # Fruchterman-Reingold over numpy arrays (see repulsion), with edge attraction weighted by
+    # log weight. Nodes in fixed keep their position from pos; the others start there if given.
+    nodes = list(graph)
+    if not nodes:
+        return {}
+    index = {node: i for i, node in enumerate(nodes)}
+    rng = np.random.default_rng(seed)
+    coordinates = rng.random((len(nodes), 2))
+    for node, xy in (pos or {}).items():
+        if node in index:
+            coordinates[index[node]] = xy
+    movable = np.array([node not in fixed for node in nodes])
+    edges = [(index[u], index[v], np.log1p(data.get("weight", 1))) for u, v, data in graph.edges(data=True) if u != v]
+    src = np.array([u for u, _, _ in edges], dtype=np.int64)
+    dst = np.array([v for _, v, _ in edges], dtype=np.int64)
+    weights = np.array([w for _, _, w in edges], dtype=float)
+    if len(weights):
+        weights /= weights.mean()
+
+    k = 1 / np.sqrt(len(nodes))
+    temperature = 0.1 * max(np.ptp(coordinates, axis=0).max(), 1)
+    cooling = temperature / (iterations + 1)
+    for _ in range(iterations):
+        if not movable.any():
+            break
+        force = repulsion(coordinates, k)
+        delta = coordinates[src] - coordinates[dst]
+        distance = np.maximum(np.sqrt((delta ** 2).sum(axis=1)), 1e-9)
+        pull = delta * (distance * weights / k)[:, None]
+        np.subtract.at(force, src, pull)
+        np.add.at(force, dst, pull)
+        length = np.maximum(np.sqrt((force ** 2).sum(axis=1)), 1e-9)
+        step = force * (np.minimum(length, temperature) / length)[:, None]
+        coordinates[movable] += step[movable]
+        temperature -= cooling
+    return {node: coordinates[i] for i, node in enumerate(nodes)}
+
+def load_layout(cache_path):
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path, 'r') as f:
+            return {node: np.array(xy) for node, xy in json.load(f).items()}
+    return {}
+
+def save_layout(cache_path, positions):
+    temp_path = cache_path + ".tmp"
+    with open(temp_path, 'w') as f:
+        json.dump({node: [float(x), float(y)] for node, (x, y) in positions.items()}, f)
+    os.replace(temp_path, cache_path)
+
+def cached_layout(graph, cache_path=None, iterations=50, seed=42):
+    # Nodes already in the cache keep their positions, so repeated runs are stable and only new
+    # nodes are laid out (none at all when the graph has not changed). Positions of nodes missing
+    # from this graph stay in the cache for later runs.
+    cached = load_layout(cache_path)
+    known = {node for node in graph if node in cached}
+    if len(known) == len(graph):
+        positions = {node: cached[node] for node in graph}
+    else:
+        positions = force_layout(graph, cached, fixed=known, iterations=iterations, seed=seed)
+    if cache_path:
+        save_layout(cache_path, dict(cached, **positions))
+    return positions
+
+def draw_graph(graph, pos, output_file=None, figsize=(14, 10)):
+    # Writes to output_file (format from its extension, e.g. .png or .svg) without needing a
+    # display, or shows a window when output_file is None.
+    if output_file is not None:
+        plt.switch_backend("Agg")
+    fig = plt.figure(figsize=figsize)
+    nodes, edges = graph.number_of_nodes(), graph.number_of_edges()
+    weights = np.array([data["weight"] for _, _, data in graph.edges(data=True)], dtype=float)
+    widths = 0.5 + 2.5 * np.log1p(weights) / np.log1p(weights.max()) if edges else 1
+    node_size = 500 if nodes <= NODE_LABEL_LIMIT else max(20, 500 * NODE_LABEL_LIMIT // nodes)
+
+    nx.draw_networkx_nodes(graph, pos, node_size=node_size, node_color="lightblue")
+    if edges <= ARROW_LIMIT:
+        nx.draw_networkx_edges(graph, pos, width=widths, node_size=node_size,
+                               arrows=True, arrowstyle='-|>', arrowsize=8)
+    else:
+        # One LineCollection instead of a patch per edge.
+        nx.draw_networkx_edges(graph, pos, width=widths, alpha=0.4, arrows=False)
+
+    if nodes <= NODE_LABEL_LIMIT:
+        pos_labels = {node: (coords[0], coords[1] - 0.03) for node, coords in pos.items()}
+        nx.draw_networkx_labels(graph, pos_labels, labels={node: node for node in graph.nodes()},
+                                font_size=10, font_weight="bold",
+                                verticalalignment='top', horizontalalignment='center')
+    if edges <= EDGE_LABEL_LIMIT:
+        edge_labels = {(u, v): d['weight'] for u, v, d in graph.edges(data=True)}
+        nx.draw_networkx_edge_labels(graph, pos, edge_labels=edge_labels, label_pos=0.5, font_size=9,
+                                     bbox=dict(facecolor='white', edgecolor='none', alpha=0.7))
+    plt.axis("off")
+
+    if output_file is None:
+        plt.show()
+    else:
+        fig.savefig(output_file, bbox_inches="tight")
+        plt.close(fig)
+
+def render_communication_graph(pods, matrix, output_file=None, top_k=None, min_weight=None, aggregate=False,
+                               layout_cache=None):
+    # matrix[src, dst] as built by comm_matrix.build_matrix.
+    if aggregate:
+        pods, matrix = aggregate_replicas(pods, matrix)
+    graph = nx.DiGraph()
+    for src, dst, weight in prune_edges(pods, matrix, top_k, min_weight):
+        graph.add_edge(src, dst, weight=int(weight))
+    pos = cached_layout(graph, layout_cache)
+    draw_graph(graph, pos, output_file)
+    return graph
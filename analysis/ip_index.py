@@ -0,0 +1,74 @@
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cluster'))
+from ip_lifetimes import load_ip_lifetimes
+
+class StaticIpResolver:
+    # Resolves IPs through a single ip -> pod snapshot (e.g. `kubectl get pods -o wide`),
+    # ignoring packet times.
+    def __init__(self, ip_to_pod):
+        self.pods = sorted(set(ip_to_pod.values()))
+        pod_index = {pod: i for i, pod in enumerate(self.pods)}
+        self.ip_index = {ip.encode(): pod_index[pod] for ip, pod in ip_to_pod.items()}
+
+    def resolve(self, ips, timestamps=None):
+        return np.fromiter((self.ip_index.get(ip, -1) for ip in ips), dtype=np.int64, count=len(ips))
+
+class IpIntervalIndex:
+    # Resolves (ip, time) to the pod that held the IP at that time, from the (pod, ip, start, end)
+    # lifetimes the scanners record. Intervals are sorted by (ip, start) under a single int64 key,
+    # so a batch of packets resolves with one np.searchsorted (O(log n) per packet).
+    def __init__(self, intervals):
+        self.pods = sorted({pod for pod, _, _, _ in intervals})
+        pod_index = {pod: i for i, pod in enumerate(self.pods)}
+        ips = sorted({ip for _, ip, _, _ in intervals})
+        self.ip_ids = {ip.encode(): i for i, ip in enumerate(ips)}
+
+        ip_id = np.array([self.ip_ids[ip.encode()] for _, ip, _, _ in intervals], dtype=np.int64)
+        start = np.array([to_us(start) for _, _, start, _ in intervals], dtype=np.int64)
+        end = np.array([to_us(end) if end is not None else np.iinfo(np.int64).max
+                        for _, _, _, end in intervals], dtype=np.int64)
+        pod = np.array([pod_index[pod] for pod, _, _, _ in intervals], dtype=np.int64)
+
+        self.t_min = int(start.min()) if len(start) else 0
+        # Packet times are clamped into [t_min - 1, t_min + span - 1] before keying, which keeps
+        # every key inside its IP's block.
+        self.span = (int(start.max()) - self.t_min + 2) if len(start) else 1
+        keys = ip_id * self.span + (start - self.t_min)
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.ip_id = ip_id[order]
+        self.end = end[order]
+        self.pod = pod[order]
+
+    @classmethod
+    def from_file(cls, path):
+        return cls(load_ip_lifetimes(path))
+
+    def resolve(self, ips, timestamps):
+        # ips: sequence of IP bytes; timestamps: datetime64[us] array (NaT resolves to the IP's
+        # latest holder). Returns pod indices, -1 where no pod held the IP at that time.
+        count = len(ips)
+        query_ip = np.fromiter((self.ip_ids.get(ip, -1) for ip in ips), dtype=np.int64, count=count)
+        times = timestamps.astype("datetime64[us]").astype(np.int64)
+        missing_time = np.isnat(timestamps)
+        offsets = np.clip(times - self.t_min, -1, self.span - 1)
+        offsets[missing_time] = self.span - 1
+
+        known_ip = query_ip >= 0
+        result = np.full(count, -1, dtype=np.int64)
+        if not len(self.keys) or not known_ip.any():
+            return result
+        query_keys = query_ip[known_ip] * self.span + offsets[known_ip]
+        candidate = np.searchsorted(self.keys, query_keys, side="right") - 1
+        valid = candidate >= 0
+        candidate = np.where(valid, candidate, 0)
+        valid &= self.ip_id[candidate] == query_ip[known_ip]
+        valid &= missing_time[known_ip] | (times[known_ip] < self.end[candidate])
+        result[known_ip] = np.where(valid, self.pod[candidate], -1)
+        return result
+
+def to_us(seconds):
+    return int(round(seconds * 1e6))
@@ -0,0 +1,258 @@
+import numpy as np
+
+class CommunicationGraph:
+    # Undirected weighted pod graph: adjacency[v] maps neighbour index -> traffic weight (both
+    # directions summed) and weights[v] is v's resource vector (a pod count by default), which
+    # the balance/capacity constraint is expressed in.
+    def __init__(self, pods, adjacency, weights):
+        self.pods = pods
+        self.adjacency = adjacency
+        self.weights = weights
+
+    @classmethod
+    def from_frame(cls, df, weights=None, pods=None):
+        pods = pods or sorted(set(df.index) | set(df.columns))
+        matrix = df.reindex(index=pods, columns=pods, fill_value=0).fillna(0).to_numpy(dtype=float)
+        symmetric = matrix + matrix.T
+        np.fill_diagonal(symmetric, 0)
+        rows, cols = np.nonzero(symmetric)
+        adjacency = [{} for _ in pods]
+        for i, j, weight in zip(rows.tolist(), cols.tolist(), symmetric[rows, cols].tolist()):
+            adjacency[i][j] = weight
+        if weights is None:
+            weights = np.ones((len(pods), 1))
+        return cls(pods, adjacency, np.asarray(weights, dtype=float).reshape(len(pods), -1))
+
+    def __len__(self):
+        return len(self.adjacency)
+
+    def cut(self, part):
+        # Traffic crossing between nodes under the assignment part[v] -> node index.
+        return sum(weight for v, neighbours in enumerate(self.adjacency)
+                   for u, weight in neighbours.items() if u > v and part[u] != part[v])
+
+def coarsen(graph, max_weight, rng):
+    # Heavy-edge matching: each unmatched vertex merges with its heaviest unmatched neighbour,
+    # as long as the merged weight stays under max_weight. Returns the coarse graph and the
+    # fine -> coarse vertex map.
+    size = len(graph)
+    match = np.full(size, -1, dtype=np.int64)
+    for v in rng.permutation(size).tolist():
+        if match[v] != -1:
+            continue
+        best, best_weight = v, 0.0
+        for u, weight in graph.adjacency[v].items():
+            if match[u] == -1 and weight > best_weight and np.all(graph.weights[v] + graph.weights[u] <= max_weight):
+                best, best_weight = u, weight
+        match[v] = best
+        match[best] = v
+
+    mapping = np.full(size, -1, dtype=np.int64)
+    coarse_size = 0
+    for v in range(size):
+        if mapping[v] == -1:
+            mapping[v] = mapping[match[v]] = coarse_size
+            coarse_size += 1
+
+    weights = np.zeros((coarse_size, graph.weights.shape[1]))
+    np.add.at(weights, mapping, graph.weights)
+    adjacency = [{} for _ in range(coarse_size)]
+    for v, neighbours in enumerate(graph.adjacency):
+        cv = mapping[v]
+        coarse_neighbours = adjacency[cv]
+        for u, weight in neighbours.items():
+            cu = mapping[u]
+            if cu != cv:
+                coarse_neighbours[cu] = coarse_neighbours.get(cu, 0.0) + weight
+    return CommunicationGraph(None, adjacency, weights), mapping
+
+def relative_load(load, capacity):
+    return float(np.max(load / capacity))
+
+def initial_partition(graph, capacity):
+    # Greedy graph growing on the coarsest graph: heaviest-communicating vertices first, each to
+    # the node it talks to most that still has room (least loaded node on ties). A vertex that
+    # fits nowhere goes to the node it overloads least; refine() then tries to repair that, and
+    # best_placement() reports whatever overload is left.
+    parts = len(capacity)
+    part = np.full(len(graph), -1, dtype=np.int64)
+    load = np.zeros_like(capacity)
+    strength = [sum(neighbours.values()) for neighbours in graph.adjacency]
+    for v in sorted(range(len(graph)), key=lambda v: (-strength[v], -graph.weights[v].sum())):
+        affinity = np.zeros(parts)
+        for u, weight in graph.adjacency[v].items():
+            if part[u] >= 0:
+                affinity[part[u]] += weight
+        fits = [p for p in range(parts) if np.all(load[p] + graph.weights[v] <= capacity[p])]
+        if fits:
+            target = max(fits, key=lambda p: (affinity[p], -relative_load(load[p] + graph.weights[v], capacity[p])))
+        else:
+            target = min(range(parts), key=lambda p: relative_load(load[p] + graph.weights[v], capacity[p]))
+        part[v] = target
+        load[target] += graph.weights[v]
+    return part
+
+def repair(graph, part, capacity, load, move):
+    # Moves vertices off over-capacity nodes, cheapest first (least traffic kept on the node,
+    # then largest relative size), to the feasible node they talk to most. Leaves a node over
+    # capacity only when nothing on it fits anywhere else.
+    parts = len(capacity)
+    for source in range(parts):
+        while np.any(load[source] > capacity[source] + 1e-9):
+            best = None
+            for v in np.flatnonzero(part == source).tolist():
+                targets = [p for p in range(parts)
+                           if p != source and np.all(load[p] + graph.weights[v] <= capacity[p] + 1e-9)]
+                if not targets:
+                    continue
+                affinity = {p: 0.0 for p in targets}
+                kept = 0.0
+                for u, weight in graph.adjacency[v].items():
+                    if part[u] == source:
+                        kept += weight
+                    elif part[u] in affinity:
+                        affinity[part[u]] += weight
+                target = max(targets, key=lambda p: (affinity[p], -relative_load(load[p], capacity[p])))
+                key = (kept - affinity[target], -relative_load(graph.weights[v], capacity[source]))
+                if best is None or key < best[0]:
+                    best = (key, v, target)
+            if best is None:
+                break
+            move(best[1], best[2])
+
+def refine(graph, part, capacity, max_passes=10):
+    # k-way Fiduccia-Mattheyses style refinement. connectivity[v][p] is the weight from v to node
+    # p and is updated in O(degree) per move, so each move's gain is read off in O(parts).
+    # Over-capacity nodes are repaired first; then positive-gain moves are applied while they
+    # respect capacity, and when the best target is full a swap with one of v's neighbours on
+    # that node is tried instead.
+    weights = graph.weights
+    load = np.zeros_like(capacity)
+    np.add.at(load, part, weights)
+    connectivity = [{} for _ in range(len(graph))]
+    for v, neighbours in enumerate(graph.adjacency):
+        for u, weight in neighbours.items():
+            connectivity[v][part[u]] = connectivity[v].get(part[u], 0.0) + weight
+
+    def move(v, target):
+        source = part[v]
+        part[v] = target
+        load[source] -= weights[v]
+        load[target] += weights[v]
+        for u, weight in graph.adjacency[v].items():
+            row = connectivity[u]
+            row[source] -= weight
+            if row[source] <= 1e-12:
+                del row[source]
+            row[target] = row.get(target, 0.0) + weight
+
+    def fits(p, added, removed=0):
+        return np.all(load[p] + added - removed <= capacity[p] + 1e-9)
+
+    repair(graph, part, capacity, load, move)
+
+    for _ in range(max_passes):
+        improved = 0.0
+        boundary = [v for v in range(len(graph)) if any(p != part[v] for p in connectivity[v])]
+        for v in boundary:
+            source = part[v]
+            internal = connectivity[v].get(source, 0.0)
+            gains = sorted(((weight - internal, p) for p, weight in connectivity[v].items() if p != source),
+                           reverse=True)
+            for gain, target in gains:
+                if gain <= 0:
+                    break
+                if fits(target, weights[v]):
+                    move(v, target)
+                    improved += gain
+                    break
+                best_swap, best_gain = None, 0.0
+                for u, weight in graph.adjacency[v].items():
+                    if part[u] != target:
+                        continue
+                    swap_gain = gain + connectivity[u].get(source, 0.0) - connectivity[u].get(target, 0.0) - 2 * weight
+                    if (swap_gain > best_gain and fits(target, weights[v], weights[u])
+                            and fits(source, weights[u], weights[v])):
+                        best_swap, best_gain = u, swap_gain
+                if best_swap is not None:
+                    move(v, target)
+                    move(best_swap, source)
+                    improved += best_gain
+                    break
+        if improved <= 0:
+            break
+    return part
+
+def partition(graph, capacity, seed=0, coarse_size=None, max_passes=10):
+    # Multilevel k-way partitioning: coarsen by heavy-edge matching, partition the coarsest
+    # graph greedily, then project back level by level with FM refinement at each level.
+    capacity = np.asarray(capacity, dtype=float).reshape(len(capacity), -1)
+    parts = len(capacity)
+    rng = np.random.default_rng(seed)
+    coarse_size = coarse_size or max(8 * parts, 32)
+    max_weight = np.maximum(capacity.min(axis=0) / 4, graph.weights.max(axis=0) if len(graph) else 0)
+
+    levels = []
+    current = graph
+    while len(current) > coarse_size:
+        coarse, mapping = coarsen(current, max_weight, rng)
+        if len(coarse) > 0.9 * len(current):
+            break
+        levels.append((current, mapping))
+        current = coarse
+
+    part = refine(current, initial_partition(current, capacity), capacity, max_passes)
+    for fine, mapping in reversed(levels):
+        part = refine(fine, part[mapping], capacity, max_passes)
+    return part
+
+def balanced_capacity(graph, parts, imbalance=0.03):
+    # Equal per-node capacity with imbalance slack, in each dimension of the vertex weights.
+    total = graph.weights.sum(axis=0)
+    largest = graph.weights.max(axis=0) if len(graph) else 0
+    per_node = np.maximum(np.ceil(total / parts * (1 + imbalance)), largest)
+    return np.tile(per_node, (parts, 1))
+
+def excess_load(graph, part, capacity):
+    # Per node, how far the assignment goes over capacity in each dimension (zero when it fits).
+    load = np.zeros_like(capacity)
+    np.add.at(load, part, graph.weights)
+    return np.maximum(load - capacity, 0)
+
+def overload(graph, part, capacity):
+    return float(excess_load(graph, part, capacity).sum())
+
+def best_placement(graph, nodes, capacity, trials):
+    # Returns ({node: [pods]}, cross-node traffic, {node: excess}) for the best of `trials` seeded
+    # runs, preferring runs that stay within capacity. The last item lists the nodes left over
+    # capacity, with the excess in each dimension; it is empty when the placement fits.
+    capacity = np.asarray(capacity, dtype=float).reshape(len(nodes), -1)
+    best_part, best_key = None, None
+    for seed in range(trials):
+        part = partition(graph, capacity, seed=seed)
+        key = (overload(graph, part, capacity), graph.cut(part))
+        if best_key is None or key < best_key:
+            best_part, best_key = part, key
+    placement = {node: [] for node in nodes}
+    for pod, p in zip(graph.pods, best_part.tolist()):
+        placement[nodes[p]].append(pod)
+    excess = excess_load(graph, best_part, capacity)
+    overloaded = {nodes[p]: excess[p] for p in range(len(nodes)) if np.any(excess[p] > 1e-9)}
+    return placement, best_key[1], overloaded
+
+def partition_placement(df_routes, nodes, imbalance=0.03, trials=4):
+    # Pod-count balanced placement: every node takes at most ceil(P/N * (1 + imbalance)) pods.
+    graph = CommunicationGraph.from_frame(df_routes)
+    return best_placement(graph, nodes, balanced_capacity(graph, len(nodes), imbalance), trials)
+
+def resource_placement(df_routes, capacities, demands, trials=4):
+    # Multi-dimensional bin packing with communication affinity. capacities is {node: vector}
+    # and demands {pod: vector} in the same dimensions (e.g. pods, peak memory, p95 memory);
+    # pods without a measured demand are charged the median of the measured ones.
+    nodes = list(capacities)
+    pods = sorted(set(df_routes.index) | set(df_routes.columns) | set(demands))
+    measured = np.array(list(demands.values()), dtype=float)
+    default = np.median(measured, axis=0) if len(measured) else np.zeros(len(capacities[nodes[0]]))
+    weights = [demands.get(pod, default) for pod in pods]
+    graph = CommunicationGraph.from_frame(df_routes, weights, pods)
+    return best_placement(graph, nodes, [capacities[node] for node in nodes], trials)
@@ -0,0 +1,192 @@
+import os
+import numpy as np
+import pandas as pd
+from placement import CommunicationGraph
+from pod_resources import load_current_placement
+
+def edge_arrays(graph):
+    # (src, dst, weight) arrays with one entry per undirected edge, for vectorised scoring.
+    src, dst, weights = [], [], []
+    for v, neighbours in enumerate(graph.adjacency):
+        for u, weight in neighbours.items():
+            if u > v:
+                src.append(v)
+                dst.append(u)
+                weights.append(weight)
+    return np.array(src, dtype=np.int64), np.array(dst, dtype=np.int64), np.array(weights, dtype=float)
+
+class PlacementSimulator:
+    # Scores pod placements ({node: [pods]}) against the recorded communication matrices
+    # (pod_communication_counts.csv / pod_communication_bytes.csv; direction does not matter
+    # for cross-node traffic). Pods a placement leaves out are reported as unplaced and their
+    # traffic is not counted either way.
+    def __init__(self, packets_df, bytes_df=None, memory=None):
+        frames = [df.fillna(0) for df in (packets_df, bytes_df) if df is not None]
+        self.pods = sorted(set().union(*(set(df.index) | set(df.columns) for df in frames)))
+        self.index = {pod: i for i, pod in enumerate(self.pods)}
+        self.graphs = {"packets": CommunicationGraph.from_frame(frames[0], pods=self.pods)}
+        if bytes_df is not None:
+            self.graphs["bytes"] = CommunicationGraph.from_frame(frames[1], pods=self.pods)
+        self.edges = {metric: edge_arrays(graph) for metric, graph in self.graphs.items()}
+        self.memory = memory or {}
+
+    def assign(self, placement):
+        nodes = list(placement)
+        part = np.full(len(self.pods), -1, dtype=np.int64)
+        for i, node in enumerate(nodes):
+            for pod in placement[node]:
+                if pod in self.index:
+                    part[self.index[pod]] = i
+        return nodes, part
+
+    def cross_node(self, part):
+        totals = {}
+        for metric, (src, dst, weights) in self.edges.items():
+            placed = (part[src] >= 0) & (part[dst] >= 0)
+            totals[metric] = float(weights[placed & (part[src] != part[dst])].sum())
+            totals[f"total_{metric}"] = float(weights[placed].sum())
+        return totals
+
+    def score(self, placement):
+        nodes, part = self.assign(placement)
+        result = self.cross_node(part)
+        result["unplaced"] = int((part < 0).sum())
+        result["node_load"] = {node: {"pods": len(placement[node]),
+                                      "memory": sum(self.memory.get(pod, 0) for pod in placement[node])}
+                               for node in nodes}
+        return result
+
+    def random_placement(self, reference, rng):
+        # The reference placement's pods shuffled across its nodes, keeping each node's pod count.
+        pods = [pod for node_pods in reference.values() for pod in node_pods]
+        pods = [pods[i] for i in rng.permutation(len(pods))]
+        placement, start = {}, 0
+        for node, node_pods in reference.items():
+            placement[node] = pods[start:start + len(node_pods)]
+            start += len(node_pods)
+        return placement
+
+    def compare(self, placements, random_samples=20, seed=0):
+        # Scores each {label: placement} plus the mean of random_samples shuffles of the first
+        # one. Returns [(label, score)] in that order.
+        results = [(label, self.score(placement)) for label, placement in placements.items()]
+        if random_samples and placements:
+            rng = np.random.default_rng(seed)
+            reference = next(iter(placements.values()))
+            scores = [self.cross_node(self.assign(self.random_placement(reference, rng))[1])
+                      for _ in range(random_samples)]
+            mean = {metric: float(np.mean([s[metric] for s in scores])) for metric in scores[0]}
+            results.append((f"random (mean of {random_samples})", mean))
+        return results
+
+class PlacementState:
+    # A placement being edited move by move. The cross-node totals are kept up to date and the
+    # effect of moving or swapping pods is evaluated from their adjacency alone, O(degree).
+    def __init__(self, simulator, placement):
+        self.simulator = simulator
+        self.nodes, self.part = simulator.assign(placement)
+        self.node_ids = {node: i for i, node in enumerate(self.nodes)}
+        self.totals = simulator.cross_node(self.part)
+
+    def node_id(self, node):
+        if node not in self.node_ids:
+            self.node_ids[node] = len(self.nodes)
+            self.nodes.append(node)
+        return self.node_ids[node]
+
+    def vertex_delta(self, graph, v, source, target):
+        # Change in (cross-node, placed) weight if vertex v went from part source to part target.
+        # -1 is unplaced: edges to unplaced pods count towards neither total.
+        cross, placed = 0.0, 0.0
+        if source == target:
+            return cross, placed
+        for u, weight in graph.adjacency[v].items():
+            p = self.part[u]
+            if p >= 0:
+                cross += weight * (int(target >= 0 and p != target) - int(source >= 0 and p != source))
+                placed += weight * (int(target >= 0) - int(source >= 0))
+        return cross, placed
+
+    def deltas(self, changes):
+        # changes: [(v, source, target)] applied together; corrects for edges between them.
+        deltas = {}
+        for metric, graph in self.simulator.graphs.items():
+            cross, placed = 0.0, 0.0
+            for v, source, target in changes:
+                vertex_cross, vertex_placed = self.vertex_delta(graph, v, source, target)
+                cross += vertex_cross
+                placed += vertex_placed
+            if len(changes) == 2:
+                (a, part_a, _), (b, part_b, _) = changes
+                weight = graph.adjacency[a].get(b, 0.0)
+                if part_a != part_b and part_a >= 0 and part_b >= 0:
+                    # Each single-move delta counted the a-b edge as becoming node-local; it stays cross.
+                    cross += 2 * weight
+                elif (part_a >= 0) != (part_b >= 0):
+                    # The a-b edge was counted as newly placed, but one end is still unplaced.
+                    placed -= weight
+            deltas[metric] = cross
+            deltas[f"total_{metric}"] = placed
+        return deltas
+
+    def move_delta(self, pod, node):
+        v = self.simulator.index[pod]
+        return self.deltas([(v, self.part[v], self.node_id(node))])
+
+    def swap_delta(self, pod_a, pod_b):
+        a, b = self.simulator.index[pod_a], self.simulator.index[pod_b]
+        return self.deltas([(a, self.part[a], self.part[b]), (b, self.part[b], self.part[a])])
+
+    def apply(self, deltas):
+        for metric, delta in deltas.items():
+            self.totals[metric] += delta
+
+    def move(self, pod, node):
+        deltas = self.move_delta(pod, node)
+        self.apply(deltas)
+        self.part[self.simulator.index[pod]] = self.node_ids[node]
+        return deltas
+
+    def swap(self, pod_a, pod_b):
+        deltas = self.swap_delta(pod_a, pod_b)
+        self.apply(deltas)
+        a, b = self.simulator.index[pod_a], self.simulator.index[pod_b]
+        self.part[a], self.part[b] = self.part[b], self.part[a]
+        return deltas
+
+    def placement(self):
+        placement = {node: [] for node in self.nodes}
+        for pod, p in zip(self.simulator.pods, self.part.tolist()):
+            if p >= 0:
+                placement[self.nodes[p]].append(pod)
+        return placement
+
+def print_comparison(results, baseline="current"):
+    # One line per placement: cross-node packets (and bytes) and the change against baseline.
+    scores = dict(results)
+    reference = scores.get(baseline)
+    for label, score in results:
+        line = f"{label}: cross-node packets {score['packets']:.0f} of {score['total_packets']:.0f}"
+        if "bytes" in score:
+            line += f", bytes {score['bytes']:.0f} of {score['total_bytes']:.0f}"
+        if reference is not None and label != baseline and reference["packets"]:
+            line += f" ({(score['packets'] - reference['packets']) / reference['packets']:+.1%} packets vs {baseline})"
+        if score.get("node_load"):
+            busiest = max(score["node_load"].items(), key=lambda item: (item[1]["memory"], item[1]["pods"]))
+            line += f", busiest node {busiest[0]} ({busiest[1]['pods']} pods"
+            line += f", {busiest[1]['memory'] / 2**20:.0f}Mi)" if busiest[1]["memory"] else ")"
+        if score.get("unplaced"):
+            line += f", {score['unplaced']} pod(s) unplaced"
+        print(line)
+
+def report(packets_df, placements, log_directory='../cluster/cl_log', bytes_file='pod_communication_bytes.csv',
+           memory=None):
+    # Prints how the given {label: placement} compare with the layout cluster_scan.py last
+    # recorded and with random placements, over the recorded packet (and byte) matrices.
+    bytes_df = pd.read_csv(bytes_file, index_col=0) if os.path.exists(bytes_file) else None
+    simulator = PlacementSimulator(packets_df, bytes_df, memory)
+    current = load_current_placement(log_directory) if os.path.isdir(log_directory) else {}
+    if current:
+        placements = dict(current=current, **placements)
+    print("\nPlacement comparison:")
+    print_comparison(simulator.compare(placements))
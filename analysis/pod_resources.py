@@ -0,0 +1,78 @@
+import csv
+import json
+import os
+import re
+import subprocess
+import sys
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cluster'))
+from pod_summary import iter_pod_logs
+
+QUANTITY_SUFFIXES = {"Ki": 2**10, "Mi": 2**20, "Gi": 2**30, "Ti": 2**40,
+                     "k": 10**3, "M": 10**6, "G": 10**9, "T": 10**12}
+QUANTITY_PATTERN = re.compile(r'^([0-9.]+)(Ki|Mi|Gi|Ti|k|M|G|T)?$')
+
+def parse_quantity(value):
+    # Kubernetes resource quantity ("16318436Ki", "8Gi", "110") or plain number -> float.
+    match = QUANTITY_PATTERN.match(str(value).strip())
+    if match is None:
+        raise ValueError(f"Unrecognised quantity: {value}")
+    return float(match.group(1)) * QUANTITY_SUFFIXES.get(match.group(2), 1)
+
+def load_pod_memory(log_directory, step_ns=10**9):
+    # Returns {pod: (peak_bytes, p95_bytes)}. The p95 is taken over the samples resampled onto a
+    # step_ns grid, so a pod sampled adaptively (densely while busy) is weighted by time rather
+    # than by sample count; the peak comes from the summary sidecar MonitorLogger keeps, which
+    # also covers rotated-away logs. A pod with no samples left falls back to the sidecar's sketch.
+    memory = {}
+    for pod_logs in iter_pod_logs(log_directory):
+        summary = pod_logs.load_summary()
+        values = pod_logs.read_memory(step_ns=step_ns)
+        if len(values):
+            peak = summary.max if summary is not None else float(np.max(values))
+            memory[pod_logs.pod_name] = (peak, float(np.percentile(values, 95)))
+        elif summary is not None:
+            memory[pod_logs.pod_name] = (summary.max, summary.sketch.quantile(0.95))
+    return memory
+
+def load_node_capacities(capacity_file=None):
+    # Returns {node: (allocatable_pods, allocatable_memory_bytes)}. Read from a CSV with
+    # node,memory[,pods] columns when given, otherwise from the schedulable nodes' allocatable
+    # resources reported by kubectl. Empty if neither is available.
+    capacities = {}
+    if capacity_file:
+        with open(capacity_file, 'r', newline='') as f:
+            for row in csv.DictReader(f):
+                capacities[row["node"]] = (parse_quantity(row.get("pods") or 110), parse_quantity(row["memory"]))
+        return capacities
+
+    try:
+        result = subprocess.run(['kubectl', 'get', 'nodes', '-o', 'json'], stdout=subprocess.PIPE, text=True)
+        nodes = json.loads(result.stdout)["items"]
+    except Exception as e:
+        print(f"Error getting node info: {e}")
+        return capacities
+    for node in nodes:
+        spec = node.get("spec", {})
+        if spec.get("unschedulable") or any(taint.get("effect") == "NoSchedule" for taint in spec.get("taints", [])):
+            continue
+        allocatable = node["status"]["allocatable"]
+        capacities[node["metadata"]["name"]] = (parse_quantity(allocatable.get("pods", 110)),
+                                                parse_quantity(allocatable["memory"]))
+    return capacities
+
+def load_current_placement(log_directory):
+    # Returns {node: [pods]} as last recorded by cluster_scan.py: the summary sidecar's node,
+    # else the node of the newest .cls chunk, else the last JSON log line's node_name.
+    nodes = {}
+    for pod_logs in iter_pod_logs(log_directory):
+        summary = pod_logs.load_summary()
+        node_name = summary.node_name if summary is not None and summary.node_name else pod_logs.last_node()
+        if node_name:
+            nodes[pod_logs.pod_name] = node_name
+
+    placement = {}
+    for pod_name, node_name in sorted(nodes.items()):
+        placement.setdefault(node_name, []).append(pod_name)
+    return placement
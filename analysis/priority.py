@@ -1,34 +1,37 @@
+import argparse
 import os
-import json
+import sys
+import numpy as np
 import pandas as pd
 
-log_directory = '../cluster/cl_log'
-output_csv_path = 'Pod_communication_dep.csv'
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cluster'))
+from pod_summary import iter_pod_logs
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--log-directory", default='../cluster/cl_log',
+                    help="cluster_scan.py's --output-directory")
+args = parser.parse_args()
 
-def read_memory_data(file_path):
-    memory_data = []
-    with open(file_path, 'r') as file:
-        for line in file:
-            log_entry = json.loads(line.strip())
-            memory_data.append(log_entry["memory_usage"])
-    return memory_data
+log_directory = args.log_directory
+output_csv_path = 'Pod_communication_dep.csv'
 
 def calculate_memory_change(memory_data):
-    if not memory_data:
+    if len(memory_data) == 0:
         return 0
-    max_memory = max(memory_data)
-    min_memory = min(memory_data)
+    max_memory = float(np.max(memory_data))
+    min_memory = float(np.min(memory_data))
     return max_memory - min_memory
 
+# The summary sidecars MonitorLogger maintains already hold min/max over every sample written,
+# rotated ones included, so a pod with a sidecar costs one small JSON read; pods logged before
+# sidecars existed fall back to scanning their samples.
 memory_changes = {}
-
-for filename in os.listdir(log_directory):
-    if filename.startswith('cl_') and filename.endswith('.log'):
-        pod_name = filename[len('cl_'):-len('.log')]
-        file_path = os.path.join(log_directory, filename)
-        memory_data = read_memory_data(file_path)
-        memory_change = calculate_memory_change(memory_data)
-        memory_changes[pod_name] = memory_change
+for pod_logs in iter_pod_logs(log_directory):
+    summary = pod_logs.load_summary()
+    if summary is not None:
+        memory_changes[pod_logs.pod_name] = summary.max - summary.min
+    else:
+        memory_changes[pod_logs.pod_name] = calculate_memory_change(pod_logs.read_memory())
 
 sorted_pods = sorted(memory_changes.items(), key=lambda item: item[1], reverse=True)
 
@@ -40,14 +43,10 @@ for pod, change in sorted_pods:
     print(f"{pod}: {change} bytes, Score: {score}")
 
 pod_list = list(priority_scores.keys())
-dependency_matrix = pd.DataFrame(index=pod_list, columns=pod_list)
-
-for i, pod_a in enumerate(pod_list):
-    for j, pod_b in enumerate(pod_list):
-        if i != j:
-            dependency_matrix.at[pod_a, pod_b] = priority_scores[pod_a] + priority_scores[pod_b]
-        else:
-            dependency_matrix.at[pod_a, pod_b] = 0
+scores = np.array([priority_scores[pod] for pod in pod_list], dtype=np.int64)
+dependency = scores[:, None] + scores[None, :]
+np.fill_diagonal(dependency, 0)
+dependency_matrix = pd.DataFrame(dependency, index=pod_list, columns=pod_list)
 
 dependency_matrix.to_csv(output_csv_path)
 
@@ -1,6 +1,8 @@
 import pandas as pd
+from placement import partition_placement
+from placement_sim import report
 
-def suggest_optimal_placement(df_routes, threshold, nodes):
+def round_robin_placement(df_routes, threshold, nodes):
     placement = {node: [] for node in nodes}
     pod_dependencies = []
 
@@ -33,6 +35,15 @@ def suggest_optimal_placement(df_routes, threshold, nodes):
     
     return placement
 
+def suggest_optimal_placement(df_routes, threshold, nodes):
+    # Multilevel graph partitioning over the whole communication graph (see placement.py); the
+    # threshold only decides which pairs round_robin_placement tries to co-locate.
+    placement, cross_node, overloaded = partition_placement(df_routes, nodes)
+    print(f"Cross-node traffic: {cross_node:g}")
+    for node, excess in overloaded.items():
+        print(f"Warning: {node} is {excess[0]:g} pod(s) over its share; no balanced placement was found")
+    return placement
+
 def main():
     input_file = 'pod_communication_counts.csv'
     df_routes = pd.read_csv(input_file, index_col=0)
@@ -51,6 +62,9 @@ def main():
     for node, pods in mean_placement.items():
         print(f"{node}: {pods}")
 
+    report(df_routes, {"recommended": mean_placement,
+                       "round-robin heuristic": round_robin_placement(df_routes, mean_threshold, nodes)})
+
 if __name__ == "__main__":
     main()
 
@@ -1,9 +1,10 @@
+import argparse
 import pandas as pd
+from placement import partition_placement, resource_placement
+from placement_sim import report
+from pod_resources import load_pod_memory, load_node_capacities
 
-def suggest_optimal_placement(counts_df, dep_df, threshold, nodes):
-    placement = {node: [] for node in nodes}
-    pod_dependencies = []
-
+def combine_weights(counts_df, dep_df):
     norm_counts_df = counts_df / counts_df.values.max()
     norm_dep_df = dep_df / dep_df.values.max()
 
@@ -11,7 +12,13 @@ def suggest_optimal_placement(counts_df, dep_df, threshold, nodes):
     weight_dep = 0.7
     #weight_count+weight_dep=1
 
-    combined_df = weight_counts * norm_counts_df + weight_dep * norm_dep_df
+    return weight_counts * norm_counts_df + weight_dep * norm_dep_df
+
+def round_robin_placement(counts_df, dep_df, threshold, nodes):
+    placement = {node: [] for node in nodes}
+    pod_dependencies = []
+
+    combined_df = combine_weights(counts_df, dep_df)
 
     sorted_pods = combined_df.sum(axis=1).sort_values(ascending=False).index.tolist()
 
@@ -42,11 +49,51 @@ def suggest_optimal_placement(counts_df, dep_df, threshold, nodes):
     
     return placement
 
-def main():
+def suggest_optimal_placement(counts_df, dep_df, threshold, nodes):
+    # Multilevel graph partitioning over the combined weights (see placement.py); the threshold
+    # only decides which pairs round_robin_placement tries to co-locate.
+    placement, cross_node, overloaded = partition_placement(combine_weights(counts_df, dep_df).fillna(0), nodes)
+    print(f"Cross-node weight: {cross_node:g}")
+    for node, excess in overloaded.items():
+        print(f"Warning: {node} is {excess[0]:g} pod(s) over its share; no balanced placement was found")
+    return placement
+
+def suggest_resource_placement(counts_df, pod_memory, capacities, headroom=0.9):
+    # Co-locates chatty pods under each node's memory: the sum of peaks must fit in allocatable
+    # memory, the sum of p95s in headroom * allocatable, and the pod count in allocatable pods.
+    demands = {pod: (1, peak, p95) for pod, (peak, p95) in pod_memory.items()}
+    node_limits = {node: (pods, memory, memory * headroom) for node, (pods, memory) in capacities.items()}
+    placement, cross_node, overloaded = resource_placement(counts_df.fillna(0), node_limits, demands)
+    print(f"Cross-node traffic: {cross_node:g}")
+    for node, (pods, peak, p95) in overloaded.items():
+        print(f"Warning: no placement fits every node; {node} is over by {pods:g} pod(s), "
+              f"{peak / 2**20:.0f}Mi peak, {p95 / 2**20:.0f}Mi p95")
+    for node, pods in placement.items():
+        peak = sum(pod_memory[pod][0] for pod in pods if pod in pod_memory)
+        p95 = sum(pod_memory[pod][1] for pod in pods if pod in pod_memory)
+        memory = capacities[node][1]
+        status = "OVERCOMMITTED" if peak > memory or p95 > memory * headroom else "ok"
+        print(f"{node}: peak {peak / 2**20:.0f}Mi, p95 {p95 / 2**20:.0f}Mi of {memory / 2**20:.0f}Mi ({status})")
+    return placement
+
+def main(capacity_file=None, log_directory='../cluster/cl_log', headroom=0.9):
     counts_file = 'pod_communication_counts.csv'
     dep_file = 'Pod_communication_dep.csv'
 
     counts_df = pd.read_csv(counts_file, index_col=0)
+
+    capacities = load_node_capacities(capacity_file)
+    pod_memory = load_pod_memory(log_directory)
+    if capacities and pod_memory:
+        optimal_placement = suggest_resource_placement(counts_df, pod_memory, capacities, headroom)
+        print("\nResource-Aware Pod Placement:")
+        for node, pods in optimal_placement.items():
+            print(f"{node}: {pods}")
+        report(counts_df, {"recommended": optimal_placement}, log_directory,
+               memory={pod: peak for pod, (peak, _) in pod_memory.items()})
+        return
+
+    print("No node capacities or memory series available; placing by pod count only.")
     dep_df = pd.read_csv(dep_file, index_col=0)
     
     N = int(input("Enter the number of nodes: "))
@@ -63,6 +110,15 @@ def main():
     for node, pods in optimal_placement.items():
         print(f"{node}: {pods}")
 
-if __name__ == "__main__":
-    main()
+    report(counts_df, {"recommended": optimal_placement,
+                       "round-robin heuristic": round_robin_placement(counts_df, dep_df, mean_threshold, nodes)},
+           log_directory)
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--capacity-file", help="CSV with node,memory[,pods] columns (default: kubectl allocatable)")
+    parser.add_argument("--log-directory", default="../cluster/cl_log")
+    parser.add_argument("--headroom", type=float, default=0.9,
+                        help="Fraction of node memory the pods' p95 usage may fill")
+    args = parser.parse_args()
+    main(args.capacity_file, args.log_directory, args.headroom)
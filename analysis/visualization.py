@@ -1,20 +1,20 @@
 import os
-import re
+import argparse
 import subprocess
-from collections import defaultdict, Counter
 import pandas as pd
-import networkx as nx
-import matplotlib.pyplot as plt
+from comm_matrix import build_matrix
+from graph_render import render_communication_graph
+from ip_index import StaticIpResolver, IpIntervalIndex
 
 log_directory = '../application/app_log/'
+ip_lifetimes_file = '../cluster/cl_log/pod_ip_lifetimes.jsonl'
 namespace = 'teastore'
 output_file = './pod_communication_counts.csv'
+bytes_output_file = './pod_communication_bytes.csv'
 
 def get_log_files(directory):
     return [os.path.join(directory, f) for f in os.listdir(directory) if f.endswith('filtered.log')]
 
-filenames = get_log_files(log_directory)
-
 def get_ip_to_pod_mapping(namespace):
     ip_to_pod = {}
     try:
@@ -31,63 +31,43 @@ def get_ip_to_pod_mapping(namespace):
         print(f"Error getting pod info: {e}")
     return ip_to_pod
 
-ip_to_pod_mapping = get_ip_to_pod_mapping(namespace)
-
-def parse_all_routes_with_counts(filenames, ip_mapping):
-    all_routes = defaultdict(Counter)
-    
-    for filename in filenames:
-        with open(filename, 'r') as file:
-            log_data = file.readlines()
-        
-        for line in log_data:
-            match = re.search(r'(\d+\.\d+\.\d+\.\d+) → (\d+\.\d+\.\d+\.\d+)', line)
-            if match:
-                source_ip = match.group(1)
-                destination_ip = match.group(2)
-                if source_ip in ip_mapping and destination_ip in ip_mapping:
-                    source_pod = ip_mapping[source_ip]
-                    destination_pod = ip_mapping[destination_ip]
-                    all_routes[source_pod][destination_pod] += 1
-    
-    return all_routes
-
-all_routes_counts = parse_all_routes_with_counts(filenames, ip_to_pod_mapping)
-
-all_pods = set(ip_to_pod_mapping.values())
-for pod in all_pods:
-    if pod not in all_routes_counts:
-        all_routes_counts[pod] = Counter()
-    for inner_pod in all_pods:
-        if inner_pod not in all_routes_counts[pod]:
-            all_routes_counts[pod][inner_pod] = 0
-
-df_routes = pd.DataFrame(all_routes_counts).fillna(0).astype(int)
-df_routes.to_csv(output_file, index=True)
-print(f"Pod Communication Counts saved to {output_file}")
-
-# Create a directed graph
-G = nx.DiGraph()
-
-for source, destinations in all_routes_counts.items():
-    for destination, count in destinations.items():
-        if count > 0:
-            G.add_edge(source, destination, weight=count)
-
-plt.figure(figsize=(14, 10))
-pos = nx.spring_layout(G, seed=42)
-edges = G.edges(data=True)
-
-nx.draw(G, pos, node_size=500, node_color="lightblue", 
-        arrows=True, arrowstyle='-|>', arrowsize=8)
-
-pos_labels = {node: (coords[0], coords[1] - 0.03) for node, coords in pos.items()}
-nx.draw_networkx_labels(G, pos_labels, labels={node: node for node in G.nodes()}, 
-                        font_size=10, font_weight="bold", 
-                        verticalalignment='top', horizontalalignment='center')
-
-edge_labels = {(u, v): d['weight'] for u, v, d in edges}
-nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, label_pos=0.5, font_size=9, bbox=dict(facecolor='white', edgecolor='none', alpha=0.7))
-
-plt.show()
-
+def matrix_to_frame(pods, matrix):
+    # Rows are destinations and columns are sources, the layout pod_communication_counts.csv
+    # has always had.
+    return pd.DataFrame(matrix.T, index=pods, columns=pods)
+
+def main(args):
+    filenames = get_log_files(log_directory)
+    if os.path.exists(args.ip_lifetimes):
+        # Attribute each packet to the pod that held the IP when it was captured.
+        resolver = IpIntervalIndex.from_file(args.ip_lifetimes)
+        print(f"Resolving pod IPs from recorded lifetimes in {args.ip_lifetimes}")
+    else:
+        resolver = StaticIpResolver(get_ip_to_pod_mapping(namespace))
+
+    pods, packets, traffic = build_matrix(filenames, resolver)
+
+    df_routes = matrix_to_frame(pods, packets)
+    df_routes.to_csv(output_file, index=True)
+    print(f"Pod Communication Counts saved to {output_file}")
+    matrix_to_frame(pods, traffic).to_csv(bytes_output_file, index=True)
+    print(f"Pod Communication Bytes saved to {bytes_output_file}")
+
+    render_communication_graph(pods, packets, output_file=args.output, top_k=args.top_k,
+                               min_weight=args.min_weight, aggregate=args.aggregate,
+                               layout_cache=args.layout_cache)
+    if args.output:
+        print(f"Pod Communication Graph saved to {args.output}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", help="Write the graph to this file (.png, .svg, ...) instead of showing it")
+    parser.add_argument("--top-k", type=int, help="Draw only the k heaviest edges")
+    parser.add_argument("--min-weight", type=int, help="Draw only edges with at least this many packets")
+    parser.add_argument("--aggregate", action="store_true",
+                        help="Draw the replicas of each Deployment/StatefulSet as one node")
+    parser.add_argument("--layout-cache", default="./graph_layout.json",
+                        help="Node positions reused between runs; only new nodes are laid out")
+    parser.add_argument("--ip-lifetimes", default=ip_lifetimes_file,
+                        help="Pod IP lifetimes recorded by cluster_scan.py (in its --output-directory)")
+    main(parser.parse_args())
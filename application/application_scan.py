@@ -1,95 +1,197 @@
 import subprocess
 import os
+import argparse
+import sys
 import threading
 import time
 from datetime import datetime
-from kubernetes import client, config
+from kubernetes import config
+from prometheus_client import start_http_server
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cluster'))
+from pod_inventory import PodInventory
+from cluster_scan import create_core_api
+from scan_metrics import ACTIVE_CAPTURES
+from pcap_reader import PcapStreamDecoder
+from live_matrix import CommunicationMatrix
+from node_capture import NodeCaptureManager
 
 class NetworkTrafficLogger:
-    def __init__(self, output_directory):
+    def __init__(self, output_directory, live_matrix=None):
+        # With a live_matrix, each kubectl sniff streams its pcap to stdout; the stream is still
+        # saved to the usual .pcap file and is also decoded on the fly into the matrix.
         os.makedirs(output_directory, exist_ok=True)
         self.output_directory = output_directory
+        self.live_matrix = live_matrix
         self.active_processes = {}
-
-    def start_capture(self, namespace, pod_name, duration):
-        if self.is_pod_ready(namespace, pod_name):
-            self.capture_traffic(namespace, pod_name, duration)
-        else:
-            print(f"Waiting for pod {pod_name} to be ready. Retrying in 10 seconds...")
-            threading.Timer(10, self.start_capture, args=[namespace, pod_name, duration]).start()
+        self.terminations = []
+        ACTIVE_CAPTURES.labels(output_directory).set_function(lambda: len(self.active_processes))
 
     def capture_traffic(self, namespace, pod_name, duration):
         start_time = datetime.now().strftime("%Y%m%d_%H%M%S.%f")[:-6]
         output_file = os.path.join(self.output_directory, f"{pod_name}_{start_time}.pcap")
-        command = f"kubectl sniff {pod_name} -n {namespace} -o {output_file}"
-        process = subprocess.Popen(command, shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        reader = None
+        if self.live_matrix is not None:
+            process = subprocess.Popen(["kubectl", "sniff", pod_name, "-n", namespace, "-o", "-"],
+                                       stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            reader = threading.Thread(target=self.stream_capture, args=(pod_name, process, output_file),
+                                      name=f"LiveCapture_{pod_name}", daemon=True)
+            reader.start()
+        else:
+            # No shell in between, so terminating the process reaches kubectl sniff itself.
+            process = subprocess.Popen(["kubectl", "sniff", pod_name, "-n", namespace, "-o", output_file],
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
         timer = threading.Timer(duration, lambda: self.terminate_capture(pod_name))
         timer.start()
-        self.active_processes[pod_name] = (process, timer)
+        self.active_processes[pod_name] = (process, timer, reader)
 
-    def is_pod_ready(self, namespace, pod_name):
-        v1 = client.CoreV1Api()
-        pod = v1.read_namespaced_pod(pod_name, namespace)
-        return pod.status.phase == "Running" and all(container.ready for container in pod.status.container_statuses)
+    def stream_capture(self, pod_name, process, output_file, chunk_size=65536):
+        # The stream is saved until EOF whatever the decoder makes of it: a capture it cannot
+        # decode (bad header, unsupported link type...) only drops out of the live matrix.
+        decoder = PcapStreamDecoder()
+        try:
+            with open(output_file, 'wb') as pcap_file:
+                for chunk in iter(lambda: process.stdout.read1(chunk_size), b''):
+                    pcap_file.write(chunk)
+                    if decoder is None:
+                        continue
+                    try:
+                        self.live_matrix.add(decoder.feed(chunk))
+                    except Exception as e:
+                        print(f"Application_Error decoding live capture for {pod_name}, "
+                              f"live decoding stopped for this pod: {e}")
+                        decoder = None
+        except Exception as e:
+            print(f"Application_Error saving live capture for {pod_name}: {e}")
+        finally:
+            process.stdout.close()
 
-    def terminate_capture(self, pod_name):
-        if pod_name in self.active_processes:
-            process, timer = self.active_processes[pod_name]
+    def terminate_capture(self, pod_name, grace_period=5):
+        self.terminate_captures([pod_name], grace_period)
+
+    def terminate_capture_later(self, pod_name):
+        # For the inventory's watch thread, whose callbacks must not block: the grace period and
+        # the reader join run on their own thread, which terminate_all waits for.
+        thread = threading.Thread(target=self.terminate_capture, args=(pod_name,), name=f"Terminate_{pod_name}",
+                                  daemon=True)
+        thread.start()
+        self.terminations = [other for other in self.terminations if other.is_alive()] + [thread]
+
+    def terminate_captures(self, pod_names, grace_period=5):
+        # SIGTERM to every capture first so each kubectl sniff can flush what it has captured,
+        # then one shared grace period for all of them before SIGKILL, so stopping N captures
+        # takes grace_period at most rather than N times it. The captures are taken out of
+        # active_processes up front, so a pod that comes back meanwhile gets a new capture.
+        captures = [(pod_name, self.active_processes.pop(pod_name, None)) for pod_name in pod_names]
+        captures = [(pod_name, capture) for pod_name, capture in captures if capture is not None]
+        for _, (process, timer, _) in captures:
             timer.cancel()
             if process.poll() is None:
+                process.terminate()
+        deadline = time.monotonic() + grace_period
+        for _, (process, _, _) in captures:
+            try:
+                process.wait(timeout=max(0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
                 process.kill()
                 process.wait()
-            del self.active_processes[pod_name]
+        for _, (_, _, reader) in captures:
+            if reader is not None and reader is not threading.current_thread():
+                reader.join()
 
     def terminate_all(self):
-        for pod_name in list(self.active_processes.keys()):
-            self.terminate_capture(pod_name)
+        self.terminate_captures(list(self.active_processes))
+        for thread in self.terminations:
+            thread.join()
+        self.terminations = []
 
-def monitor_application_traffic(namespace, application, logger, session_duration):
-    config.load_kube_config()
-    v1 = client.CoreV1Api()
-    known_pods = set()
+def monitor_application_traffic(namespace, application, logger, session_duration, inventory=None, metrics_port=8001,
+                                stop_event=None):
+    own_inventory = inventory is None
+    stop_event = stop_event or threading.Event()
+    if metrics_port is not None:
+        # cluster_scan already serves 8000 when both scanners run as separate processes.
+        start_http_server(metrics_port)
+    if own_inventory:
+        config.load_kube_config()
+        inventory = PodInventory(create_core_api(), namespace, f'app={application}')
     session_start_time = time.time()
     message_interval = 5
     last_message_time = time.time()
 
+    def handle_pod_event(event, info):
+        if event == "added":
+            print(f"Application_New pod detected: {info.name}")
+            if not info.ready:
+                print(f"Waiting for pod {info.name} to be ready.")
+        elif event == "ready":
+            if info.name not in logger.active_processes:
+                remaining = session_duration - (time.time() - session_start_time)
+                logger.capture_traffic(namespace, info.name, max(remaining, 0))
+        elif event == "deleted":
+            print(f"Application_Pod deleted: {info.name}")
+            logger.terminate_capture_later(info.name)
+
     print(f"Application_Scan session for '{application}' started. (Duration: {session_duration}s)")
     try:
-        while time.time() - session_start_time < session_duration:
+        if logger.live_matrix is not None:
+            # Subscribed first so pod IPs are known before their captures start.
+            inventory.subscribe(logger.live_matrix.handle_pod_event)
+            logger.live_matrix.start()
+        if isinstance(logger, NodeCaptureManager):
+            inventory.subscribe(logger.handle_pod_event)
+            logger.start()
+        else:
+            inventory.subscribe(handle_pod_event)
+        if own_inventory:
+            inventory.start()
+
+        while time.time() - session_start_time < session_duration and not stop_event.is_set():
             if time.time() - last_message_time >= message_interval:
                 print("Application_Collecting log...")
                 last_message_time = time.time()
-
-            pods = v1.list_namespaced_pod(namespace, label_selector=f'app={application}')
-            current_pods = set(pod.metadata.name for pod in pods.items)
-            
-            new_pods = current_pods - known_pods
-            deleted_pods = known_pods - current_pods
-
-            for pod in new_pods:
-                print(f"Application_New pod detected: {pod}")
-                logger.start_capture(namespace, pod, session_duration)
-
-            for pod in deleted_pods:
-                print(f"Application_Pod deleted: {pod}")
-                logger.terminate_capture(pod)
-
-            known_pods = current_pods
-            time.sleep(1)
+            stop_event.wait(1)
 
     except KeyboardInterrupt:
         print("Application_Scan interrupted by user.")
         logger.terminate_all()
     finally:
+        if own_inventory:
+            inventory.stop()
         logger.terminate_all()
+        if logger.live_matrix is not None:
+            logger.live_matrix.stop()
+            print(f"Application_Live communication matrix saved to {logger.live_matrix.snapshot_path}")
         print("Application_Scan session ended.")
         print(f"Applicaton_Logs have been created: {logger.output_directory}")
 
 if __name__ == "__main__":
-    output_directory = "./application/pcap"
-    session_duration = 120
-    logger = NetworkTrafficLogger(output_directory)
-    namespace = "teastore"
-    application = "teastore"
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--namespace", default="teastore")
+    parser.add_argument("--application", default="teastore")
+    parser.add_argument("--duration", type=int, default=120)
+    parser.add_argument("--output-directory", default="./application/pcap")
+    parser.add_argument("--live-matrix", metavar="CSV_PATH",
+                        help="Decode captures while they run and keep a pod communication matrix snapshot here")
+    parser.add_argument("--snapshot-interval", type=float, default=10)
+    parser.add_argument("--capture-mode", choices=["pod", "node"], default="pod",
+                        help="pod runs one kubectl sniff per pod; node runs one filtered tcpdump per node "
+                             "into size/time-rotated ring files")
+    parser.add_argument("--rotate-mb", type=int, default=100)
+    parser.add_argument("--rotate-seconds", type=int, default=300)
+    parser.add_argument("--max-files", type=int, default=10, help="Ring files kept per node")
+    args = parser.parse_args()
+
+    output_directory = args.output_directory
+    session_duration = args.duration
+    live_matrix = CommunicationMatrix(args.live_matrix, args.snapshot_interval) if args.live_matrix else None
+    namespace = args.namespace
+    if args.capture_mode == "node":
+        logger = NodeCaptureManager(output_directory, namespace, rotate_bytes=args.rotate_mb * 1024 * 1024,
+                                    rotate_seconds=args.rotate_seconds, max_files=args.max_files,
+                                    live_matrix=live_matrix)
+    else:
+        logger = NetworkTrafficLogger(output_directory, live_matrix)
+    application = args.application
     monitor_application_traffic(namespace, application, logger, session_duration)
 
@@ -1,11 +1,14 @@
 import os
 import subprocess
 import re
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pcap_reader import iter_records, format_record
+from convert_cache import ConversionManifest, fingerprint
 
 pcap_directory = "./pcap"
 txt_directory = "./preapp_log"
-
-os.makedirs(txt_directory, exist_ok=True)
+app_log_directory = "./app_log"
 
 def remove_line_numbers(log_file):
     temp_file = log_file + ".tmp"
@@ -15,20 +18,76 @@ def remove_line_numbers(log_file):
             outfile.write(cleaned_line)
     os.replace(temp_file, log_file)
 
-for filename in os.listdir(pcap_directory):
-    if filename.endswith(".pcap"):
-        pcap_path = os.path.join(pcap_directory, filename)
-        txt_filename = f"{filename}.log"
-        txt_path = os.path.join(txt_directory, txt_filename)
+def decode_pcap(pcap_path, output_path):
+    temp_file = output_path + ".tmp"
+    count = 0
+    with open(temp_file, 'w') as outfile:
+        for record in iter_records(pcap_path):
+            outfile.write(format_record(record))
+            count += 1
+    os.replace(temp_file, output_path)
+    return count
+
+def convert_pcap(pcap_path, decoder):
+    # Runs in a worker process; returns the input fingerprint taken before converting and the output path.
+    input_fingerprint = fingerprint(pcap_path)
+    filename = os.path.basename(pcap_path)
+
+    if decoder == "native":
+        output_path = os.path.join(app_log_directory, f"{filename}_filtered.log")
+        count = decode_pcap(pcap_path, output_path)
+        print(f"Decoded {count} HTTP 200/MySQL packets from {pcap_path} to {output_path}")
+        return input_fingerprint, output_path
+
+    txt_filename = f"{filename}.log"
+    txt_path = os.path.join(txt_directory, txt_filename)
+
+    command = f"tshark -r {pcap_path} -t ud -T text > {txt_path}"
+    subprocess.run(command, shell=True, check=True)
+    print(f"Converted {pcap_path} to {txt_path}")
+
+    remove_line_numbers(txt_path)
+    print(f"Removed line numbers from {txt_path}")
+    return input_fingerprint, txt_path
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--decoder", choices=["native", "tshark"], default="native",
+                        help="native decodes pcaps in-process and writes filtered app_log files directly; "
+                             "tshark writes full text dumps to preapp_log for convert_app2.py")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Number of captures converted in parallel (default: number of cores)")
+    parser.add_argument("--force", action="store_true", help="Reconvert every capture, ignoring the manifest")
+    parser.add_argument("--pcap-directory", default=pcap_directory,
+                        help="Directory of the captures to convert (application_scan.py's --output-directory)")
+    args = parser.parse_args()
 
-        command = f"tshark -r {pcap_path} -t ud -T text > {txt_path}"
-        try:
-            subprocess.run(command, shell=True, check=True)
-            print(f"Converted {pcap_path} to {txt_path}")
+    output_directory = app_log_directory if args.decoder == "native" else txt_directory
+    os.makedirs(output_directory, exist_ok=True)
+    manifest = ConversionManifest(os.path.join(output_directory, ".convert_app.manifest.json"),
+                                  config={"decoder": args.decoder})
 
-            remove_line_numbers(txt_path)
-            print(f"Removed line numbers from {txt_path}")
+    pcap_paths = [os.path.join(args.pcap_directory, filename) for filename in sorted(os.listdir(args.pcap_directory))
+                  if filename.endswith(".pcap")]
+    for removed in manifest.garbage_collect(pcap_paths):
+        print(f"Removed {removed} (capture no longer exists)")
+    stale = pcap_paths if args.force else manifest.stale(pcap_paths)
+    print(f"{len(stale)} of {len(pcap_paths)} captures need converting.")
 
-        except subprocess.CalledProcessError as e:
-            print(f"Error converting {pcap_path}: {e}")
+    try:
+        with ProcessPoolExecutor(max_workers=max(1, args.workers)) as executor:
+            futures = {executor.submit(convert_pcap, pcap_path, args.decoder): pcap_path for pcap_path in stale}
+            for future in as_completed(futures):
+                pcap_path = futures[future]
+                try:
+                    input_fingerprint, output_path = future.result()
+                except Exception as e:
+                    print(f"Error converting {pcap_path}: {e}")
+                    continue
+                manifest.record(pcap_path, [output_path], input_fingerprint)
+                manifest.save()
+    finally:
+        manifest.save()
 
+if __name__ == "__main__":
+    main()
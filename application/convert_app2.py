@@ -1,26 +1,145 @@
 import os
+import re
+import mmap
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from convert_cache import ConversionManifest, fingerprint
 
 criteria = ["HTTP/1.1 200", "MYSQL"]
 
-def filter_logs(file_path):
-    with open(file_path, 'r') as f:
-        lines = f.readlines()
-        filtered_lines = [line for line in lines if any(criterion.lower() in line.lower() for criterion in criteria)]
-    return filtered_lines
+CHUNK_SIZE = 64 * 1024 * 1024
 
 log_directory = "./preapp_log"
 output_directory = "./app_log"
-os.makedirs(output_directory, exist_ok=True)
 
-log_files = [os.path.join(log_directory, file) for file in os.listdir(log_directory) if file.endswith('.log')]
+def compile_criteria(criteria):
+    # One case-insensitive alternation over all criteria, matched on raw bytes.
+    return re.compile(b"|".join(re.escape(criterion.encode()) for criterion in criteria), re.IGNORECASE)
 
-output_paths = {}
-for file in log_files:
-    filtered_lines = filter_logs(file)
-    output_file_path = os.path.join(output_directory, os.path.basename(file).replace('.log', '_filtered.log'))
-    with open(output_file_path, 'w') as output_file:
-        output_file.writelines(filtered_lines)
-    output_paths[file] = output_file_path
+def chunk_ranges(file_path, chunk_size=CHUNK_SIZE):
+    # Splits a file into (start, end) byte ranges of about chunk_size that end on a newline, so
+    # no line spans two ranges.
+    size = os.path.getsize(file_path)
+    if size == 0:
+        return []
+    ranges = []
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        start = 0
+        while start < size:
+            end = data.find(b'\n', min(start + chunk_size, size) - 1)
+            end = size if end == -1 else end + 1
+            ranges.append((start, end))
+            start = end
+    return ranges
 
-output_paths
+def filter_range(file_path, start, end, criteria):
+    # Runs in a worker process; returns the lines in [start, end) containing any criterion. The
+    # regex jumps from match to match, and each match is widened to its line, so only matching
+    # lines are touched from Python.
+    pattern = compile_criteria(criteria)
+    lines = []
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        position = start
+        while True:
+            match = pattern.search(data, position, end)
+            if match is None:
+                break
+            line_start = data.rfind(b'\n', start, match.start()) + 1 or start
+            line_end = data.find(b'\n', match.end(), end)
+            line_end = end if line_end == -1 else line_end + 1
+            lines.append(data[line_start:line_end])
+            position = line_end
+    return b"".join(lines)
 
+def output_path_for(file):
+    return os.path.join(output_directory, os.path.basename(file).replace('.log', '_filtered.log'))
+
+def file_tasks(files, chunk_size):
+    # (file, start, end, last_chunk, input_fingerprint, error) per chunk, file by file.
+    for file in files:
+        try:
+            input_fingerprint = fingerprint(file)
+            ranges = chunk_ranges(file, chunk_size) or [(0, 0)]
+        except OSError as e:
+            yield file, 0, 0, True, None, e
+            continue
+        for index, (start, end) in enumerate(ranges):
+            yield file, start, end, index == len(ranges) - 1, input_fingerprint, None
+
+def filter_files(executor, files, criteria, window, chunk_size=CHUNK_SIZE):
+    # Filters every file chunk by chunk across the pool, keeping at most `window` chunks in flight,
+    # and writes each file's matches in order. Yields (file, input_fingerprint, output_path, error)
+    # as each file finishes.
+    tasks = file_tasks(files, chunk_size)
+    in_flight = deque()
+    current = {}
+
+    def submit_next():
+        task = next(tasks, None)
+        if task is None:
+            return False
+        file, start, end = task[:3]
+        future = executor.submit(filter_range, file, start, end, criteria) if end > start else None
+        in_flight.append((task, future))
+        return True
+
+    while len(in_flight) < window and submit_next():
+        pass
+    while in_flight:
+        (file, _, _, last, input_fingerprint, error), future = in_flight.popleft()
+        submit_next()
+        if current.get("file") != file:
+            output_path = output_path_for(file)
+            current = {"file": file, "output_path": output_path, "temp": open(output_path + ".tmp", 'wb'),
+                       "error": error}
+        if current["error"] is None:
+            try:
+                current["temp"].write(future.result() if future is not None else b"")
+            except Exception as e:
+                current["error"] = e
+        if last:
+            current["temp"].close()
+            if current["error"] is None:
+                os.replace(current["output_path"] + ".tmp", current["output_path"])
+            else:
+                os.remove(current["output_path"] + ".tmp")
+            yield file, input_fingerprint, current["output_path"], current["error"]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Number of chunks filtered in parallel (default: number of cores)")
+    parser.add_argument("--criteria", nargs="+", default=criteria,
+                        help="Keep lines containing any of these strings, case-insensitively")
+    parser.add_argument("--chunk-mb", type=int, default=CHUNK_SIZE // (1024 * 1024))
+    parser.add_argument("--force", action="store_true", help="Refilter every file, ignoring the manifest")
+    args = parser.parse_args()
+
+    os.makedirs(output_directory, exist_ok=True)
+    manifest = ConversionManifest(os.path.join(output_directory, ".convert_app2.manifest.json"),
+                                  config={"criteria": args.criteria})
+
+    log_files = [os.path.join(log_directory, file) for file in sorted(os.listdir(log_directory)) if file.endswith('.log')]
+    for removed in manifest.garbage_collect(log_files):
+        print(f"Removed {removed} (source log no longer exists)")
+    stale = log_files if args.force else manifest.stale(log_files)
+    print(f"{len(stale)} of {len(log_files)} logs need filtering.")
+
+    output_paths = {}
+    try:
+        with ProcessPoolExecutor(max_workers=max(1, args.workers)) as executor:
+            for file, input_fingerprint, output_file_path, error in filter_files(
+                    executor, stale, args.criteria, 2 * max(1, args.workers), args.chunk_mb * 1024 * 1024):
+                if error is not None:
+                    print(f"Error filtering {file}: {error}")
+                    continue
+                manifest.record(file, [output_file_path], input_fingerprint)
+                manifest.save()
+                output_paths[file] = output_file_path
+    finally:
+        manifest.save()
+    return output_paths
+
+if __name__ == "__main__":
+    main()
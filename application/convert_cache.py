@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+
+HASH_BLOCK_SIZE = 1 << 20
+
+def content_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def fingerprint(path):
+    # Taken before a conversion starts, so an input modified mid-conversion is seen as stale next run.
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": content_hash(path)}
+
+class ConversionManifest:
+    # Remembers, per input file, the size, mtime and sha256 it had when it was last converted and
+    # the outputs that conversion produced. An input is up to date when its outputs still exist and
+    # either size+mtime match or (after a touch/copy) its content hash still matches. `config`
+    # captures the stage settings; a different config invalidates every entry.
+    def __init__(self, path, config=None):
+        self.path = path
+        self.config = config
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+                if data.get("config") == config:
+                    self.entries = data.get("entries", {})
+                else:
+                    # Settings changed: keep the entries only so their outputs can still be collected.
+                    self.entries = {key: dict(entry, sha256=None) for key, entry in data.get("entries", {}).items()}
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable manifest {path}: {e}")
+
+    def key(self, input_path):
+        return os.path.abspath(input_path)
+
+    def is_current(self, input_path):
+        entry = self.entries.get(self.key(input_path))
+        if entry is None or entry.get("sha256") is None:
+            return False
+        if not all(os.path.exists(output) for output in entry["outputs"]):
+            return False
+        stat = os.stat(input_path)
+        if stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime_ns"]:
+            return True
+        if stat.st_size != entry["size"] or content_hash(input_path) != entry["sha256"]:
+            return False
+        entry["mtime_ns"] = stat.st_mtime_ns
+        return True
+
+    def stale(self, input_paths):
+        return [path for path in input_paths if not self.is_current(path)]
+
+    def record(self, input_path, outputs, input_fingerprint=None):
+        entry = dict(input_fingerprint or fingerprint(input_path))
+        entry["outputs"] = [os.path.abspath(output) for output in outputs]
+        self.entries[self.key(input_path)] = entry
+
+    def garbage_collect(self, input_paths):
+        # Drops entries for inputs that no longer exist and deletes the outputs they produced.
+        current = {self.key(path) for path in input_paths}
+        removed = []
+        for key in list(self.entries):
+            if key in current:
+                continue
+            for output in self.entries.pop(key)["outputs"]:
+                if os.path.exists(output):
+                    os.remove(output)
+                    removed.append(output)
+        return removed
+
+    def save(self):
+        temp_file = self.path + ".tmp"
+        with open(temp_file, 'w') as f:
+            json.dump({"config": self.config, "entries": self.entries}, f, indent=1)
+        os.replace(temp_file, self.path)
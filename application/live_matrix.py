@@ -0,0 +1,89 @@
+import os
+import threading
+from prometheus_client import Gauge
+
+POD_TRAFFIC_PACKETS = Gauge(
+    "scanner_pod_traffic_packets",
+    "HTTP 200/MySQL packets seen between two pods during the live capture",
+    ["src_pod", "dst_pod"])
+
+POD_TRAFFIC_BYTES = Gauge(
+    "scanner_pod_traffic_bytes",
+    "Bytes of HTTP 200/MySQL packets seen between two pods during the live capture",
+    ["src_pod", "dst_pod"])
+
+class CommunicationMatrix:
+    # Pod x pod packet/byte counters fed by the live capture decoders. Packets are attributed
+    # through the pod IPs the PodInventory reports, so the matrix only counts traffic between
+    # pods that are currently being scanned.
+    def __init__(self, snapshot_path, snapshot_interval=10):
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self.packets = {}
+        self.bytes = {}
+        self.ip_to_pod = {}
+        self.pods = set()
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        directory = os.path.dirname(snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def handle_pod_event(self, event, info):
+        # PodInventory subscriber.
+        with self.lock:
+            if event == "deleted":
+                if self.ip_to_pod.get(info.ip) == info.name:
+                    del self.ip_to_pod[info.ip]
+            elif info.ip:
+                self.ip_to_pod[info.ip] = info.name
+                self.pods.add(info.name)
+
+    def add(self, records):
+        with self.lock:
+            for _, src_ip, dst_ip, length, _ in records:
+                src_pod = self.ip_to_pod.get(src_ip)
+                dst_pod = self.ip_to_pod.get(dst_ip)
+                if src_pod is None or dst_pod is None:
+                    continue
+                key = (src_pod, dst_pod)
+                self.packets[key] = self.packets.get(key, 0) + 1
+                self.bytes[key] = self.bytes.get(key, 0) + length
+
+    def snapshot(self):
+        with self.lock:
+            pods = sorted(self.pods)
+            packets = dict(self.packets)
+            traffic = dict(self.bytes)
+
+        for (src_pod, dst_pod), count in packets.items():
+            POD_TRAFFIC_PACKETS.labels(src_pod, dst_pod).set(count)
+            POD_TRAFFIC_BYTES.labels(src_pod, dst_pod).set(traffic[(src_pod, dst_pod)])
+
+        # Same layout as the pod_communication_counts.csv written by analysis/visualization.py
+        # (rows are destinations, columns are sources), so the recommenders can read it directly.
+        temp_file = self.snapshot_path + ".tmp"
+        with open(temp_file, 'w') as f:
+            f.write("," + ",".join(pods) + "\n")
+            for dst_pod in pods:
+                row = [str(packets.get((src_pod, dst_pod), 0)) for src_pod in pods]
+                f.write(dst_pod + "," + ",".join(row) + "\n")
+        os.replace(temp_file, self.snapshot_path)
+
+    def snapshot_loop(self):
+        while not self.stop_event.wait(self.snapshot_interval):
+            try:
+                self.snapshot()
+            except Exception as e:
+                print(f"Application_Error writing communication matrix snapshot: {e}")
+
+    def start(self):
+        self.thread = threading.Thread(target=self.snapshot_loop, name="CommunicationMatrix", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.snapshot()
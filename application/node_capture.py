@@ -0,0 +1,206 @@
+import os
+import re
+import subprocess
+import threading
+import time
+from datetime import datetime
+from pcap_reader import PCAP_HEADER, PcapStreamDecoder, parse_global_header, complete_records_end
+from scan_metrics import ACTIVE_CAPTURES
+
+DEBUG_POD_PATTERN = re.compile(r"Creating debugging pod (\S+)")
+
+class RingPcapWriter:
+    # Writes a pcap stream into size/time-rotated files, keeping only the newest max_files.
+    # Files are only cut between records and every file starts with the stream's global header,
+    # so each one is a valid pcap on its own.
+    def __init__(self, output_directory, prefix, rotate_bytes=100 * 1024 * 1024, rotate_seconds=300, max_files=10):
+        self.output_directory = output_directory
+        self.prefix = prefix
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.max_files = max_files
+        self.global_header = None
+        self.pending = bytearray()
+        self.file = None
+        self.file_bytes = 0
+        self.file_opened = 0
+        self.files = []
+
+    def feed(self, data):
+        self.pending += data
+        if self.global_header is None:
+            if len(self.pending) < PCAP_HEADER.size:
+                return
+            self.global_header = bytes(self.pending[:PCAP_HEADER.size])
+            self.record_header = parse_global_header(self.global_header)[0]
+            del self.pending[:PCAP_HEADER.size]
+
+        end = complete_records_end(self.pending, 0, len(self.pending), self.record_header)
+        if end == 0:
+            return
+        if (self.file is None or self.file_bytes >= self.rotate_bytes
+                or time.time() - self.file_opened >= self.rotate_seconds):
+            self.rotate()
+        self.file.write(self.pending[:end])
+        self.file_bytes += end
+        del self.pending[:end]
+
+    def new_stream(self):
+        # The next feed() starts a fresh pcap stream (e.g. a restarted tcpdump) in a new file;
+        # the ring keeps counting files across streams.
+        self.close()
+        self.global_header = None
+        self.pending = bytearray()
+
+    def rotate(self):
+        self.close()
+        start_time = datetime.now().strftime("%Y%m%d_%H%M%S.%f")
+        path = os.path.join(self.output_directory, f"{self.prefix}_{start_time}.pcap")
+        self.file = open(path, 'wb')
+        self.file.write(self.global_header)
+        self.file_bytes = len(self.global_header)
+        self.file_opened = time.time()
+        self.files.append(path)
+        while len(self.files) > self.max_files:
+            oldest = self.files.pop(0)
+            if os.path.exists(oldest):
+                os.remove(oldest)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+class NodeCaptureManager:
+    # Runs one tcpdump per node (in a `kubectl debug node/...` pod on the host network) filtered
+    # on the IPs of the target pods scheduled there, instead of one kubectl sniff per pod. The
+    # target set follows PodInventory events; a node's capture is restarted with the new filter
+    # once its pod set has been stable for restart_delay seconds. The node_<node>_*.pcap ring
+    # files are not split per pod: convert_app.py converts them like any other capture and
+    # comm_matrix.py attributes each packet to pods by its IPs (see ip_index.py).
+    def __init__(self, output_directory, namespace, image="nicolaka/netshoot", rotate_bytes=100 * 1024 * 1024,
+                 rotate_seconds=300, max_files=10, restart_delay=2, live_matrix=None):
+        os.makedirs(output_directory, exist_ok=True)
+        self.output_directory = output_directory
+        self.namespace = namespace
+        self.image = image
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.max_files = max_files
+        self.restart_delay = restart_delay
+        self.live_matrix = live_matrix
+        self.targets = {}
+        self.writers = {}
+        self.active_processes = {}
+        self.lock = threading.Lock()
+        self.changed = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = None
+        ACTIVE_CAPTURES.labels(output_directory).set_function(lambda: len(self.active_processes))
+
+    def handle_pod_event(self, event, info):
+        # PodInventory subscriber: a pod becomes a capture target once it is ready.
+        if info.node_name is None or info.ip is None:
+            return
+        with self.lock:
+            if event == "ready":
+                self.targets.setdefault(info.node_name, set()).add(info.ip)
+            elif event == "deleted":
+                self.targets.get(info.node_name, set()).discard(info.ip)
+            else:
+                return
+        self.changed.set()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.reconcile_loop, name="NodeCaptureManager", daemon=True)
+        self.thread.start()
+
+    def reconcile_loop(self):
+        while not self.stop_event.is_set():
+            if not self.changed.wait(timeout=1):
+                continue
+            # Debounce: let a burst of pod events settle before restarting captures.
+            while self.changed.is_set() and not self.stop_event.is_set():
+                self.changed.clear()
+                self.stop_event.wait(self.restart_delay)
+            if self.stop_event.is_set():
+                return
+            self.reconcile()
+
+    def reconcile(self):
+        with self.lock:
+            desired = {node: frozenset(ips) for node, ips in self.targets.items() if ips}
+        for node in list(self.active_processes):
+            if desired.get(node) != self.active_processes[node][1]:
+                self.terminate_capture(node)
+        for node, ips in desired.items():
+            if node not in self.active_processes:
+                self.capture_node(node, ips)
+
+    def capture_node(self, node, ips):
+        capture_filter = " or ".join(f"host {ip}" for ip in sorted(ips))
+        command = ["kubectl", "debug", f"node/{node}", "-n", self.namespace, "-i", f"--image={self.image}",
+                   "--profile=sysadmin", "--", "tcpdump", "-i", "any", "-U", "-s", "0", "-w", "-", capture_filter]
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        capture = {"debug_pod": None}
+        if node not in self.writers:
+            self.writers[node] = RingPcapWriter(self.output_directory, f"node_{node}", self.rotate_bytes,
+                                                self.rotate_seconds, self.max_files)
+        writer = self.writers[node]
+        writer.new_stream()
+        capture["reader"] = threading.Thread(target=self.stream_capture, args=(node, process, writer),
+                                             name=f"NodeCapture_{node}", daemon=True)
+        capture["reader"].start()
+        threading.Thread(target=self.watch_stderr, args=(process, capture), name=f"NodeCaptureLog_{node}",
+                         daemon=True).start()
+        self.active_processes[node] = (process, ips, capture)
+        print(f"Application_Capturing {len(ips)} pod(s) on node {node}")
+
+    def stream_capture(self, node, process, writer, chunk_size=65536):
+        # As in NetworkTrafficLogger.stream_capture, a decoder error only stops live decoding;
+        # the ring files keep being written until EOF.
+        decoder = PcapStreamDecoder() if self.live_matrix is not None else None
+        try:
+            for chunk in iter(lambda: process.stdout.read1(chunk_size), b''):
+                writer.feed(chunk)
+                if decoder is None:
+                    continue
+                try:
+                    self.live_matrix.add(decoder.feed(chunk))
+                except Exception as e:
+                    print(f"Application_Error decoding live capture for node {node}, "
+                          f"live decoding stopped for this node: {e}")
+                    decoder = None
+        except Exception as e:
+            print(f"Application_Error reading node capture for {node}: {e}")
+        finally:
+            writer.close()
+            process.stdout.close()
+
+    def watch_stderr(self, process, capture):
+        for line in iter(process.stderr.readline, b''):
+            match = DEBUG_POD_PATTERN.search(line.decode(errors="replace"))
+            if match:
+                capture["debug_pod"] = match.group(1)
+        process.stderr.close()
+
+    def terminate_capture(self, node):
+        if node not in self.active_processes:
+            return
+        process, _, capture = self.active_processes.pop(node)
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        # Let the reader drain before a restarted capture reuses the node's ring writer.
+        capture["reader"].join()
+        if capture["debug_pod"]:
+            # kubectl debug leaves its pod behind once we detach.
+            subprocess.run(["kubectl", "delete", "pod", capture["debug_pod"], "-n", self.namespace, "--wait=false"],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def terminate_all(self):
+        self.stop_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        for node in list(self.active_processes):
+            self.terminate_capture(node)
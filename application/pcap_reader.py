@@ -0,0 +1,186 @@
+import mmap
+import socket
+import struct
+from datetime import datetime, timezone
+
+PCAP_HEADER = struct.Struct("<IHHiIII")
+RECORD_HEADER_LE = struct.Struct("<IIII")
+RECORD_HEADER_BE = struct.Struct(">IIII")
+
+MAGIC_USEC = 0xa1b2c3d4
+MAGIC_NSEC = 0xa1b23c4d
+
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_LINUX_SLL2 = 276
+RAW_LINKTYPES = (LINKTYPE_RAW, 12, 14)
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_VLAN = (0x8100, 0x88a8)
+IPPROTO_TCP = 6
+
+MYSQL_PORT = 3306
+HTTP_200 = b"HTTP/1.1 200"
+
+KIND_HTTP_200 = "HTTP"
+KIND_MYSQL = "MySQL"
+
+class PcapFormatError(Exception):
+    pass
+
+def parse_global_header(buf):
+    if len(buf) < PCAP_HEADER.size:
+        raise PcapFormatError("truncated pcap global header")
+    magic = struct.unpack_from("<I", buf, 0)[0]
+    if magic in (MAGIC_USEC, MAGIC_NSEC):
+        record_header = RECORD_HEADER_LE
+        linktype = struct.unpack_from("<I", buf, 20)[0]
+    elif magic in (0xd4c3b2a1, 0x4d3cb2a1):
+        record_header = RECORD_HEADER_BE
+        linktype = struct.unpack_from(">I", buf, 20)[0]
+        magic = struct.unpack_from(">I", buf, 0)[0]
+    else:
+        raise PcapFormatError("not a pcap file (pcapng is not supported)")
+    ts_divisor = 1e9 if magic == MAGIC_NSEC else 1e6
+    return record_header, ts_divisor, linktype & 0xffff
+
+def network_offset(buf, offset, caplen, linktype):
+    # Returns the offset of the IPv4 header inside the frame, or None for anything else.
+    if linktype == LINKTYPE_ETHERNET:
+        if caplen < 14:
+            return None
+        ethertype = struct.unpack_from(">H", buf, offset + 12)[0]
+        l3 = 14
+        while ethertype in ETHERTYPE_VLAN and caplen >= l3 + 4:
+            ethertype = struct.unpack_from(">H", buf, offset + l3 + 2)[0]
+            l3 += 4
+    elif linktype == LINKTYPE_LINUX_SLL:
+        if caplen < 16:
+            return None
+        ethertype = struct.unpack_from(">H", buf, offset + 14)[0]
+        l3 = 16
+    elif linktype == LINKTYPE_LINUX_SLL2:
+        if caplen < 20:
+            return None
+        ethertype = struct.unpack_from(">H", buf, offset)[0]
+        l3 = 20
+    elif linktype in RAW_LINKTYPES:
+        ethertype = ETHERTYPE_IPV4 if caplen and buf[offset] >> 4 == 4 else None
+        l3 = 0
+    else:
+        return None
+    return l3 if ethertype == ETHERTYPE_IPV4 else None
+
+def decode_frame(buf, offset, caplen, linktype, ip_cache):
+    # Returns (src_ip, dst_ip, src_port, dst_port, payload_offset, payload_end) for IPv4/TCP
+    # frames, reading straight out of buf without copying the frame.
+    l3 = network_offset(buf, offset, caplen, linktype)
+    if l3 is None or caplen < l3 + 20:
+        return None
+    ip = offset + l3
+    version_ihl = buf[ip]
+    if version_ihl >> 4 != 4 or buf[ip + 9] != IPPROTO_TCP:
+        return None
+    ihl = (version_ihl & 0x0f) * 4
+    total_length = struct.unpack_from(">H", buf, ip + 2)[0]
+    tcp = ip + ihl
+    frame_end = offset + caplen
+    if tcp + 20 > frame_end:
+        return None
+    src_port, dst_port = struct.unpack_from(">HH", buf, tcp)
+    data_offset = (buf[tcp + 12] >> 4) * 4
+    payload_end = min(ip + total_length, frame_end) if total_length else frame_end
+
+    src_raw = bytes(buf[ip + 12:ip + 16])
+    dst_raw = bytes(buf[ip + 16:ip + 20])
+    src_ip = ip_cache.get(src_raw)
+    if src_ip is None:
+        src_ip = ip_cache[src_raw] = socket.inet_ntoa(src_raw)
+    dst_ip = ip_cache.get(dst_raw)
+    if dst_ip is None:
+        dst_ip = ip_cache[dst_raw] = socket.inet_ntoa(dst_raw)
+    return src_ip, dst_ip, src_port, dst_port, tcp + data_offset, payload_end
+
+def classify(buf, src_port, dst_port, payload_offset, payload_end):
+    if payload_end <= payload_offset:
+        return None
+    if buf[payload_offset:payload_offset + len(HTTP_200)] == HTTP_200:
+        return KIND_HTTP_200
+    if src_port == MYSQL_PORT or dst_port == MYSQL_PORT:
+        return KIND_MYSQL
+    return None
+
+def iter_buffer_records(buf, offset, end, record_header, ts_divisor, linktype, ip_cache, all_packets=False):
+    # Yields (timestamp, src_ip, dst_ip, bytes, kind) for every complete record in buf[offset:end].
+    header_size = record_header.size
+    while offset + header_size <= end:
+        ts_sec, ts_frac, caplen, origlen = record_header.unpack_from(buf, offset)
+        frame = offset + header_size
+        next_offset = frame + caplen
+        if next_offset > end:
+            return
+        decoded = decode_frame(buf, frame, caplen, linktype, ip_cache)
+        if decoded is not None:
+            src_ip, dst_ip, src_port, dst_port, payload_offset, payload_end = decoded
+            kind = classify(buf, src_port, dst_port, payload_offset, payload_end)
+            if kind is not None or all_packets:
+                yield ts_sec + ts_frac / ts_divisor, src_ip, dst_ip, origlen, kind or "TCP"
+        offset = next_offset
+
+def complete_records_end(buf, offset, end, record_header):
+    while offset + record_header.size <= end:
+        record_end = offset + record_header.size + record_header.unpack_from(buf, offset)[2]
+        if record_end > end:
+            break
+        offset = record_end
+    return offset
+
+def iter_records(path, all_packets=False):
+    # Streams (timestamp, src_ip, dst_ip, bytes, kind) records out of a pcap file in one pass
+    # over an mmap. Only HTTP 200 responses and MySQL packets are emitted unless all_packets is set.
+    with open(path, "rb") as f:
+        try:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return  # empty file
+        try:
+            record_header, ts_divisor, linktype = parse_global_header(buf)
+            ip_cache = {}
+            for record in iter_buffer_records(buf, PCAP_HEADER.size, len(buf), record_header, ts_divisor,
+                                                 linktype, ip_cache, all_packets):
+                yield record
+        finally:
+            buf.close()
+
+def format_record(record):
+    # Mirrors the columns of `tshark -t ud -T text` so the app_log consumers parse it unchanged.
+    timestamp, src_ip, dst_ip, length, kind = record
+    when = datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")
+    info = HTTP_200.decode() if kind == KIND_HTTP_200 else ""
+    return f"{when} {src_ip} → {dst_ip} {kind} {length} {info}".rstrip() + "\n"
+
+class PcapStreamDecoder:
+    # Incremental counterpart of iter_records for a pcap byte stream (e.g. `kubectl sniff -o -`):
+    # feed() arbitrary chunks and get back the records completed so far. Memory stays bounded by
+    # the largest partial record.
+    def __init__(self, all_packets=False):
+        self.all_packets = all_packets
+        self.buf = bytearray()
+        self.header = None
+        self.ip_cache = {}
+
+    def feed(self, data):
+        self.buf += data
+        if self.header is None:
+            if len(self.buf) < PCAP_HEADER.size:
+                return []
+            self.header = parse_global_header(self.buf)
+            del self.buf[:PCAP_HEADER.size]
+
+        record_header, ts_divisor, linktype = self.header
+        end = complete_records_end(self.buf, 0, len(self.buf), record_header)
+        records = list(iter_buffer_records(self.buf, 0, end, record_header, ts_divisor, linktype,
+                                           self.ip_cache, self.all_packets))
+        del self.buf[:end]
+        return records
@@ -0,0 +1,161 @@
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from kubernetes import client
+
+POD_LIST_PATH = re.compile(r'^/api/v1/namespaces/([^/]+)/pods$')
+POD_PATH = re.compile(r'^/api/v1/namespaces/([^/]+)/pods/([^/]+)$')
+
+class FakeKubernetes:
+    # Local stand-in for the parts of the Kubernetes API CoreV1Api uses here: listing and
+    # watching pods (list_namespaced_pod, as PodInventory does) and read_namespaced_pod. Pods come
+    # from a SyntheticCluster; replace_pods() deletes and recreates pods so watches see churn.
+    # api() returns a real CoreV1Api pointed at this server.
+    def __init__(self, cluster, host="127.0.0.1", port=0):
+        self.cluster = cluster
+        self.resource_version = 1
+        self.pods = {name: cluster.pod_manifest(i, self.resource_version) for i, name in enumerate(cluster.pods)}
+        self.events = []
+        self.changed = threading.Condition()
+        self.stopping = False
+        self.requests = 0
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                fake.handle(self, url.path, {key: values[0] for key, values in parse_qs(url.query).items()})
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="FakeKubernetes", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        with self.changed:
+            self.stopping = True
+            self.changed.notify_all()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def configuration(self):
+        configuration = client.Configuration()
+        configuration.host = self.url
+        return configuration
+
+    def api(self, pool_size=16):
+        configuration = self.configuration()
+        configuration.connection_pool_maxsize = pool_size
+        return client.CoreV1Api(client.ApiClient(configuration))
+
+    def replace_pods(self, names):
+        # Deletes the named pods and recreates each under a new name with the same IP (and the
+        # same memory series in FakePrometheus).
+        with self.changed:
+            for name in names:
+                pod = self.pods.pop(name)
+                self.resource_version += 1
+                pod["metadata"]["resourceVersion"] = str(self.resource_version)
+                self.events.append((self.resource_version, "DELETED", pod))
+                replacement = json.loads(json.dumps(pod))
+                self.resource_version += 1
+                replacement["metadata"]["name"] = f"{name[:-5]}{self.resource_version % 100000:05d}"
+                replacement["metadata"]["resourceVersion"] = str(self.resource_version)
+                self.pods[replacement["metadata"]["name"]] = replacement
+                self.cluster.index[replacement["metadata"]["name"]] = self.cluster.index[name]
+                self.events.append((self.resource_version, "ADDED", replacement))
+            self.changed.notify_all()
+
+    def selected(self, pod, namespace, label_selector):
+        if pod["metadata"]["namespace"] != namespace:
+            return False
+        labels = pod["metadata"]["labels"]
+        for requirement in filter(None, (label_selector or "").split(",")):
+            key, _, value = requirement.partition("=")
+            if labels.get(key.strip()) != value.strip():
+                return False
+        return True
+
+    def handle(self, request, path, params):
+        self.requests += 1
+        match = POD_PATH.match(path)
+        if match:
+            pod = self.pods.get(match.group(2))
+            if pod is None or pod["metadata"]["namespace"] != match.group(1):
+                self.send_json(request, 404, {"kind": "Status", "apiVersion": "v1", "status": "Failure",
+                                              "reason": "NotFound", "code": 404})
+            else:
+                self.send_json(request, 200, pod)
+            return
+        match = POD_LIST_PATH.match(path)
+        if not match:
+            request.send_error(404)
+            return
+        namespace, label_selector = match.group(1), params.get("labelSelector")
+        if params.get("watch") == "true":
+            self.watch(request, namespace, label_selector, int(params.get("resourceVersion") or 0),
+                       float(params.get("timeoutSeconds", 300)))
+            return
+        with self.changed:
+            items = [pod for pod in self.pods.values() if self.selected(pod, namespace, label_selector)]
+            resource_version = self.resource_version
+        self.send_json(request, 200, {"kind": "PodList", "apiVersion": "v1",
+                                      "metadata": {"resourceVersion": str(resource_version)}, "items": items})
+
+    def watch(self, request, namespace, label_selector, resource_version, timeout):
+        # Streams the events after resource_version as JSON lines, one HTTP chunk per batch, until
+        # timeout, like the API server does.
+        request.send_response(200)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Transfer-Encoding", "chunked")
+        request.end_headers()
+        sent = resource_version
+        deadline = time.monotonic() + timeout
+        with self.changed:
+            while not self.stopping:
+                pending = [event for event in self.events if event[0] > sent]
+                if not pending:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.changed.wait(remaining)
+                    continue
+                # Written without the lock, so a slow client does not hold up replace_pods.
+                self.changed.release()
+                try:
+                    lines = b"".join(json.dumps({"type": event_type, "object": pod}).encode() + b"\n"
+                                     for _, event_type, pod in pending
+                                     if self.selected(pod, namespace, label_selector))
+                    sent = pending[-1][0]
+                    if lines:
+                        request.wfile.write(b"%x\r\n%s\r\n" % (len(lines), lines))
+                        request.wfile.flush()
+                except OSError:
+                    return
+                finally:
+                    self.changed.acquire()
+        try:
+            request.wfile.write(b"0\r\n\r\n")
+        except OSError:
+            pass
+
+    def send_json(self, request, status, payload):
+        body = json.dumps(payload).encode()
+        request.send_response(status)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
@@ -0,0 +1,98 @@
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# The label matchers cluster_scan.py puts in its container_memory_working_set_bytes queries.
+MATCHER_PATTERN = re.compile(r'(\w+)(=~|=)"([^"]*)"')
+# pod=~"a|b|c" as get_pods_metrics builds it: an alternation of (regex-escaped) pod names.
+NAME_ALTERNATION = re.compile(r'(?:[\w-]|\\[.-])+(?:\|(?:[\w-]|\\[.-])+)*')
+
+class FakePrometheus:
+    # Local stand-in for the Prometheus HTTP API cluster_scan.py queries: /api/v1/query (GET or
+    # POST) and /api/v1/query_range, answering sum(container_memory_working_set_bytes{...}) by
+    # (pod[, node]) from a SyntheticCluster. Only the namespace and pod label matchers are
+    # honoured, which is all the scanner sends.
+    def __init__(self, cluster, host="127.0.0.1", port=0):
+        self.cluster = cluster
+        self.queries = 0
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                fake.handle(self, url.path, parse_qs(url.query))
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+                fake.handle(self, urlparse(self.path).path, parse_qs(body))
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="FakePrometheus", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def matching_pods(self, query):
+        matchers = {label: (operator, value) for label, operator, value in MATCHER_PATTERN.findall(query)}
+        namespace = matchers.get("namespace")
+        if namespace is not None and namespace[1] != self.cluster.namespace:
+            return []
+        # [(pod, index)]; cluster.index also holds pods FakeKubernetes.replace_pods recreated.
+        operator, value = matchers.get("pod", ("=~", ".*"))
+        # The value is a PromQL string literal; undo its escaping first.
+        value = re.sub(r'\\(.)', r'\1', value)
+        if operator == "=" or NAME_ALTERNATION.fullmatch(value):
+            # Looked up by name, so the fake's own cost stays flat as the pod list grows.
+            names = [value] if operator == "=" else [re.sub(r'\\(.)', r'\1', name) for name in value.split("|")]
+            return [(pod, self.cluster.index[pod]) for pod in names if pod in self.cluster.index]
+        pattern = re.compile(value)
+        return [(pod, i) for pod, i in list(self.cluster.index.items()) if pattern.fullmatch(pod)]
+
+    def series_labels(self, by_node, pod, i):
+        labels = {"pod": pod}
+        if by_node:
+            labels["node"] = self.cluster.pod_nodes[i]
+        return labels
+
+    def handle(self, request, path, params):
+        self.queries += 1
+        query = params.get("query", [""])[0]
+        by_node = "node" in query.rpartition(" by ")[2]
+        if path == "/api/v1/query":
+            timestamp = float(params.get("time", [time.time()])[0])
+            result = [{"metric": self.series_labels(by_node, pod, i),
+                       "value": [timestamp, str(self.cluster.memory(i, timestamp))]}
+                      for pod, i in self.matching_pods(query)]
+            data = {"resultType": "vector", "result": result}
+        elif path == "/api/v1/query_range":
+            start, end, step = (float(params[key][0]) for key in ("start", "end", "step"))
+            steps = [start + n * step for n in range(int((end - start) // step) + 1)]
+            result = [{"metric": self.series_labels(by_node, pod, i),
+                       "values": [[timestamp, str(self.cluster.memory(i, timestamp))] for timestamp in steps]}
+                      for pod, i in self.matching_pods(query)]
+            data = {"resultType": "matrix", "result": result}
+        else:
+            request.send_error(404)
+            return
+        body = json.dumps({"status": "success", "data": data}).encode()
+        request.send_response(200)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
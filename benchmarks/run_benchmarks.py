@@ -0,0 +1,294 @@
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIRECTORY = os.path.dirname(BENCHMARK_DIRECTORY)
+sys.path.append(os.path.join(ROOT_DIRECTORY, 'cluster'))
+sys.path.append(os.path.join(ROOT_DIRECTORY, 'analysis'))
+import cluster_scan
+from cluster_scan import MonitorLogger, TickScheduler, collect_batch, collect_per_pod
+from pod_inventory import PodInventory
+from comm_matrix import build_matrix
+from ip_index import IpIntervalIndex
+from visualization import matrix_to_frame
+from recommend_1 import suggest_optimal_placement
+from synthetic import (SyntheticCluster, write_pcaps, write_text_dumps, write_cluster_logs, write_ip_lifetimes)
+from fake_prometheus import FakePrometheus
+from fake_kubernetes import FakeKubernetes
+
+STAGES = ["inventory_relist", "inventory_churn", "collector_tick_batch", "collector_tick_per_pod",
+          "monitor_logger_json", "monitor_logger_columnar", "convert_app", "convert_app2", "build_matrix", "priority",
+          "suggest_optimal_placement"]
+
+# Stages that hold pod x pod matrices, which grow quadratically.
+MATRIX_STAGES = ("build_matrix", "suggest_optimal_placement")
+
+class Workspace:
+    # A scratch copy of the directory layout the scripts expect (they use paths relative to
+    # their own directory), filled with the synthetic data the selected stages read. convert_app2.py
+    # gets its own application directory so its app_log output does not mix with convert_app.py's.
+    def __init__(self, root, cluster, args):
+        stages = set(args.stages)
+        self.root = root
+        self.application = os.path.join(root, "application")
+        self.text_application = os.path.join(root, "text", "application")
+        self.cl_log = os.path.join(root, "cluster", "cl_log")
+        self.analysis = os.path.join(root, "analysis")
+        os.makedirs(self.analysis, exist_ok=True)
+        os.makedirs(os.path.join(self.application, "app_log"), exist_ok=True)
+        os.makedirs(os.path.join(self.text_application, "app_log"), exist_ok=True)
+        self.packets = self.lines = self.samples = 0
+        if "convert_app" in stages or any(stage in stages and not skip_reason(stage, len(cluster), args)
+                                          for stage in MATRIX_STAGES):
+            self.packets = write_pcaps(cluster, os.path.join(self.application, "pcap"), args.packets)
+        if "convert_app2" in stages:
+            self.lines = write_text_dumps(cluster, os.path.join(self.text_application, "preapp_log"), args.packets)
+        if "priority" in stages:
+            self.samples = write_cluster_logs(cluster, self.cl_log, args.samples)
+        self.ip_lifetimes = os.path.join(self.cl_log, "pod_ip_lifetimes.jsonl")
+        write_ip_lifetimes(cluster, self.ip_lifetimes)
+
+def run_script(script, cwd, *arguments):
+    subprocess.run([sys.executable, os.path.join(ROOT_DIRECTORY, script), *arguments], cwd=cwd, check=True,
+                   stdout=subprocess.DEVNULL, stdin=subprocess.DEVNULL)
+
+class Benchmarks:
+    # One method per stage, each returning (seconds, items processed) for a single run with any
+    # setup kept outside the timed part.
+    def __init__(self, cluster, workspace, args):
+        self.cluster = cluster
+        self.workspace = workspace
+        self.args = args
+        self.kubernetes = FakeKubernetes(cluster).start()
+        self.prometheus = FakePrometheus(cluster).start()
+        cluster_scan.prometheus_url = self.prometheus.url
+        self.v1 = self.kubernetes.api(args.pool_size)
+        self.inventory = PodInventory(self.v1, cluster.namespace, f"app={cluster.application}", watch_timeout=1)
+        self.inventory.start()
+        self.scheduler = TickScheduler(1, max_workers=args.pool_size)
+        self.tick_logger = MonitorLogger(os.path.join(workspace.root, "tick_log"), backend="columnar")
+        self.routes = None
+
+    def close(self):
+        self.tick_logger.close_all()
+        self.scheduler.shutdown()
+        self.inventory.stop()
+        self.kubernetes.stop()
+        self.prometheus.stop()
+
+    def inventory_relist(self):
+        start = time.perf_counter()
+        self.inventory.relist()
+        return time.perf_counter() - start, len(self.cluster)
+
+    def inventory_churn(self, timeout=60):
+        # How quickly a rolling restart reaches the pod watch: a tenth of the pods are replaced
+        # (deleted and recreated under new names) and the clock stops once the inventory has
+        # caught up with the server.
+        replaced = sorted(self.inventory.names())[:max(1, len(self.cluster) // 10)]
+        start = time.perf_counter()
+        self.kubernetes.replace_pods(replaced)
+        with self.kubernetes.changed:
+            expected = set(self.kubernetes.pods)
+        while set(self.inventory.names()) != expected:
+            if time.perf_counter() - start > timeout:
+                raise RuntimeError(f"pod watch did not reflect {len(replaced)} replaced pods within {timeout}s")
+            time.sleep(0.001)
+        return time.perf_counter() - start, len(replaced)
+
+    def collector_tick_batch(self):
+        pod_nodes = {name: info.node_name for name, info in self.inventory.snapshot().items()}
+        start = time.perf_counter()
+        collect_batch(self.cluster.namespace, pod_nodes, time.time(), time.time() + 60, self.tick_logger)
+        return time.perf_counter() - start, len(pod_nodes)
+
+    def collector_tick_per_pod(self):
+        pods = self.inventory.names()
+        start = time.perf_counter()
+        collect_per_pod(self.v1, self.cluster.namespace, pods, time.time(), time.time() + 60, self.tick_logger,
+                        self.scheduler)
+        return time.perf_counter() - start, len(pods)
+
+    def monitor_logger(self, backend):
+        # Write rate through the whole logger: buffering, the background writer and the final flush.
+        # Blocking rather than dropping when the queue fills, so every sample is written.
+        directory = tempfile.mkdtemp(dir=self.workspace.root)
+        logger = MonitorLogger(directory, backend=backend, backpressure="block")
+        start_time = self.cluster.start_time
+        samples = [(start_time + n, [self.cluster.memory(i, start_time + n) for i in range(len(self.cluster))])
+                   for n in range(self.args.samples)]
+        start = time.perf_counter()
+        for timestamp, memory in samples:
+            for pod_name, node_name, memory_usage in zip(self.cluster.pods, self.cluster.pod_nodes, memory):
+                logger.log(timestamp, pod_name, node_name, memory_usage)
+        logger.close_all()
+        seconds = time.perf_counter() - start
+        shutil.rmtree(directory)
+        return seconds, len(self.cluster) * self.args.samples
+
+    def monitor_logger_json(self):
+        return self.monitor_logger("json")
+
+    def monitor_logger_columnar(self):
+        return self.monitor_logger("columnar")
+
+    def convert_app(self):
+        start = time.perf_counter()
+        run_script("application/convert_app.py", self.workspace.application, "--force")
+        return time.perf_counter() - start, self.workspace.packets
+
+    def convert_app2(self):
+        start = time.perf_counter()
+        run_script("application/convert_app2.py", self.workspace.text_application, "--force")
+        return time.perf_counter() - start, self.workspace.lines
+
+    def filtered_logs(self):
+        filenames = glob.glob(os.path.join(self.workspace.application, "app_log", "*_filtered.log"))
+        if not filenames:
+            run_script("application/convert_app.py", self.workspace.application)
+            filenames = glob.glob(os.path.join(self.workspace.application, "app_log", "*_filtered.log"))
+        return filenames
+
+    def build_matrix(self):
+        filenames = self.filtered_logs()
+        start = time.perf_counter()
+        resolver = IpIntervalIndex.from_file(self.workspace.ip_lifetimes)
+        _, packets, _ = build_matrix(filenames, resolver)
+        return time.perf_counter() - start, int(packets.sum())
+
+    def priority(self):
+        start = time.perf_counter()
+        run_script("analysis/priority.py", self.workspace.analysis)
+        return time.perf_counter() - start, self.workspace.samples
+
+    def suggest_optimal_placement(self):
+        if self.routes is None:
+            pods, packets, _ = build_matrix(self.filtered_logs(),
+                                            IpIntervalIndex.from_file(self.workspace.ip_lifetimes))
+            self.routes = matrix_to_frame(pods, packets)
+        df_routes = self.routes
+        counts = df_routes.values[df_routes.values > 0]
+        threshold = counts.mean() if len(counts) else 0
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            suggest_optimal_placement(df_routes, threshold, self.cluster.nodes)
+        return time.perf_counter() - start, len(df_routes)
+
+def skip_reason(stage, pod_count, args):
+    if stage == "collector_tick_per_pod" and pod_count > args.max_per_pod:
+        return f"more than --max-per-pod {args.max_per_pod} pods"
+    if stage in MATRIX_STAGES and pod_count > args.max_matrix_pods:
+        return f"more than --max-matrix-pods {args.max_matrix_pods} pods (dense pod x pod matrix)"
+    return None
+
+def run_scale(pod_count, args):
+    results = []
+    root = tempfile.mkdtemp(prefix=f"benchmark_{pod_count}_")
+    try:
+        print(f"Generating synthetic data for {pod_count} pods...")
+        cluster = SyntheticCluster(pod_count, seed=args.seed)
+        workspace = Workspace(root, cluster, args)
+        benchmarks = Benchmarks(cluster, workspace, args)
+        try:
+            for stage in args.stages:
+                reason = skip_reason(stage, pod_count, args)
+                if reason:
+                    print(f"{stage} @ {pod_count} pods: skipped, {reason}")
+                    results.append({"stage": stage, "pods": pod_count, "skipped": reason})
+                    continue
+                runs = []
+                items = 0
+                for _ in range(args.repeat):
+                    seconds, items = getattr(benchmarks, stage)()
+                    runs.append(seconds)
+                median = statistics.median(runs)
+                rate = items / median if median else 0
+                print(f"{stage} @ {pod_count} pods: {median:.3f}s median of {len(runs)} ({rate:,.0f} items/s)")
+                results.append({"stage": stage, "pods": pod_count, "seconds": median, "runs": runs,
+                                "items": items, "rate": rate})
+        finally:
+            benchmarks.close()
+    finally:
+        if args.keep:
+            print(f"Kept synthetic data in {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+    return results
+
+def compare(results, baseline, tolerance):
+    # Prints each stage's median against the baseline file's; returns the regressions, i.e.
+    # stages more than tolerance (relative) slower.
+    previous = {(entry["stage"], entry["pods"]): entry for entry in baseline["results"] if "seconds" in entry}
+    regressions = []
+    print(f"\nAgainst baseline from {baseline['created']}:")
+    for entry in results:
+        reference = previous.get((entry["stage"], entry["pods"]))
+        if "seconds" not in entry or reference is None or not reference["seconds"]:
+            continue
+        ratio = entry["seconds"] / reference["seconds"]
+        line = (f"{entry['stage']} @ {entry['pods']} pods: {reference['seconds']:.3f}s -> {entry['seconds']:.3f}s "
+                f"({ratio - 1:+.1%})")
+        if ratio > 1 + tolerance:
+            line += " REGRESSION"
+            regressions.append(entry)
+        print(line)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pods", type=int, nargs="+", default=[10, 100, 1000],
+                        help="Cluster sizes to benchmark (up to 10000)")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--packets", type=int, default=200, help="Captured packets (and text dump lines) per pod")
+    parser.add_argument("--samples", type=int, default=300, help="Memory samples per pod")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--pool-size", type=int, default=16)
+    parser.add_argument("--max-per-pod", type=int, default=1000)
+    parser.add_argument("--max-matrix-pods", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Results JSON (default: benchmarks/results/<time>.json)")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Relative slowdown against the baseline reported as a regression")
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic data directories")
+    args = parser.parse_args()
+
+    created = datetime.now()
+    results = []
+    for pod_count in args.pods:
+        results.extend(run_scale(pod_count, args))
+
+    report = {
+        "created": created.isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "keep")},
+        "results": results,
+    }
+    output = args.output or os.path.join(BENCHMARK_DIRECTORY, "results", f"{created.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import json
+import math
+import os
+import struct
+import time
+from datetime import datetime, timezone
+import numpy as np
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+PCAP_HEADER = struct.Struct("<IHHiIII")
+RECORD_HEADER = struct.Struct("<IIII")
+ETHERNET_HEADER = bytes(12) + b"\x08\x00"
+HTTP_200_PAYLOAD = b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nContent-Length: 512\r\n\r\n"
+MYSQL_PAYLOAD = b"\x05\x00\x00\x00\x03SELECT 1"
+OTHER_PAYLOAD = b"GET /tools.descartes.teastore.webui/ HTTP/1.1\r\nHost: webui\r\n\r\n"
+
+class SyntheticCluster:
+    # A TeaStore-like application of pod_count pods: replicas of pod_count // 10 deployments
+    # spread over nodes, each deployment calling a few others. Pod names follow the
+    # <deployment>-<replicaset hash>-<suffix> form kubectl gives Deployment pods.
+    def __init__(self, pod_count, namespace="teastore", application="teastore", nodes=None, seed=0):
+        rng = np.random.default_rng(seed)
+        self.namespace = namespace
+        self.application = application
+        self.nodes = [f"worker{i + 1}" for i in range(nodes or max(1, pod_count // 20))]
+        deployment_count = max(1, pod_count // 10)
+        self.deployments = [f"{application}-svc{d}" for d in range(deployment_count)]
+        hashes = [random_name(rng, 9) for _ in self.deployments]
+        self.pod_deployment = np.arange(pod_count) % deployment_count
+        self.pods = []
+        names = set()
+        for i, d in enumerate(self.pod_deployment):
+            name = f"{self.deployments[d]}-{hashes[d]}-{random_name(rng, 5)}"
+            while name in names:
+                name = f"{self.deployments[d]}-{hashes[d]}-{random_name(rng, 5)}"
+            names.add(name)
+            self.pods.append(name)
+        self.ips = [f"10.{1 + i // 65536}.{i // 256 % 256}.{i % 256}" for i in range(pod_count)]
+        self.pod_nodes = [self.nodes[i % len(self.nodes)] for i in range(pod_count)]
+        self.uids = ["%08x-0000-4000-8000-%012x" % (seed, i) for i in range(pod_count)]
+        self.start_time = time.time() - 3600
+        self.base_memory = rng.uniform(50, 500, pod_count) * 2**20
+        self.phase = rng.uniform(0, 2 * math.pi, pod_count)
+        # Each deployment calls up to three others.
+        self.calls = [rng.choice(deployment_count, size=min(3, deployment_count), replace=False)
+                      for _ in range(deployment_count)]
+        # Pod i belongs to deployment i % deployment_count, so deployment d has pods d, d + D, ...
+        self.replica_counts = (pod_count - np.arange(deployment_count) + deployment_count - 1) // deployment_count
+        self.index = {pod: i for i, pod in enumerate(self.pods)}
+
+    def __len__(self):
+        return len(self.pods)
+
+    def memory(self, pod_index, timestamp):
+        # Working set bytes: a slow oscillation around the pod's baseline.
+        return float(self.base_memory[pod_index] * (1 + 0.1 * math.sin(timestamp / 300 + self.phase[pod_index])))
+
+    def peers(self, rng, pod_index, count):
+        # count destination pods for pod_index, drawn from the replicas of the deployments it calls.
+        called = self.calls[self.pod_deployment[pod_index]]
+        deployments = rng.choice(called, size=count)
+        replica = (rng.random(count) * self.replica_counts[deployments]).astype(np.int64)
+        return deployments + replica * len(self.deployments)
+
+    def pod_manifest(self, pod_index, resource_version):
+        # The Pod object the Kubernetes API would return, with the fields CoreV1Api requires.
+        name = self.pods[pod_index]
+        return {
+            "apiVersion": "v1",
+            "kind": "Pod",
+            "metadata": {"name": name, "namespace": self.namespace, "uid": self.uids[pod_index],
+                         "resourceVersion": str(resource_version),
+                         "labels": {"app": self.application,
+                                    "deployment": self.deployments[self.pod_deployment[pod_index]]}},
+            "spec": {"nodeName": self.pod_nodes[pod_index], "containers": [{"name": "app", "image": "teastore"}]},
+            "status": {"phase": "Running", "podIP": self.ips[pod_index],
+                       "startTime": datetime.fromtimestamp(self.start_time, timezone.utc).strftime(
+                           "%Y-%m-%dT%H:%M:%SZ"),
+                       "containerStatuses": [{"name": "app", "ready": True, "restartCount": 0,
+                                              "image": "teastore", "imageID": ""}]},
+        }
+
+def random_name(rng, length):
+    alphabet = "bcdfghjklmnpqrstvwxz2456789"
+    return "".join(alphabet[i] for i in rng.integers(0, len(alphabet), length))
+
+def ip_bytes(ip):
+    return bytes(int(part) for part in ip.split("."))
+
+def frame(src_ip, dst_ip, src_port, dst_port, payload):
+    # Ethernet + IPv4 + TCP (no options) around payload.
+    total_length = 20 + 20 + len(payload)
+    ip_header = struct.pack(">BBHHHBBH4s4s", 0x45, 0, total_length, 0, 0, 64, 6, 0, src_ip, dst_ip)
+    tcp_header = struct.pack(">HHIIBBHHH", src_port, dst_port, 0, 0, 5 << 4, 0x18, 65535, 0, 0)
+    return ETHERNET_HEADER + ip_header + tcp_header + payload
+
+def write_pcaps(cluster, directory, packets_per_pod, seed=0):
+    # One capture per pod, named as kubectl sniff captures are, holding packets_per_pod packets
+    # from the pod to its peers: 40% HTTP 200 responses, 30% MySQL and 30% other TCP that the
+    # converters filter out. Returns the number of packets written.
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    stamp = datetime.fromtimestamp(cluster.start_time).strftime("%Y%m%d_%H%M%S")
+    payloads = [(HTTP_200_PAYLOAD, 8080, 41000), (MYSQL_PAYLOAD, 41000, 3306), (OTHER_PAYLOAD, 41000, 8080)]
+    written = 0
+    for i, pod in enumerate(cluster.pods):
+        peers = cluster.peers(rng, i, packets_per_pod)
+        kinds = rng.choice(3, size=packets_per_pod, p=[0.4, 0.3, 0.3])
+        src = ip_bytes(cluster.ips[i])
+        records = [PCAP_HEADER.pack(0xa1b2c3d4, 2, 4, 0, 0, 65535, 1)]
+        for n, (peer, kind) in enumerate(zip(peers, kinds)):
+            payload, src_port, dst_port = payloads[kind]
+            data = frame(src, ip_bytes(cluster.ips[peer]), src_port, dst_port, payload)
+            timestamp = cluster.start_time + n * 0.01
+            records.append(RECORD_HEADER.pack(int(timestamp), int(timestamp % 1 * 1e6), len(data), len(data)))
+            records.append(data)
+        with open(os.path.join(directory, f"{pod}_{stamp}.pcap"), 'wb') as f:
+            f.write(b"".join(records))
+        written += packets_per_pod
+    return written
+
+def write_text_dumps(cluster, directory, lines_per_pod, seed=0):
+    # tshark -t ud -T text dumps (line numbers already removed, as convert_app.py leaves them in
+    # preapp_log) with the same traffic mix as write_pcaps. Returns the number of lines written.
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    written = 0
+    for i, pod in enumerate(cluster.pods):
+        peers = cluster.peers(rng, i, lines_per_pod)
+        kinds = rng.choice(3, size=lines_per_pod, p=[0.4, 0.3, 0.3])
+        lines = []
+        for n, (peer, kind) in enumerate(zip(peers, kinds)):
+            timestamp = datetime.fromtimestamp(cluster.start_time + n * 0.01, timezone.utc).strftime(TIMESTAMP_FORMAT)
+            if kind == 0:
+                detail = "HTTP 146 HTTP/1.1 200 OK  (text/html)"
+            elif kind == 1:
+                detail = "MySQL 75 Request Query"
+            else:
+                detail = "TCP 66 41000 → 8080 [ACK] Seq=1 Ack=1 Win=65535 Len=0"
+            lines.append(f"{timestamp} {cluster.ips[i]} → {cluster.ips[peer]} {detail}\n")
+        with open(os.path.join(directory, f"{pod}.pcap.log"), 'w') as f:
+            f.writelines(lines)
+        written += lines_per_pod
+    return written
+
+def write_cluster_logs(cluster, directory, samples_per_pod, interval=1):
+    # cl_<pod>.log JSON lines as MonitorLogger's json backend writes them, one sample per
+    # interval seconds. Returns the number of samples written.
+    os.makedirs(directory, exist_ok=True)
+    for i, pod in enumerate(cluster.pods):
+        with open(os.path.join(directory, f"cl_{pod}.log"), 'w') as f:
+            for n in range(samples_per_pod):
+                timestamp = cluster.start_time + n * interval
+                f.write(json.dumps({
+                    "timestamp": datetime.fromtimestamp(timestamp, timezone.utc).strftime(TIMESTAMP_FORMAT),
+                    "pod_name": pod,
+                    "node_name": cluster.pod_nodes[i],
+                    "memory_usage": cluster.memory(i, timestamp)
+                }) + "\n")
+    return len(cluster) * samples_per_pod
+
+def write_ip_lifetimes(cluster, path):
+    # pod_ip_lifetimes.jsonl as IpLifetimeRecorder writes it, every interval still open.
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        for pod, ip in zip(cluster.pods, cluster.ips):
+            f.write(json.dumps({"pod": pod, "ip": ip, "start": cluster.start_time}) + "\n")
@@ -1,22 +1,82 @@
+import argparse
 import logging
 from logging.handlers import RotatingFileHandler
 import os
-from datetime import datetime
+import re
+from datetime import datetime, timezone
 import json
+import numpy as np
 from kubernetes import client, config
 from prometheus_client import start_http_server
 import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 import requests
+from requests.adapters import HTTPAdapter
+from pod_inventory import PodInventory
+from ip_lifetimes import IpLifetimeRecorder, IP_LIFETIMES_FILENAME
+from sample_store import SampleStoreWriter, read_pod_series, STORE_SUFFIX
+from pod_summary import summary_path, load_summary, save_summary, summarize, pod_log_files
+from scan_metrics import (PROMETHEUS_QUERY_LATENCY, KUBERNETES_API_LATENCY, TICK_DURATION, TICKS,
+                          TICK_OVERRUNS, MISSED_SLOTS, LATE_SAMPLES, BUFFERED_SAMPLES, DROPPED_SAMPLES)
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+prometheus_url = "http://localhost:32758"
+EPOCH = datetime(1970, 1, 1)
+
+def format_timestamp(sample_time):
+    return datetime.fromtimestamp(sample_time, timezone.utc).strftime(TIMESTAMP_FORMAT)
+
+def to_epoch_ns(timestamp):
+    if isinstance(timestamp, str):
+        delta = datetime.strptime(timestamp, TIMESTAMP_FORMAT) - EPOCH
+        return (delta.days * 86400 + delta.seconds) * 10**9 + delta.microseconds * 1000
+    return int(round(timestamp * 1e9))
 
 class MonitorLogger:
-    def __init__(self, log_directory, max_bytes=10485760, backup_count=5, buffer_size=10):
+    def __init__(self, log_directory, max_bytes=10485760, backup_count=5, buffer_size=10,
+                 backend="json", compress=True, background=True, flush_interval=5,
+                 queue_size=1000, backpressure="drop", summaries=True):
+        # backend="json" writes rotated JSON-lines cl_<pod>.log files; backend="columnar" writes
+        # cl_<pod>.cls sample store files (see sample_store.py), which are not rotated.
+        # With background=True full buffers are handed to a writer thread through a bounded queue
+        # and written at most every flush_interval seconds, one write per file. When the queue is
+        # full, backpressure="drop" (the default, so a disk stall never stretches the collector's
+        # tick) discards the batch and counts it in dropped_samples; backpressure="block" stalls
+        # the caller instead. With summaries=True every write also updates the pod's
+        # cl_<pod>.summary.json sidecar (see pod_summary.py), which covers rotated data too.
+        # The JSON backend logs each batch as one record, and RotatingFileHandler only rolls over
+        # between records, so a cl_<pod>.log can exceed max_bytes by up to one batch (a few KB at
+        # the default buffer size and flush interval).
+        if backend not in ("json", "columnar"):
+            raise ValueError(f"Unknown MonitorLogger backend: {backend}")
+        if backpressure not in ("block", "drop"):
+            raise ValueError(f"Unknown MonitorLogger backpressure policy: {backpressure}")
         self.buffer = {}
         self.buffer_size = buffer_size
         os.makedirs(log_directory, exist_ok=True)
         self.loggers = {}
+        self.writers = {}
+        self.summaries = {} if summaries else None
+        self.backend = backend
+        self.compress = compress
         self.max_bytes = max_bytes
         self.backup_count = backup_count
         self.log_directory = log_directory
+        self.flush_interval = flush_interval
+        self.backpressure = backpressure
+        self.queued_samples = 0
+        self.dropped_samples = 0
+        self.queue_lock = threading.Lock()
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.writer_thread = None
+        if background:
+            self.writer_thread = threading.Thread(target=self.writer_loop, name=f"MonitorLogger_{log_directory}",
+                                                  daemon=True)
+            self.writer_thread.start()
+        BUFFERED_SAMPLES.labels(log_directory).set_function(
+            lambda: sum(len(buffer) for buffer in list(self.buffer.values())) + self.queued_samples)
 
     def get_logger(self, pod_name):
         if pod_name not in self.loggers:
@@ -32,39 +92,169 @@ class MonitorLogger:
             handler.setFormatter(formatter)
             logger.addHandler(handler)
             self.loggers[pod_name] = logger
-            self.buffer[pod_name] = []
         return self.loggers[pod_name]
 
+    def get_writer(self, pod_name):
+        if pod_name not in self.writers:
+            store_filename = f"cl_{pod_name}{STORE_SUFFIX}"
+            self.writers[pod_name] = SampleStoreWriter(
+                os.path.join(self.log_directory, store_filename), pod_name, compress=self.compress)
+        return self.writers[pod_name]
+
+    def get_summary(self, pod_name):
+        if pod_name not in self.summaries:
+            path = summary_path(self.log_directory, pod_name)
+            if os.path.exists(path):
+                self.summaries[pod_name] = load_summary(path)
+            else:
+                # A pod logged before sidecars existed (or only as JSON before a store) starts
+                # from the samples it already has on disk.
+                self.summaries[pod_name] = summarize(pod_log_files(self.log_directory, pod_name))
+        return self.summaries[pod_name]
+
+    def stored_timestamps_ns(self, pod_name, start_ns=None, end_ns=None):
+        # Sorted epoch ns of the samples already written for pod_name in [start_ns, end_ns), from
+        # its store and its JSON logs (rotated ones included), whichever exist.
+        columns = []
+        store_file = os.path.join(self.log_directory, f"cl_{pod_name}{STORE_SUFFIX}")
+        if os.path.exists(store_file) and os.path.getsize(store_file) > 0:
+            columns.append(read_pod_series(store_file, start_ns, end_ns)[0])
+        log_file = os.path.join(self.log_directory, f"cl_{pod_name}.log")
+        for path in [log_file] + [f"{log_file}.{i}" for i in range(1, self.backup_count + 1)]:
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r') as f:
+                timestamps = np.array([to_epoch_ns(json.loads(line)["timestamp"]) for line in f if line.strip()],
+                                      dtype=np.int64)
+            mask = np.ones(len(timestamps), dtype=bool)
+            if start_ns is not None:
+                mask &= timestamps >= start_ns
+            if end_ns is not None:
+                mask &= timestamps < end_ns
+            columns.append(timestamps[mask])
+        return np.sort(np.concatenate(columns)) if columns else np.empty(0, dtype=np.int64)
+
     def log(self, timestamp, pod_name, node_name, memory_usage):
-        log_data = {
-            "timestamp": timestamp,
-            "pod_name": pod_name,
-            "node_name": node_name,
-            "memory_usage": memory_usage
-        }
-        log_message = json.dumps(log_data)
-        
+        # timestamp is either a TIMESTAMP_FORMAT string (UTC) or epoch seconds. Samples are kept
+        # as tuples and only serialized by write(), off the collector thread.
+        log_message = (timestamp, node_name, memory_usage)
+
         if pod_name not in self.buffer:
             self.buffer[pod_name] = []
         buffer = self.buffer[pod_name]
         buffer.append(log_message)
-        
+
         if len(buffer) >= self.buffer_size:
-            logger = self.get_logger(pod_name)
-            for message in buffer:
-                logger.info(message)
+            self.submit(pod_name, buffer)
             buffer.clear()
 
+    def submit(self, pod_name, messages):
+        if not self.writer_alive():
+            self.write(pod_name, messages)
+            return
+        batch = list(messages)
+        with self.queue_lock:
+            self.queued_samples += len(batch)
+        try:
+            self.queue.put(("samples", (pod_name, batch)), block=self.backpressure == "block")
+        except queue.Full:
+            with self.queue_lock:
+                self.queued_samples -= len(batch)
+                self.dropped_samples += len(batch)
+            DROPPED_SAMPLES.labels(self.log_directory).inc(len(batch))
+
+    def writer_alive(self):
+        return self.writer_thread is not None and self.writer_thread.is_alive()
+
+    def writer_loop(self):
+        pending = {}
+        last_write = time.monotonic()
+        running = True
+        while running:
+            timeout = max(0, self.flush_interval - (time.monotonic() - last_write))
+            waiters = []
+            items = []
+            try:
+                items.append(self.queue.get(timeout=timeout))
+                # Take whatever else is already queued so it lands in the same write.
+                while True:
+                    items.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            for kind, payload in items:
+                if kind == "samples":
+                    pod_name, messages = payload
+                    pending.setdefault(pod_name, []).extend(messages)
+                elif kind == "flush":
+                    waiters.append(payload)
+                elif kind == "stop":
+                    waiters.append(payload)
+                    running = False
+
+            if waiters or not running or time.monotonic() - last_write >= self.flush_interval:
+                for pod_name, messages in pending.items():
+                    try:
+                        self.write(pod_name, messages)
+                    except Exception as e:
+                        print(f"Cluster_Error writing samples for {pod_name}: {e}")
+                    with self.queue_lock:
+                        self.queued_samples -= len(messages)
+                pending = {}
+                last_write = time.monotonic()
+                for waiter in waiters:
+                    waiter.set()
+
+    def write(self, pod_name, messages):
+        timestamps_ns = [to_epoch_ns(timestamp) for timestamp, _, _ in messages]
+        # Loaded before the samples reach disk, so a summary seeded from the files counts them once.
+        summary = self.get_summary(pod_name) if self.summaries is not None else None
+        if self.backend == "columnar":
+            writer = self.get_writer(pod_name)
+            # One chunk per run of samples taken on the same node.
+            start = 0
+            for end in range(1, len(messages) + 1):
+                if end == len(messages) or messages[end][1] != messages[start][1]:
+                    writer.append(timestamps_ns[start:end], [sample[2] for sample in messages[start:end]],
+                                  messages[start][1])
+                    start = end
+            writer.flush()
+        else:
+            logger = self.get_logger(pod_name)
+            logger.info("\n".join(json.dumps({
+                "timestamp": timestamp if isinstance(timestamp, str) else format_timestamp(timestamp),
+                "pod_name": pod_name,
+                "node_name": node_name,
+                "memory_usage": memory_usage
+            }) for timestamp, node_name, memory_usage in messages))
+
+        if summary is not None:
+            for timestamp_ns, (_, node_name, memory_usage) in zip(timestamps_ns, messages):
+                summary.update(timestamp_ns, memory_usage, node_name)
+            save_summary(summary_path(self.log_directory, pod_name), summary)
+
     def flush_all(self):
-        for pod_name in self.buffer:
+        for pod_name in list(self.buffer):
             buffer = self.buffer[pod_name]
             if buffer:
-                logger = self.get_logger(pod_name)
-                for message in buffer:
-                    logger.info(message)
+                self.submit(pod_name, buffer)
                 buffer.clear()
+        if self.writer_alive():
+            done = threading.Event()
+            # Flush markers are never dropped, whatever the backpressure policy.
+            self.queue.put(("flush", done))
+            done.wait()
 
     def close_all(self):
+        self.flush_all()
+        if self.writer_alive():
+            done = threading.Event()
+            self.queue.put(("stop", done))
+            done.wait()
+            self.writer_thread.join()
+        for writer in self.writers.values():
+            writer.close()
+        self.writers.clear()
         for logger in self.loggers.values():
             handlers = logger.handlers[:]
             for handler in handlers:
@@ -74,12 +264,24 @@ class MonitorLogger:
 def get_pod_names(pods):
     return [pod.metadata.name for pod in pods.items]
 
-def get_pod_metrics(pod_name):
-    prometheus_url = "http://localhost:32758"
+def create_prometheus_session(pool_size=16):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+prometheus_session = create_prometheus_session()
+
+def get_pod_metrics(pod_name, sample_time=None, timeout=None):
     query_memory = f'sum(container_memory_working_set_bytes{{pod="{pod_name}"}}) by (pod)'
+    params = {"query": query_memory}
+    if sample_time is not None:
+        params["time"] = sample_time
 
     try:
-        response_memory = requests.get(f"{prometheus_url}/api/v1/query", params={"query": query_memory})
+        with PROMETHEUS_QUERY_LATENCY.labels("instant").time():
+            response_memory = prometheus_session.get(f"{prometheus_url}/api/v1/query", params=params, timeout=timeout)
         response_memory.raise_for_status()
 
 
@@ -94,63 +296,362 @@ def get_pod_metrics(pod_name):
         print(f"Error fetching metrics for pod {pod_name}: {e}")
         return 0
 
-def monitor_cluster_workload(namespace, application, logger, session_duration):
+def promql_string(value):
+    # value escaped for a double-quoted PromQL string literal, whose escapes follow Go's.
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+def get_pods_metrics(namespace, pod_names, sample_time=None, timeout=None):
+    if not pod_names:
+        return {}
+    # Each name is regex-escaped, so a "." in a pod name matches only a dot and not the series
+    # of other pods.
+    pod_regex = promql_string("|".join(re.escape(pod_name) for pod_name in pod_names))
+    query_memory = (f'sum(container_memory_working_set_bytes{{namespace="{namespace}", pod=~"{pod_regex}"}}) '
+                    f'by (pod, node)')
+    data = {"query": query_memory}
+    if sample_time is not None:
+        data["time"] = sample_time
+
+    try:
+        # POST keeps the query out of the URL, which a few hundred pod names would overflow.
+        with PROMETHEUS_QUERY_LATENCY.labels("batch").time():
+            response_memory = prometheus_session.post(f"{prometheus_url}/api/v1/query", data=data, timeout=timeout)
+        response_memory.raise_for_status()
+
+        result = response_memory.json()["data"]["result"]
+        wanted = set(pod_names)
+        metrics = {}
+        for series in result:
+            pod_name = series["metric"].get("pod")
+            if pod_name not in wanted:
+                continue
+            memory_usage, _ = metrics.get(pod_name, (0.0, None))
+            metrics[pod_name] = (memory_usage + float(series["value"][1]), series["metric"].get("node"))
+
+        missing = wanted - metrics.keys()
+        if missing:
+            print(f"Error fetching metrics for {len(missing)} pod(s): no series returned for {sorted(missing)}")
+        return metrics
+
+    except Exception as e:
+        print(f"Error fetching metrics for pods in {namespace}: {e}")
+        return {}
+
+def get_pods_metrics_range(namespace, pod_regex, start, end, step, timeout=60):
+    query_memory = (f'sum(container_memory_working_set_bytes{{namespace="{namespace}", '
+                    f'pod=~"{promql_string(pod_regex)}"}}) '
+                    f'by (pod, node)')
+    data = {"query": query_memory, "start": start, "end": end, "step": step}
+
+    with PROMETHEUS_QUERY_LATENCY.labels("range").time():
+        response_memory = prometheus_session.post(f"{prometheus_url}/api/v1/query_range", data=data, timeout=timeout)
+    response_memory.raise_for_status()
+
+    series_by_pod = {}
+    for series in response_memory.json()["data"]["result"]:
+        pod_name = series["metric"].get("pod")
+        if pod_name is None:
+            continue
+        series_by_pod.setdefault(pod_name, []).append(
+            (series["metric"].get("node"), [(float(ts), float(value)) for ts, value in series["values"]]))
+    return series_by_pod
+
+def covered(stored_ns, timestamps_ns, tolerance_ns):
+    # Mask of the timestamps with a stored sample less than tolerance_ns away.
+    if len(stored_ns) == 0:
+        return np.zeros(len(timestamps_ns), dtype=bool)
+    position = np.searchsorted(stored_ns, timestamps_ns)
+    before = stored_ns[np.maximum(position - 1, 0)]
+    after = stored_ns[np.minimum(position, len(stored_ns) - 1)]
+    return (np.abs(timestamps_ns - before) < tolerance_ns) | (np.abs(after - timestamps_ns) < tolerance_ns)
+
+def backfill_cluster_history(namespace, application, logger, start, end, step=1, max_points=10000, pod_regex=None):
+    # Prometheus rejects range queries over 11,000 points per series, so the window is paged
+    # in spans of max_points steps. Span boundaries are inclusive, hence the extra step.
+    # Each pod's points from a window are written as one batch, straight to the logger's files
+    # rather than through its buffers. A point is skipped when the pod already has a sample
+    # stored within half a step of it, so only the gaps (a scanner outage) are filled, and
+    # re-running a backfill or backfilling over a live session's output adds no duplicates.
+    pod_regex = pod_regex or f"{application}.*"
+    span = step * (max_points - 1)
+    tolerance_ns = to_epoch_ns(step) // 2
+    print(f"Cluster_backfill for '{application}' from {format_timestamp(start)} to {format_timestamp(end)} "
+          f"(step: {step}s)")
+    samples = 0
+    skipped = 0
+    queries = 0
+    window_start = start
+    logger.flush_all()
+    try:
+        while window_start <= end:
+            window_end = min(window_start + span, end)
+            try:
+                series_by_pod = get_pods_metrics_range(namespace, pod_regex, window_start, window_end, step)
+            except Exception as e:
+                print(f"Cluster_backfill error for {format_timestamp(window_start)} - "
+                      f"{format_timestamp(window_end)}: {e}")
+                series_by_pod = {}
+            queries += 1
+            for pod_name, series in series_by_pod.items():
+                messages = sorted((sample_time, node_name, memory_usage) for node_name, values in series
+                                  for sample_time, memory_usage in values)
+                timestamps_ns = np.array([to_epoch_ns(message[0]) for message in messages], dtype=np.int64)
+                stored = logger.stored_timestamps_ns(pod_name, to_epoch_ns(window_start) - tolerance_ns,
+                                                     to_epoch_ns(window_end) + tolerance_ns)
+                keep = ~covered(stored, timestamps_ns, tolerance_ns)
+                # A pod that moved node mid-window has a series per node; one sample per timestamp.
+                keep[1:] &= timestamps_ns[1:] != timestamps_ns[:-1]
+                fresh = [message for message, kept in zip(messages, keep) if kept]
+                skipped += len(messages) - len(fresh)
+                if fresh:
+                    logger.write(pod_name, fresh)
+                    samples += len(fresh)
+            window_start = window_end + step
+    except KeyboardInterrupt:
+        print("Cluster_backfill interrupted by user.")
+    finally:
+        print(f"Cluster_backfill wrote {samples} samples with {queries} range queries "
+              f"({skipped} already stored skipped).")
+        print(f"Cluster_scan logs have been created: {logger.log_directory}")
+
+def parse_time(value):
+    try:
+        return float(value)
+    except ValueError:
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return (parsed - EPOCH).total_seconds()
+
+class AdaptiveSampler:
+    # Per-pod sampling intervals on top of the tick grid. A pod is sampled every tick (interval)
+    # while it is new (started less than warmup seconds ago), after its memory moved by more than
+    # change_threshold (relative) since its last sample, or when its last sample failed; otherwise
+    # its interval doubles after each sample, up to max_interval. The reader side rebuilds a
+    # regular series with SampleStoreReader.read_grid.
+    def __init__(self, interval, max_interval, change_threshold=0.05, warmup=60, backoff=2):
+        self.interval = interval
+        self.max_interval = max_interval
+        self.change_threshold = change_threshold
+        self.warmup = warmup
+        self.backoff = backoff
+        self.pods = {}
+        self.sampled = 0
+        self.skipped = 0
+
+    def due(self, pods, sample_time):
+        # Names of the pods in pods ({name: PodInfo}) to sample at this tick; forgets pods that are gone.
+        for pod_name in self.pods.keys() - pods.keys():
+            del self.pods[pod_name]
+        # Half a tick of slack, since the tick grid is floating point.
+        due = [pod_name for pod_name in pods
+               if pod_name not in self.pods or self.pods[pod_name]["next_due"] <= sample_time + self.interval / 2]
+        self.sampled += len(due)
+        self.skipped += len(pods) - len(due)
+        return due
+
+    def observe(self, pod_name, info, sample_time, memory_usage):
+        # memory_usage is None when the sample failed.
+        state = self.pods.setdefault(pod_name, {"interval": self.interval, "last": None})
+        last = state["last"]
+        started = info.start_time if info is not None and info.start_time is not None else sample_time
+        if (memory_usage is None or last is None or sample_time - started < self.warmup
+                or abs(memory_usage - last) > self.change_threshold * max(abs(last), 1)):
+            state["interval"] = self.interval
+        else:
+            state["interval"] = min(state["interval"] * self.backoff, self.max_interval)
+        if memory_usage is not None:
+            state["last"] = memory_usage
+        state["next_due"] = sample_time + state["interval"]
+
+class TickScheduler:
+    def __init__(self, interval, max_workers=16):
+        self.interval = interval
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ClusterScan")
+        self.ticks = 0
+        self.missed_deadlines = 0
+        self.late_samples = 0
+
+    def run(self, tick, until, stop_event=None):
+        # Ticks are pinned to a fixed grid (start + k * interval) rather than sleeping a fixed
+        # interval after the work, so the sampling rate does not drift with the work duration.
+        # Setting stop_event ends the run after the current tick.
+        stop_event = stop_event or threading.Event()
+        next_tick = time.time()
+        while next_tick < until and not stop_event.is_set():
+            deadline = next_tick + self.interval
+            with TICK_DURATION.time():
+                tick(next_tick, deadline)
+            self.ticks += 1
+            TICKS.inc()
+
+            now = time.time()
+            if now > deadline:
+                missed = int((now - next_tick) // self.interval)
+                self.missed_deadlines += missed
+                TICK_OVERRUNS.inc()
+                MISSED_SLOTS.inc(missed)
+                print(f"Cluster_Tick overran its deadline by {now - deadline:.3f}s, skipping {missed} slot(s)")
+                next_tick += (missed + 1) * self.interval
+            else:
+                next_tick = deadline
+            stop_event.wait(max(0, next_tick - time.time()))
+
+    def gather(self, futures, deadline):
+        # futures is {future: pod name}. Results that miss the tick deadline are dropped and
+        # counted once per pod (a pod may wait on several requests) rather than stretching the tick.
+        done, not_done = wait(futures, timeout=max(0, deadline - time.time()))
+        for future in not_done:
+            future.cancel()
+        late = len({futures[future] for future in not_done})
+        self.late_samples += late
+        LATE_SAMPLES.inc(late)
+        return done
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+def collect_batch(namespace, pod_nodes, sample_time, deadline, logger):
+    # Returns {pod: memory usage} for the pods Prometheus returned a series for.
+    metrics = get_pods_metrics(namespace, list(pod_nodes), sample_time, timeout=max(0.1, deadline - time.time()))
+    for pod_name, node_name in pod_nodes.items():
+        memory_usage, metric_node = metrics.get(pod_name, (0, None))
+        logger.log(sample_time, pod_name, node_name or metric_node, memory_usage)
+    return {pod_name: memory_usage for pod_name, (memory_usage, _) in metrics.items()}
+
+def read_pod(v1, pod_name, namespace, timeout):
+    with KUBERNETES_API_LATENCY.labels("read_namespaced_pod").time():
+        return v1.read_namespaced_pod(pod_name, namespace, _request_timeout=timeout)
+
+def collect_per_pod(v1, namespace, current_pods, sample_time, deadline, logger, scheduler):
+    # Returns {pod: memory usage} for the pods sampled in time.
+    timeout = max(0.1, deadline - time.time())
+    collected = {}
+    requests_by_pod = {}
+    for pod_name in current_pods:
+        requests_by_pod[pod_name] = (
+            scheduler.executor.submit(get_pod_metrics, pod_name, sample_time, timeout),
+            scheduler.executor.submit(read_pod, v1, pod_name, namespace, timeout),
+        )
+    done = scheduler.gather({future: pod_name for pod_name, pair in requests_by_pod.items() for future in pair},
+                            deadline)
+
+    for pod_name, (metrics_future, pod_future) in requests_by_pod.items():
+        if metrics_future not in done or pod_future not in done:
+            continue
+        try:
+            memory_usage = metrics_future.result()
+            node_name = pod_future.result().spec.node_name
+            logger.log(sample_time, pod_name, node_name, memory_usage)
+            collected[pod_name] = memory_usage
+        except client.exceptions.ApiException as e:
+            if e.status == 404:
+                print(f"Cluster_Error: Pod {pod_name} not found or no longer exists.")
+            else:
+                print(f"Cluster_Unexpected error for pod {pod_name}: {e}")
+        except Exception as e:
+            print(f"Cluster_Unexpected error for pod {pod_name}: {e}")
+    return collected
+
+def create_core_api(pool_size=16):
+    configuration = client.Configuration.get_default_copy()
+    configuration.connection_pool_maxsize = pool_size
+    return client.CoreV1Api(client.ApiClient(configuration))
+
+def monitor_cluster_workload(namespace, application, logger, session_duration, batch_metrics=True, inventory=None,
+                             log_interval=1, max_workers=16, metrics_port=8000, ip_lifetimes_path=None,
+                             stop_event=None, max_interval=None):
+    # With max_interval above log_interval, stable pods back off to it (see AdaptiveSampler).
     print(f"Cluster_scan session for '{application}' started. (Duration: {session_duration}s)")
     session_start_time = time.time()
-    log_interval = 1
     message_interval = 5
     last_message_time = time.time()
-    known_pods = set()
+    own_inventory = inventory is None
+    scheduler = TickScheduler(log_interval, max_workers=max_workers)
+    sampler = AdaptiveSampler(log_interval, max_interval) if max_interval and max_interval > log_interval else None
+    ip_recorder = IpLifetimeRecorder(ip_lifetimes_path or os.path.join(logger.log_directory, IP_LIFETIMES_FILENAME))
 
     try:
-        config.load_kube_config()
-        v1 = client.CoreV1Api()
-        start_http_server(8000)
+        if own_inventory:
+            config.load_kube_config()
+            inventory = PodInventory(create_core_api(max_workers), namespace, f'app={application}')
+        v1 = inventory.v1
+        if metrics_port is not None:
+            start_http_server(metrics_port)
+
+        def report_pod_event(event, info):
+            if event == "added":
+                print(f"Cluster_New pod detected: {info.name}")
+            elif event == "deleted":
+                print(f"Cluster_Pod deleted: {info.name}")
 
-        while time.time() - session_start_time < session_duration:
-            current_time = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f")
+        inventory.subscribe(report_pod_event)
+        inventory.subscribe(ip_recorder.handle_pod_event)
+        if own_inventory:
+            inventory.start()
+
+        def run_tick(sample_time, deadline):
+            nonlocal last_message_time
             if time.time() - last_message_time >= message_interval:
                 print("Cluster_Collecting log")
                 last_message_time = time.time()
 
-            pods = v1.list_namespaced_pod(namespace, label_selector=f'app={application}')
-            current_pods = get_pod_names(pods)
-            current_pods_set = set(current_pods)
-
-            new_pods = current_pods_set - known_pods
-            for pod in new_pods:
-                print(f"Cluster_New pod detected: {pod}")
-
-            deleted_pods = known_pods - current_pods_set
-            for pod in deleted_pods:
-                print(f"Cluster_Pod deleted: {pod}")
-
-            known_pods = current_pods_set
-            
-            for pod_name in current_pods:
-                try:
-                    memory_usage = get_pod_metrics(pod_name)
-                    node_name = v1.read_namespaced_pod(pod_name, namespace).spec.node_name
-                    logger.log(current_time, pod_name, node_name, memory_usage)
-                except client.exceptions.ApiException as e:
-                    if e.status == 404:
-                        print(f"Cluster_Error: Pod {pod_name} not found or no longer exists.")
-                    else:
-                        print(f"Cluster_Unexpected error for pod {pod_name}: {e}")
-            time.sleep(log_interval)
+            pods = inventory.snapshot()
+            due = sampler.due(pods, sample_time) if sampler is not None else list(pods)
+
+            if batch_metrics:
+                collected = collect_batch(namespace, {name: pods[name].node_name for name in due},
+                                          sample_time, deadline, logger)
+            else:
+                collected = collect_per_pod(v1, namespace, due, sample_time, deadline, logger, scheduler)
+            if sampler is not None:
+                for pod_name in due:
+                    sampler.observe(pod_name, pods[pod_name], sample_time, collected.get(pod_name))
+
+        scheduler.run(run_tick, session_start_time + session_duration, stop_event)
 
     except KeyboardInterrupt:
         print("Cluster_scan interrupted by user.")
     finally:
+        scheduler.shutdown()
+        if own_inventory and inventory is not None:
+            inventory.stop()
+        ip_recorder.close()
         logger.flush_all()
+        print(f"Cluster_scan ticks: {scheduler.ticks}, missed deadlines: {scheduler.missed_deadlines}, "
+              f"late samples dropped: {scheduler.late_samples}")
+        if sampler is not None:
+            print(f"Cluster_scan adaptive sampling: {sampler.sampled} samples taken, {sampler.skipped} skipped")
         print("Cluster_scan session ended.")
         print(f"Cluster_scan logs have been created: {logger.log_directory}")
 
 if __name__ == "__main__":
-    output_directory = "./cluster/cl_log"
-    session_duration = 120
-    logger = MonitorLogger(output_directory, buffer_size=10)
-    namespace = "teastore"
-    application = "teastore"
-    monitor_cluster_workload(namespace, application, logger, session_duration)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--namespace", default="teastore")
+    parser.add_argument("--application", default="teastore")
+    parser.add_argument("--duration", type=int, default=120)
+    parser.add_argument("--output-directory", default="./cluster/cl_log")
+    parser.add_argument("--backfill-start", help="Backfill from this time (UTC ISO-8601 or epoch seconds) instead of "
+                                                 "running a live session")
+    parser.add_argument("--backfill-end", help="End of the backfill window (default: now)")
+    parser.add_argument("--step", type=float, default=1, help="Backfill resolution in seconds")
+    parser.add_argument("--pod-regex", help="Backfill the pods matching this regex (default: <application>.*)")
+    parser.add_argument("--max-interval", type=float,
+                        help="Let stable pods back off to this sampling interval in seconds (default: sample "
+                             "every pod every second)")
+    args = parser.parse_args()
 
+    output_directory = args.output_directory
+    session_duration = args.duration
+    logger = MonitorLogger(output_directory, buffer_size=10, backend="columnar")
+    namespace = args.namespace
+    application = args.application
+    try:
+        if args.backfill_start:
+            end = parse_time(args.backfill_end) if args.backfill_end else time.time()
+            backfill_cluster_history(namespace, application, logger, parse_time(args.backfill_start), end, args.step,
+                                     pod_regex=args.pod_regex)
+        else:
+            monitor_cluster_workload(namespace, application, logger, session_duration, max_interval=args.max_interval)
+    finally:
+        logger.close_all()
@@ -0,0 +1,68 @@
+import json
+import os
+import threading
+import time
+
+IP_LIFETIMES_FILENAME = "pod_ip_lifetimes.jsonl"
+
+class IpLifetimeRecorder:
+    # PodInventory subscriber that records when each pod held each IP, so analysis can attribute
+    # packets to the pod that owned an IP at the packet's time rather than at analysis time.
+    # The file is append-only JSON lines: {"pod", "ip", "start"} when an interval opens and
+    # {"pod", "ip", "start", "end"} when it closes; times are epoch seconds. Intervals still
+    # open when the scanner stops have no closing line.
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.current = {}
+        self.lock = threading.Lock()
+        self.file = open(path, 'a')
+
+    def handle_pod_event(self, event, info):
+        now = time.time()
+        with self.lock:
+            if event == "ip":
+                self.close_interval(info.name, now)
+                # The first time a pod is seen its IP has been held since the pod started.
+                start = info.start_time if info.name not in self.current and info.start_time else now
+                self.current[info.name] = (info.ip, start)
+                self.write({"pod": info.name, "ip": info.ip, "start": start})
+            elif event == "deleted":
+                self.close_interval(info.name, now)
+                self.current.pop(info.name, None)
+            elif event == "handoff":
+                # Another shard now owns the pod and reopens the same interval; closing it here
+                # would end a lifetime the pod is still in.
+                self.current.pop(info.name, None)
+
+    def close_interval(self, pod_name, end):
+        if pod_name in self.current:
+            ip, start = self.current[pod_name]
+            self.write({"pod": pod_name, "ip": ip, "start": start, "end": end})
+
+    def write(self, entry):
+        if self.file is None:
+            return
+        self.file.write(json.dumps(entry) + "\n")
+        self.file.flush()
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+def load_ip_lifetimes(path):
+    # Returns [(pod, ip, start, end)] with end None for intervals that never closed.
+    intervals = {}
+    with open(path, 'r') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            key = (entry["pod"], entry["ip"], entry["start"])
+            if entry.get("end") is not None or key not in intervals:
+                intervals[key] = entry.get("end")
+    return [(pod, ip, start, end) for (pod, ip, start), end in intervals.items()]
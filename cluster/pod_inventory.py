@@ -0,0 +1,159 @@
+import threading
+from kubernetes import client, watch
+from scan_metrics import KUBERNETES_API_LATENCY
+
+class PodInfo:
+    def __init__(self, name, node_name, ip, phase, ready, start_time=None, uid=None, namespace=None):
+        self.name = name
+        self.node_name = node_name
+        self.ip = ip
+        self.phase = phase
+        self.ready = ready
+        self.start_time = start_time
+        self.uid = uid
+        self.namespace = namespace
+
+    @classmethod
+    def from_pod(cls, pod):
+        statuses = pod.status.container_statuses or []
+        ready = pod.status.phase == "Running" and bool(statuses) and all(status.ready for status in statuses)
+        start_time = pod.status.start_time.timestamp() if pod.status.start_time else None
+        return cls(pod.metadata.name, pod.spec.node_name, pod.status.pod_ip, pod.status.phase, ready, start_time,
+                   pod.metadata.uid, pod.metadata.namespace)
+
+class PodInventory:
+    def __init__(self, v1, namespace, label_selector, watch_timeout=300, retry_interval=5):
+        self.v1 = v1
+        self.namespace = namespace
+        self.label_selector = label_selector
+        self.watch_timeout = watch_timeout
+        self.retry_interval = retry_interval
+        self.pods = {}
+        self.resource_version = None
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def subscribe(self, callback):
+        # callback(event, pod_info) with event in "added", "ip" (IP assigned or changed), "ready",
+        # "deleted";
+        # called from the watch thread, so it must not block.
+        self.subscribers.append(callback)
+        with self.lock:
+            current = list(self.pods.values())
+        for info in current:
+            callback("added", info)
+            if info.ip:
+                callback("ip", info)
+            if info.ready:
+                callback("ready", info)
+
+    def start(self):
+        self.relist()
+        self.thread = threading.Thread(target=self.watch_loop, name=f"PodInventory_{self.namespace}", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=self.retry_interval)
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.pods)
+
+    def names(self):
+        with self.lock:
+            return list(self.pods)
+
+    def get(self, pod_name):
+        with self.lock:
+            return self.pods.get(pod_name)
+
+    def relist(self):
+        with KUBERNETES_API_LATENCY.labels("list_namespaced_pod").time():
+            pods = self.v1.list_namespaced_pod(self.namespace, label_selector=self.label_selector)
+        current = {pod.metadata.name: PodInfo.from_pod(pod) for pod in pods.items}
+        with self.lock:
+            previous = self.pods
+            self.pods = current
+            self.resource_version = pods.metadata.resource_version
+
+        for name in previous.keys() - current.keys():
+            self.publish("deleted", previous[name])
+        for name, info in current.items():
+            self.publish_change(previous.get(name), info)
+
+    def watch_loop(self):
+        while not self.stop_event.is_set():
+            w = watch.Watch()
+            try:
+                for event in w.stream(self.v1.list_namespaced_pod, self.namespace,
+                                      label_selector=self.label_selector,
+                                      resource_version=self.resource_version,
+                                      timeout_seconds=self.watch_timeout,
+                                      allow_watch_bookmarks=True):
+                    if self.stop_event.is_set():
+                        w.stop()
+                        break
+                    self.apply(event)
+            except client.exceptions.ApiException as e:
+                if e.status == 410:
+                    # Our resourceVersion fell out of the watch cache; start over from a fresh list.
+                    self.safe_relist()
+                else:
+                    print(f"PodInventory_Watch error for {self.namespace}: {e}")
+                    self.stop_event.wait(self.retry_interval)
+            except Exception as e:
+                print(f"PodInventory_Watch error for {self.namespace}: {e}")
+                self.stop_event.wait(self.retry_interval)
+
+    def safe_relist(self):
+        while not self.stop_event.is_set():
+            try:
+                self.relist()
+                return
+            except Exception as e:
+                print(f"PodInventory_Relist error for {self.namespace}: {e}")
+                self.stop_event.wait(self.retry_interval)
+
+    def apply(self, event):
+        event_type = event["type"]
+        pod = event["object"]
+        if event_type == "ERROR":
+            raise client.exceptions.ApiException(status=410, reason="watch returned an ERROR event")
+        resource_version = pod.metadata.resource_version
+        if event_type == "BOOKMARK":
+            self.resource_version = resource_version
+            return
+
+        info = PodInfo.from_pod(pod)
+        with self.lock:
+            previous = self.pods.get(info.name)
+            if event_type == "DELETED":
+                self.pods.pop(info.name, None)
+            else:
+                self.pods[info.name] = info
+            self.resource_version = resource_version
+
+        if event_type == "DELETED":
+            if previous is not None:
+                self.publish("deleted", previous)
+        else:
+            self.publish_change(previous, info)
+
+    def publish_change(self, previous, info):
+        if previous is None:
+            self.publish("added", info)
+        if info.ip and (previous is None or previous.ip != info.ip):
+            self.publish("ip", info)
+        if info.ready and (previous is None or not previous.ready):
+            self.publish("ready", info)
+
+    def publish(self, event, info):
+        for callback in self.subscribers:
+            try:
+                callback(event, info)
+            except Exception as e:
+                print(f"PodInventory_Subscriber error on {event} {info.name}: {e}")
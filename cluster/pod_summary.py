@@ -0,0 +1,298 @@
+import json
+import math
+import os
+import re
+import numpy as np
+from sample_store import SampleStoreReader, read_pod_series, resample_grid, STORE_SUFFIX
+
+SUMMARY_SUFFIX = ".summary.json"
+# cl_<pod>.log plus the .log.1 ... .log.N backups RotatingFileHandler leaves behind.
+JSON_LOG_PATTERN = re.compile(r'^cl_(.+)\.log(?:\.(\d+))?$')
+
+class LogBucketSketch:
+    # Quantile sketch with relative-error guarantees (the DDSketch bucketing): value x > 0 lands
+    # in bucket ceil(log_gamma(x)), so any quantile is returned within relative_accuracy of the
+    # true value while memory grows only with the log of the value range.
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value):
+        self.count += 1
+        if value <= 0:
+            self.zero_count += 1
+            return
+        index = math.ceil(math.log(value) / self.log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def quantile(self, q):
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                # Midpoint of the bucket (gamma^(i-1), gamma^i] in the relative sense.
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def merge(self, other):
+        # Sketches with the same relative accuracy merge exactly by adding bucket counts.
+        self.count += other.count
+        self.zero_count += other.zero_count
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def to_dict(self):
+        return {"relative_accuracy": self.relative_accuracy, "zero_count": self.zero_count, "count": self.count,
+                "buckets": {str(index): count for index, count in self.buckets.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["relative_accuracy"])
+        sketch.zero_count = data["zero_count"]
+        sketch.count = data["count"]
+        sketch.buckets = {int(index): count for index, count in data["buckets"].items()}
+        return sketch
+
+class PodSummary:
+    # Running summary of one pod's memory series: count, min/max, Welford mean/variance,
+    # first/last sample time, the node last seen, an all-time sketch and one sketch per
+    # window_seconds window (the newest max_windows are kept).
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self, pod_name, window_seconds=3600, max_windows=168):
+        self.pod_name = pod_name
+        self.window_seconds = window_seconds
+        self.max_windows = max_windows
+        self.node_name = None
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.first_ns = None
+        self.last_ns = None
+        self.sketch = LogBucketSketch()
+        self.windows = {}
+
+    def update(self, timestamp_ns, value, node_name=None):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.first_ns = timestamp_ns if self.first_ns is None else min(self.first_ns, timestamp_ns)
+        self.last_ns = timestamp_ns if self.last_ns is None else max(self.last_ns, timestamp_ns)
+        if node_name is not None:
+            self.node_name = node_name
+        self.sketch.add(value)
+
+        window = timestamp_ns // (self.window_seconds * 10**9) * self.window_seconds
+        if window not in self.windows:
+            self.windows[window] = LogBucketSketch(self.sketch.relative_accuracy)
+            while len(self.windows) > self.max_windows:
+                del self.windows[min(self.windows)]
+        if window in self.windows:
+            self.windows[window].add(value)
+
+    def merge(self, other):
+        # Folds in another summary of the same pod (e.g. written by another scanner shard), with
+        # Chan et al.'s pairwise update for the mean and M2.
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self.first_ns = other.first_ns if self.first_ns is None else min(self.first_ns, other.first_ns)
+        if self.last_ns is None or other.last_ns >= self.last_ns:
+            self.last_ns = other.last_ns
+            self.node_name = other.node_name or self.node_name
+        self.sketch.merge(other.sketch)
+        for start, sketch in other.windows.items():
+            if start in self.windows:
+                self.windows[start].merge(sketch)
+            else:
+                self.windows[start] = LogBucketSketch.from_dict(sketch.to_dict())
+        while len(self.windows) > self.max_windows:
+            del self.windows[min(self.windows)]
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def to_dict(self):
+        return {
+            "pod_name": self.pod_name,
+            "node_name": self.node_name,
+            "count": self.count,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean,
+            "m2": self.m2,
+            "variance": self.variance,
+            "stddev": math.sqrt(self.variance),
+            "first_ns": self.first_ns,
+            "last_ns": self.last_ns,
+            "percentiles": {str(q): self.sketch.quantile(q) for q in self.QUANTILES},
+            "window_seconds": self.window_seconds,
+            "windows": {str(start): dict(sketch.to_dict(),
+                                         percentiles={str(q): sketch.quantile(q) for q in self.QUANTILES})
+                        for start, sketch in sorted(self.windows.items())},
+            "sketch": self.sketch.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data, max_windows=168):
+        summary = cls(data["pod_name"], data["window_seconds"], max_windows)
+        for field in ("node_name", "count", "min", "max", "mean", "m2", "first_ns", "last_ns"):
+            setattr(summary, field, data[field])
+        summary.sketch = LogBucketSketch.from_dict(data["sketch"])
+        summary.windows = {int(start): LogBucketSketch.from_dict(window) for start, window in data["windows"].items()}
+        return summary
+
+def summary_path(log_directory, pod_name):
+    return os.path.join(log_directory, f"cl_{pod_name}{SUMMARY_SUFFIX}")
+
+def load_summary(path):
+    with open(path, 'r') as f:
+        return PodSummary.from_dict(json.load(f))
+
+def save_summary(path, summary):
+    temp_file = path + ".tmp"
+    with open(temp_file, 'w') as f:
+        json.dump(summary.to_dict(), f)
+    os.replace(temp_file, path)
+
+def read_last_json_sample(path):
+    # The last sample of a JSON-lines cl_<pod>.log, or None if it is empty.
+    size = os.path.getsize(path)
+    if size == 0:
+        return None
+    with open(path, 'rb') as f:
+        f.seek(max(0, size - 4096))
+        lines = f.read().splitlines()
+    return json.loads(lines[-1]) if lines else None
+
+class PodLogFiles:
+    # What cluster_scan.py left in a log directory for one pod: the summary sidecar, the .cls
+    # store and the JSON logs (newest first), any of which may be missing. Readers take the
+    # summary when it has samples and fall back to the samples in the store and the JSON logs,
+    # for pods logged before sidecars existed.
+    def __init__(self, pod_name):
+        self.pod_name = pod_name
+        self.summary_file = None
+        self.store_file = None
+        self.json_files = []
+
+    def load_summary(self):
+        if self.summary_file is None:
+            return None
+        summary = load_summary(self.summary_file)
+        return summary if summary.count else None
+
+    def read_series(self):
+        # (timestamps_ns, memory) in time order from the store and the JSON logs together, so a
+        # pod whose JSON history predates its store keeps both; where both hold a timestamp the
+        # store's sample wins.
+        timestamps, memory = [], []
+        if self.store_file is not None:
+            store_timestamps, store_memory = read_pod_series(self.store_file)
+            timestamps.append(store_timestamps)
+            memory.append(store_memory)
+        for path in self.json_files:
+            with open(path, 'r') as f:
+                samples = [json.loads(line) for line in f if line.strip()]
+            # The logs' "%Y-%m-%d %H:%M:%S.%f" UTC timestamps parse straight to datetime64.
+            timestamps.append(np.array([sample["timestamp"] for sample in samples],
+                                       dtype="datetime64[ns]").astype(np.int64))
+            memory.append(np.array([sample["memory_usage"] for sample in samples], dtype=np.float64))
+        if not timestamps:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        timestamps, first = np.unique(np.concatenate(timestamps), return_index=True)
+        return timestamps, np.concatenate(memory)[first]
+
+    def read_memory(self, step_ns=None):
+        # The memory samples, or the series on a step_ns grid (so pods sampled adaptively are
+        # not weighted towards their busy spells).
+        timestamps, memory = self.read_series()
+        if step_ns is None:
+            return memory
+        values = resample_grid(timestamps, memory, step_ns)[1]
+        return values[~np.isnan(values)]
+
+    def last_node(self):
+        # The node of the newest sample, from the newest store chunk or the last JSON line,
+        # whichever is later.
+        newest = []
+        if self.store_file is not None:
+            reader = SampleStoreReader(self.store_file)
+            try:
+                if reader.index:
+                    chunk = max(reader.index, key=lambda chunk: chunk.t_max)
+                    newest.append((chunk.t_max, reader.read_chunk(chunk)[2]))
+            finally:
+                reader.close()
+        for path in self.json_files:
+            sample = read_last_json_sample(path)
+            if sample is not None:
+                newest.append((int(np.datetime64(sample["timestamp"], "ns").astype(np.int64)),
+                               sample.get("node_name")))
+                break
+        return max(newest, key=lambda entry: entry[0])[1] if newest else None
+
+def iter_pod_logs(log_directory):
+    # PodLogFiles for every pod with files in log_directory, in pod name order.
+    pods = {}
+    rotations = {}
+    for filename in sorted(os.listdir(log_directory)):
+        path = os.path.join(log_directory, filename)
+        match = JSON_LOG_PATTERN.match(filename)
+        if filename.startswith('cl_') and filename.endswith(SUMMARY_SUFFIX):
+            pod_name = filename[len('cl_'):-len(SUMMARY_SUFFIX)]
+            pods.setdefault(pod_name, PodLogFiles(pod_name)).summary_file = path
+        elif filename.startswith('cl_') and filename.endswith(STORE_SUFFIX):
+            pod_name = filename[len('cl_'):-len(STORE_SUFFIX)]
+            pods.setdefault(pod_name, PodLogFiles(pod_name)).store_file = path
+        elif match:
+            pods.setdefault(match.group(1), PodLogFiles(match.group(1))).json_files.append(path)
+            rotations[path] = int(match.group(2) or 0)
+    for pod_name in sorted(pods):
+        files = pods[pod_name]
+        files.json_files.sort(key=lambda path: rotations[path])
+        yield files
+
+def pod_log_files(log_directory, pod_name):
+    # PodLogFiles for one pod, found without listing the directory.
+    files = PodLogFiles(pod_name)
+    path = summary_path(log_directory, pod_name)
+    files.summary_file = path if os.path.exists(path) else None
+    path = os.path.join(log_directory, f"cl_{pod_name}{STORE_SUFFIX}")
+    files.store_file = path if os.path.exists(path) and os.path.getsize(path) > 0 else None
+    path = os.path.join(log_directory, f"cl_{pod_name}.log")
+    rotation = 0
+    while os.path.exists(f"{path}.{rotation}" if rotation else path):
+        files.json_files.append(f"{path}.{rotation}" if rotation else path)
+        rotation += 1
+    return files
+
+def summarize(pod_logs):
+    # A PodSummary built from every sample a pod has on disk.
+    summary = PodSummary(pod_logs.pod_name)
+    timestamps, memory = pod_logs.read_series()
+    for timestamp, value in zip(timestamps.tolist(), memory.tolist()):
+        summary.update(timestamp, value)
+    summary.node_name = pod_logs.last_node()
+    return summary
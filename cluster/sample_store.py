@@ -0,0 +1,248 @@
+import mmap
+import os
+import struct
+import zlib
+import numpy as np
+
+# File layout (all integers little-endian):
+#   file header   FILE_HEADER + pod name
+#   chunk*        CHUNK_HEADER + node name + payload (int64 epoch-ns column, float64 memory column)
+#   footer        INDEX_ENTRY per chunk + TRAILER
+# The footer is rewritten on close. A file without a valid trailer (e.g. the scanner was killed)
+# is still readable: the reader falls back to walking the chunk headers.
+# With FLAG_DELTA_XOR the columns are stored Gorilla-style: timestamps as the first value, the first
+# delta and then delta-of-deltas, and memory as the first value's bits followed by each value's bits
+# XORed with the previous one. Steady sampling and unchanged memory both become runs of zeros; the
+# bytes of each column are then transposed (all low bytes, then the next...) so those runs are long
+# and zlib squeezes them to almost nothing.
+FILE_MAGIC = b"CLS1"
+CHUNK_MAGIC = b"CHNK"
+TRAILER_MAGIC = b"CLSI"
+FILE_HEADER = struct.Struct("<4sH")
+CHUNK_HEADER = struct.Struct("<4sBIIqqH")
+INDEX_ENTRY = struct.Struct("<QqqI")
+TRAILER = struct.Struct("<QI4s")
+
+FLAG_ZLIB = 1
+FLAG_DELTA_XOR = 2
+
+STORE_SUFFIX = ".cls"
+
+class ChunkInfo:
+    def __init__(self, offset, t_min, t_max, count):
+        self.offset = offset
+        self.t_min = t_min
+        self.t_max = t_max
+        self.count = count
+
+def read_file_header(buf):
+    magic, name_len = FILE_HEADER.unpack_from(buf, 0)
+    if magic != FILE_MAGIC:
+        raise ValueError("not a sample store file")
+    name_end = FILE_HEADER.size + name_len
+    return bytes(buf[FILE_HEADER.size:name_end]).decode(), name_end
+
+def read_footer(buf):
+    if len(buf) < TRAILER.size:
+        return None, None
+    index_offset, entries, magic = TRAILER.unpack_from(buf, len(buf) - TRAILER.size)
+    if magic != TRAILER_MAGIC or index_offset + entries * INDEX_ENTRY.size + TRAILER.size != len(buf):
+        return None, None
+    index = [ChunkInfo(*INDEX_ENTRY.unpack_from(buf, index_offset + i * INDEX_ENTRY.size)) for i in range(entries)]
+    return index, index_offset
+
+def scan_chunks(buf, offset, end):
+    index = []
+    while offset + CHUNK_HEADER.size <= end:
+        magic, _, count, payload_len, t_min, t_max, node_len = CHUNK_HEADER.unpack_from(buf, offset)
+        chunk_end = offset + CHUNK_HEADER.size + node_len + payload_len
+        if magic != CHUNK_MAGIC or chunk_end > end:
+            break
+        index.append(ChunkInfo(offset, t_min, t_max, count))
+        offset = chunk_end
+    return index, offset
+
+def shuffle_bytes(column):
+    return column.view(np.uint8).reshape(len(column), 8).T.tobytes()
+
+def unshuffle_bytes(data, count, dtype):
+    return np.frombuffer(data, dtype=np.uint8, count=count * 8).reshape(8, count).T.copy().view(dtype).ravel()
+
+def encode_delta_xor(timestamps_ns, memory):
+    timestamps = np.empty(len(timestamps_ns), dtype="<i8")
+    timestamps[:1] = timestamps_ns[:1]
+    timestamps[1:2] = timestamps_ns[1:2] - timestamps_ns[:1]
+    timestamps[2:] = np.diff(timestamps_ns, 2)
+    bits = memory.view("<u8")
+    values = np.empty(len(bits), dtype="<u8")
+    values[:1] = bits[:1]
+    values[1:] = bits[1:] ^ bits[:-1]
+    return shuffle_bytes(timestamps) + shuffle_bytes(values)
+
+def decode_delta_xor(payload, count):
+    encoded = unshuffle_bytes(payload, count, "<i8")
+    timestamps = np.empty(count, dtype=np.int64)
+    timestamps[:1] = encoded[:1]
+    timestamps[1:] = encoded[0] + np.cumsum(np.cumsum(encoded[1:]))
+    bits = np.bitwise_xor.accumulate(unshuffle_bytes(payload[count * 8:], count, "<u8"))
+    return timestamps, bits.view(np.float64)
+
+class SampleStoreWriter:
+    def __init__(self, path, pod_name, compress=True, delta_xor=True):
+        # delta_xor=True stores chunks with FLAG_DELTA_XOR; the reader handles both layouts, so a
+        # file can mix them.
+        self.path = path
+        self.pod_name = pod_name
+        self.compress = compress
+        self.delta_xor = delta_xor
+        self.index = []
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self.file = open(path, "r+b")
+            buf = self.file.read()
+            _, data_start = read_file_header(buf)
+            index, index_offset = read_footer(buf)
+            if index is None:
+                index, index_offset = scan_chunks(buf, data_start, len(buf))
+            self.index = index
+            self.file.seek(index_offset)
+            self.file.truncate()
+        else:
+            self.file = open(path, "wb")
+            name = pod_name.encode()
+            self.file.write(FILE_HEADER.pack(FILE_MAGIC, len(name)) + name)
+
+    def append(self, timestamps_ns, memory, node_name=None):
+        timestamps_ns = np.ascontiguousarray(timestamps_ns, dtype="<i8")
+        memory = np.ascontiguousarray(memory, dtype="<f8")
+        if len(timestamps_ns) == 0:
+            return
+        flags = 0
+        if self.delta_xor:
+            payload = encode_delta_xor(timestamps_ns, memory)
+            flags |= FLAG_DELTA_XOR
+        else:
+            payload = timestamps_ns.tobytes() + memory.tobytes()
+        if self.compress:
+            payload = zlib.compress(payload, 6)
+            flags |= FLAG_ZLIB
+        node = (node_name or "").encode()
+        t_min = int(timestamps_ns.min())
+        t_max = int(timestamps_ns.max())
+
+        offset = self.file.tell()
+        self.file.write(CHUNK_HEADER.pack(CHUNK_MAGIC, flags, len(timestamps_ns), len(payload),
+                                          t_min, t_max, len(node)))
+        self.file.write(node)
+        self.file.write(payload)
+        self.index.append(ChunkInfo(offset, t_min, t_max, len(timestamps_ns)))
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        index_offset = self.file.tell()
+        for chunk in self.index:
+            self.file.write(INDEX_ENTRY.pack(chunk.offset, chunk.t_min, chunk.t_max, chunk.count))
+        self.file.write(TRAILER.pack(index_offset, len(self.index), TRAILER_MAGIC))
+        self.file.close()
+
+def resample_grid(timestamps, memory, step_ns, start_ns=None, end_ns=None, max_gap_ns=None):
+    # Resamples an (irregular, adaptively sampled) series sorted by time onto a regular grid of
+    # step_ns from start_ns (default: the first sample) up to end_ns (default: the last sample).
+    # Each grid point takes the last sample at or before it, since a sample stands for the pod's
+    # memory until the next one; points before the first sample, or more than max_gap_ns after
+    # the last one, are NaN.
+    if end_ns is not None:
+        keep = timestamps < end_ns
+        timestamps, memory = timestamps[keep], memory[keep]
+    if len(timestamps) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    start_ns = int(timestamps[0]) if start_ns is None else start_ns
+    end_ns = int(timestamps[-1]) + 1 if end_ns is None else end_ns
+    grid = np.arange(start_ns, end_ns, step_ns, dtype=np.int64)
+    previous = np.searchsorted(timestamps, grid, side="right") - 1
+    values = memory[np.maximum(previous, 0)].astype(np.float64)
+    missing = previous < 0
+    if max_gap_ns is not None:
+        missing |= grid - timestamps[np.maximum(previous, 0)] > max_gap_ns
+    values[missing] = np.nan
+    return grid, values
+
+class SampleStoreReader:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.pod_name, data_start = read_file_header(self.buf)
+        self.index, _ = read_footer(self.buf)
+        if self.index is None:
+            self.index, _ = scan_chunks(self.buf, data_start, len(self.buf))
+
+    def read_chunk(self, chunk):
+        _, flags, count, payload_len, _, _, node_len = CHUNK_HEADER.unpack_from(self.buf, chunk.offset)
+        node_start = chunk.offset + CHUNK_HEADER.size
+        payload_start = node_start + node_len
+        node_name = self.buf[node_start:payload_start].decode() or None
+        if flags & FLAG_DELTA_XOR:
+            payload = self.buf[payload_start:payload_start + payload_len]
+            if flags & FLAG_ZLIB:
+                payload = zlib.decompress(payload)
+            timestamps, memory = decode_delta_xor(payload, count)
+        elif flags & FLAG_ZLIB:
+            payload = zlib.decompress(self.buf[payload_start:payload_start + payload_len])
+            timestamps = np.frombuffer(payload, dtype="<i8", count=count)
+            memory = np.frombuffer(payload, dtype="<f8", count=count, offset=count * 8)
+        else:
+            timestamps = np.frombuffer(self.buf, dtype="<i8", count=count, offset=payload_start)
+            memory = np.frombuffer(self.buf, dtype="<f8", count=count, offset=payload_start + count * 8)
+        return timestamps, memory, node_name
+
+    def read(self, start_ns=None, end_ns=None):
+        chunks = [chunk for chunk in self.index
+                  if (start_ns is None or chunk.t_max >= start_ns) and (end_ns is None or chunk.t_min < end_ns)]
+        if not chunks:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        columns = [self.read_chunk(chunk)[:2] for chunk in chunks]
+        timestamps = np.concatenate([ts for ts, _ in columns])
+        memory = np.concatenate([mem for _, mem in columns])
+
+        mask = np.ones(len(timestamps), dtype=bool)
+        if start_ns is not None:
+            mask &= timestamps >= start_ns
+        if end_ns is not None:
+            mask &= timestamps < end_ns
+        timestamps, memory = timestamps[mask], memory[mask]
+        order = np.argsort(timestamps, kind="stable")
+        return timestamps[order], memory[order]
+
+    def read_grid(self, step_ns, start_ns=None, end_ns=None, max_gap_ns=None):
+        timestamps, memory = self.read(None, end_ns)
+        return resample_grid(timestamps, memory, step_ns, start_ns, end_ns, max_gap_ns)
+
+    def node_names(self):
+        return sorted({self.read_chunk(chunk)[2] for chunk in self.index} - {None})
+
+    def time_range(self):
+        if not self.index:
+            return None, None
+        return min(chunk.t_min for chunk in self.index), max(chunk.t_max for chunk in self.index)
+
+    def close(self):
+        self.buf.close()
+
+def read_pod_series(path, start_ns=None, end_ns=None):
+    reader = SampleStoreReader(path)
+    try:
+        timestamps, memory = reader.read(start_ns, end_ns)
+        # Copy out of the mmap so the arrays outlive the reader.
+        return timestamps.copy(), memory.copy()
+    finally:
+        reader.close()
+
+def read_pod_grid(path, step_ns, start_ns=None, end_ns=None, max_gap_ns=None):
+    reader = SampleStoreReader(path)
+    try:
+        return reader.read_grid(step_ns, start_ns, end_ns, max_gap_ns)
+    finally:
+        reader.close()
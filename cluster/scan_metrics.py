@@ -0,0 +1,38 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+PROMETHEUS_QUERY_LATENCY = Histogram(
+    "scanner_prometheus_query_seconds",
+    "Latency of Prometheus HTTP API queries issued by the scanner",
+    ["query"], buckets=LATENCY_BUCKETS)
+
+KUBERNETES_API_LATENCY = Histogram(
+    "scanner_kubernetes_api_seconds",
+    "Latency of Kubernetes API calls issued by the scanner",
+    ["call"], buckets=LATENCY_BUCKETS)
+
+TICK_DURATION = Histogram(
+    "scanner_tick_duration_seconds",
+    "Wall time spent collecting one cluster_scan tick",
+    buckets=LATENCY_BUCKETS)
+
+TICKS = Counter("scanner_ticks", "cluster_scan ticks executed")
+TICK_OVERRUNS = Counter("scanner_tick_overruns", "cluster_scan ticks that finished after their deadline")
+MISSED_SLOTS = Counter("scanner_missed_slots", "Sampling slots skipped because a tick overran")
+LATE_SAMPLES = Counter("scanner_late_samples", "Per-pod samples dropped for missing the tick deadline")
+
+BUFFERED_SAMPLES = Gauge(
+    "scanner_buffered_samples",
+    "Samples held in MonitorLogger buffers and not yet written to disk",
+    ["log_directory"])
+
+DROPPED_SAMPLES = Counter(
+    "scanner_dropped_samples",
+    "Samples MonitorLogger discarded because its writer queue was full",
+    ["log_directory"])
+
+ACTIVE_CAPTURES = Gauge(
+    "scanner_active_captures",
+    "kubectl sniff processes currently running",
+    ["output_directory"])
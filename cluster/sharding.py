@@ -0,0 +1,395 @@
+import bisect
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import signal
+import threading
+import time
+from kubernetes import config
+from prometheus_client import start_http_server
+from pod_inventory import PodInventory
+from cluster_scan import MonitorLogger, monitor_cluster_workload, create_core_api, format_timestamp, to_epoch_ns
+from ip_lifetimes import IP_LIFETIMES_FILENAME
+from sample_store import SampleStoreReader, SampleStoreWriter, STORE_SUFFIX
+from pod_summary import PodSummary, save_summary, summary_path, iter_pod_logs
+
+class HashRing:
+    # Consistent hashing with virtual nodes: each member owns the arcs ending at its
+    # virtual_nodes points on a 64-bit ring, so a member joining or leaving only moves the keys
+    # on its own arcs (about 1/N of them) and every other key keeps its owner.
+    def __init__(self, members=(), virtual_nodes=128):
+        self.virtual_nodes = virtual_nodes
+        self.set_members(members)
+
+    @staticmethod
+    def hash(key):
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+    def set_members(self, members):
+        points = sorted((self.hash(f"{member}#{i}"), member) for member in members for i in range(self.virtual_nodes))
+        # Swapped in one assignment so concurrent owner() calls see either the old or the new ring.
+        self.points = ([point for point, _ in points], [member for _, member in points])
+        self.members = sorted(set(members))
+
+    def owner(self, key):
+        points, owners = self.points
+        if not points:
+            return None
+        return owners[bisect.bisect(points, self.hash(key)) % len(points)]
+
+class ShardedInventory:
+    # The part of a PodInventory this shard owns on the ring, keyed by pod UID. Exposes the
+    # PodInventory interface the scanners use (subscribe/snapshot/names/get/v1); when the ring
+    # changes, rebalance() hands pods over as "handoff" here and "added"/"ip"/"ready" on the
+    # new owner. "handoff" is not "deleted": the pod is still running, so subscribers stop
+    # tracking it without recording that it went away.
+    def __init__(self, inventory, ring, shard):
+        self.inventory = inventory
+        self.v1 = inventory.v1
+        self.namespace = inventory.namespace
+        self.ring = ring
+        self.shard = shard
+        self.owned = set()
+        self.subscribers = []
+        self.lock = threading.Lock()
+        inventory.subscribe(self.handle_pod_event)
+
+    def owns(self, info):
+        return self.ring.owner(info.uid or f"{info.namespace}/{info.name}") == self.shard
+
+    def handle_pod_event(self, event, info):
+        with self.lock:
+            if event == "deleted":
+                if info.name not in self.owned:
+                    return
+                self.owned.discard(info.name)
+            elif info.name in self.owned or (event == "added" and self.owns(info)):
+                self.owned.add(info.name)
+            else:
+                return
+        self.publish(event, info)
+
+    def rebalance(self):
+        handed_off, taken_over = [], []
+        with self.lock:
+            for name, info in self.inventory.snapshot().items():
+                if name in self.owned and not self.owns(info):
+                    self.owned.discard(name)
+                    handed_off.append(info)
+                elif name not in self.owned and self.owns(info):
+                    self.owned.add(name)
+                    taken_over.append(info)
+        for info in handed_off:
+            self.publish("handoff", info)
+        for info in taken_over:
+            self.publish_current(info, self.subscribers)
+        if handed_off or taken_over:
+            print(f"Cluster_{self.shard} rebalanced {self.namespace}: handed off {len(handed_off)}, "
+                  f"took over {len(taken_over)} pod(s)")
+
+    def publish_current(self, info, subscribers):
+        for callback in subscribers:
+            callback("added", info)
+            if info.ip:
+                callback("ip", info)
+            if info.ready:
+                callback("ready", info)
+
+    def publish(self, event, info):
+        for callback in self.subscribers:
+            try:
+                callback(event, info)
+            except Exception as e:
+                print(f"Cluster_{self.shard} subscriber error on {event} {info.name}: {e}")
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+        for info in self.snapshot().values():
+            self.publish_current(info, [callback])
+
+    def snapshot(self):
+        with self.lock:
+            owned = set(self.owned)
+        return {name: info for name, info in self.inventory.snapshot().items() if name in owned}
+
+    def names(self):
+        return list(self.snapshot())
+
+    def get(self, pod_name):
+        with self.lock:
+            return self.inventory.get(pod_name) if pod_name in self.owned else None
+
+    def start(self):
+        self.inventory.start()
+
+    def stop(self):
+        self.inventory.stop()
+
+def namespace_directory(directory, namespace, namespaces):
+    # Pod names are only unique within a namespace, so when the targets span several namespaces
+    # each one's cl_<pod> files go in its own subdirectory; a single namespace keeps the flat
+    # cl_log layout the analysis scripts read.
+    return directory if len(set(namespaces)) <= 1 else os.path.join(directory, namespace)
+
+def shard_worker(shard, members, targets, output_directory, end_time, log_interval, pool_size, metrics_port,
+                 control, max_interval=None):
+    # Worker process: one pod watch per (namespace, selector) target filtered to this shard, one
+    # cluster scan loop per target, writing to this shard's MonitorLogger for the target's
+    # namespace. Ring membership updates and "stop" arrive on the control queue.
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+    config.load_kube_config()
+    v1 = create_core_api(pool_size)
+    ring = HashRing(members)
+    namespaces = [namespace for namespace, _ in targets]
+    loggers = {}
+    if metrics_port is not None:
+        start_http_server(metrics_port)
+
+    views = []
+    threads = []
+    for i, (namespace, selector) in enumerate(targets):
+        if namespace not in loggers:
+            loggers[namespace] = MonitorLogger(
+                namespace_directory(os.path.join(output_directory, shard), namespace, namespaces),
+                buffer_size=10, backend="columnar")
+        logger = loggers[namespace]
+        view = ShardedInventory(PodInventory(v1, namespace, selector), ring, shard)
+        views.append(view)
+        ip_lifetimes_path = os.path.join(logger.log_directory, f"pod_ip_lifetimes.{i}.jsonl")
+        threads.append(threading.Thread(target=monitor_cluster_workload,
+                                        args=(namespace, selector, logger, max(0, end_time - time.time())),
+                                        kwargs=dict(inventory=view, log_interval=log_interval, max_workers=pool_size,
+                                                    metrics_port=None, ip_lifetimes_path=ip_lifetimes_path,
+                                                    stop_event=stop_event, max_interval=max_interval),
+                                        name=f"{shard}_{namespace}", daemon=True))
+    try:
+        for view in views:
+            view.start()
+        for thread in threads:
+            thread.start()
+        while any(thread.is_alive() for thread in threads):
+            try:
+                message = control.get(timeout=1)
+            except queue.Empty:
+                continue
+            if message == "stop":
+                stop_event.set()
+            else:
+                ring.set_members(message)
+                for view in views:
+                    view.rebalance()
+    finally:
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+        for view in views:
+            view.stop()
+        for logger in loggers.values():
+            logger.close_all()
+
+class ShardCoordinator:
+    # Runs `workers` shard processes over the targets for session_duration seconds. A shard that
+    # dies leaves the ring (its pods move to the survivors) and rejoins after restart_delay
+    # (taking the same pods back); every change is broadcast to the live shards.
+    def __init__(self, targets, workers, output_directory, session_duration, log_interval=1, pool_size=16,
+                 metrics_port=None, restart_delay=5, max_interval=None):
+        self.targets = targets
+        self.shards = [f"shard-{i}" for i in range(workers)]
+        self.output_directory = output_directory
+        self.session_duration = session_duration
+        self.log_interval = log_interval
+        self.pool_size = pool_size
+        self.metrics_port = metrics_port
+        self.restart_delay = restart_delay
+        self.max_interval = max_interval
+        self.context = multiprocessing.get_context("spawn")
+        self.workers = {}
+        self.end_time = None
+
+    def shard_directories(self):
+        return [os.path.join(self.output_directory, shard) for shard in self.shards]
+
+    def start_worker(self, shard, members):
+        control = self.context.Queue()
+        metrics_port = None if self.metrics_port is None else self.metrics_port + 1 + self.shards.index(shard)
+        process = self.context.Process(target=shard_worker, name=shard,
+                                       args=(shard, members, self.targets, self.output_directory, self.end_time,
+                                             self.log_interval, self.pool_size, metrics_port, control,
+                                             self.max_interval))
+        process.start()
+        self.workers[shard] = (process, control)
+
+    def broadcast(self):
+        members = sorted(self.workers)
+        for _, control in self.workers.values():
+            control.put(members)
+
+    def run(self, stop_event):
+        self.end_time = time.time() + self.session_duration
+        print(f"Cluster_Sharded scan of {len(self.targets)} target(s) across {len(self.shards)} worker(s) started. "
+              f"(Duration: {self.session_duration}s)")
+        for shard in self.shards:
+            self.start_worker(shard, self.shards)
+        restarts = {}
+        try:
+            while not stop_event.is_set() and self.workers and time.time() < self.end_time:
+                stop_event.wait(1)
+                changed = False
+                for shard, (process, _) in list(self.workers.items()):
+                    if process.is_alive():
+                        continue
+                    del self.workers[shard]
+                    changed = True
+                    if process.exitcode != 0:
+                        print(f"Cluster_{shard} exited with status {process.exitcode}; rebalancing its pods")
+                        restarts[shard] = time.time() + self.restart_delay
+                for shard, due in list(restarts.items()):
+                    if time.time() >= due and time.time() < self.end_time:
+                        del restarts[shard]
+                        self.start_worker(shard, sorted(set(self.workers) | {shard}))
+                        changed = True
+                if changed:
+                    self.broadcast()
+        finally:
+            for _, control in self.workers.values():
+                control.put("stop")
+            for process, _ in self.workers.values():
+                process.join()
+            print("Cluster_Sharded scan ended.")
+
+def store_samples(path):
+    # [(timestamp_ns, node_name, memory)] of a .cls store, chunk by chunk.
+    samples = []
+    reader = SampleStoreReader(path)
+    try:
+        for chunk in sorted(reader.index, key=lambda chunk: chunk.t_min):
+            timestamps, memory, node_name = reader.read_chunk(chunk)
+            samples.extend((timestamp, node_name, value)
+                           for timestamp, value in zip(timestamps.tolist(), memory.tolist()))
+    finally:
+        reader.close()
+    return samples
+
+def json_samples(paths):
+    samples = []
+    for path in paths:
+        with open(path, 'r') as f:
+            for line in f:
+                if line.strip():
+                    sample = json.loads(line)
+                    samples.append((to_epoch_ns(sample["timestamp"]), sample["node_name"], sample["memory_usage"]))
+    return samples
+
+def new_samples(samples, seen):
+    # The samples whose timestamps are not in seen yet, in time order; seen is updated.
+    fresh = []
+    for sample in sorted(samples, key=lambda sample: sample[0]):
+        if sample[0] not in seen:
+            seen.add(sample[0])
+            fresh.append(sample)
+    return fresh
+
+def append_store(path, pod_name, samples):
+    # Appends to (or creates) the store, one chunk per run of samples taken on the same node.
+    # A merge interrupted here leaves a store without a footer, which the reader recovers by
+    # scanning the chunks, and the shards in place for the next merge.
+    writer = SampleStoreWriter(path, pod_name)
+    start = 0
+    for end in range(1, len(samples) + 1):
+        if end == len(samples) or samples[end][1] != samples[start][1]:
+            writer.append([sample[0] for sample in samples[start:end]],
+                          [sample[2] for sample in samples[start:end]], samples[start][1])
+            start = end
+    writer.close()
+
+def append_json_log(path, pod_name, samples):
+    with open(path, 'a') as f:
+        f.writelines(json.dumps({"timestamp": format_timestamp(timestamp / 1e9), "pod_name": pod_name,
+                                 "node_name": node_name, "memory_usage": memory_usage}) + "\n"
+                     for timestamp, node_name, memory_usage in samples)
+
+def merge_pod(pod_name, shard_logs, output_logs, output_directory):
+    # Adds the shards' samples of one pod to its outputs, skipping timestamps already stored
+    # (the pod's existing outputs come first, then the shards in time order). Returns how many
+    # samples were added.
+    seen = set()
+    existing = []
+    if output_logs is not None:
+        if output_logs.store_file is not None:
+            existing.extend(store_samples(output_logs.store_file))
+        existing.extend(json_samples(output_logs.json_files))
+    existing = new_samples(existing, seen)
+    store_added = new_samples([sample for logs in shard_logs if logs.store_file is not None
+                               for sample in store_samples(logs.store_file)], seen)
+    json_added = new_samples(json_samples([path for logs in shard_logs for path in logs.json_files]), seen)
+    if store_added:
+        append_store(os.path.join(output_directory, f"cl_{pod_name}{STORE_SUFFIX}"), pod_name, store_added)
+    if json_added:
+        append_json_log(os.path.join(output_directory, f"cl_{pod_name}.log"), pod_name, json_added)
+
+    # The existing summary plus exactly the samples added; rebuilt from every sample when the
+    # outputs have none yet.
+    summary = output_logs.load_summary() if output_logs is not None else None
+    if summary is None:
+        summary = PodSummary(pod_name)
+        added = sorted(existing + store_added + json_added, key=lambda sample: sample[0])
+    else:
+        added = sorted(store_added + json_added, key=lambda sample: sample[0])
+    for timestamp, node_name, memory_usage in added:
+        summary.update(timestamp, memory_usage, node_name)
+    if summary.count:
+        save_summary(summary_path(output_directory, pod_name), summary)
+    return len(store_added) + len(json_added)
+
+def merge_ip_lifetimes(paths, output_path):
+    # The union of the lifetime lines already in output_path and in paths, each line once.
+    entries = {}
+    for path in ([output_path] if os.path.exists(output_path) else []) + paths:
+        with open(path, 'r') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    entries.setdefault(json.dumps(entry, sort_keys=True), entry)
+    temp_file = output_path + ".tmp"
+    with open(temp_file, 'w') as f:
+        f.writelines(json.dumps(entry) + "\n"
+                     for entry in sorted(entries.values(), key=lambda entry: entry.get("end", entry["start"])))
+    os.replace(temp_file, output_path)
+
+def merge_directories(shard_directories, output_directory):
+    # Merges the shards' files for one namespace into output_directory: one store, JSON log and
+    # summary per pod (a pod handed between shards has samples in several) and one IP lifetimes
+    # file. Outputs already there (an earlier session, or a merge that was interrupted) are kept
+    # and only samples at new timestamps are added, so merging again never duplicates anything.
+    os.makedirs(output_directory, exist_ok=True)
+    shard_directories = [directory for directory in shard_directories if os.path.isdir(directory)]
+    shard_logs, lifetimes = {}, []
+    for directory in shard_directories:
+        for pod_logs in iter_pod_logs(directory):
+            shard_logs.setdefault(pod_logs.pod_name, []).append(pod_logs)
+        lifetimes.extend(glob.glob(os.path.join(directory, "pod_ip_lifetimes*.jsonl")))
+    output_logs = {pod_logs.pod_name: pod_logs for pod_logs in iter_pod_logs(output_directory)}
+
+    added = 0
+    for pod_name, logs in shard_logs.items():
+        added += merge_pod(pod_name, logs, output_logs.get(pod_name), output_directory)
+    merge_ip_lifetimes(lifetimes, os.path.join(output_directory, IP_LIFETIMES_FILENAME))
+    print(f"Cluster_Merged {added} new sample(s) of {len(shard_logs)} pod(s) from "
+          f"{len(shard_directories)} shard(s) into {output_directory}")
+
+def merge_shards(shard_directories, output_directory, namespaces=()):
+    # Merges every namespace's shard files into the cl_log view (see namespace_directory), then
+    # removes the shard directories.
+    namespaces = sorted(set(namespaces)) or [None]
+    for namespace in namespaces:
+        merge_directories([namespace_directory(directory, namespace, namespaces) for directory in shard_directories],
+                          namespace_directory(output_directory, namespace, namespaces))
+    for directory in shard_directories:
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
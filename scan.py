@@ -0,0 +1,252 @@
+import argparse
+import asyncio
+import glob
+import json
+import os
+import signal
+import sys
+import threading
+from kubernetes import config
+from prometheus_client import start_http_server
+
+ROOT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(ROOT_DIRECTORY, 'cluster'))
+sys.path.append(os.path.join(ROOT_DIRECTORY, 'application'))
+from pod_inventory import PodInventory
+from cluster_scan import MonitorLogger, monitor_cluster_workload, create_core_api
+from application_scan import NetworkTrafficLogger, monitor_application_traffic
+from live_matrix import CommunicationMatrix
+from node_capture import NodeCaptureManager
+from sharding import ShardCoordinator, merge_shards, namespace_directory
+
+class Stage:
+    # One step of the post-scan pipeline: a script run from its own directory (the scripts use
+    # paths relative to it). It is up to date when every output exists and is newer than every
+    # input; inputs and outputs are glob patterns relative to the repository root (or absolute).
+    def __init__(self, name, directory, command, inputs, outputs, after=()):
+        self.name = name
+        self.directory = directory
+        self.command = command
+        self.inputs = inputs
+        self.outputs = outputs
+        self.after = after
+
+    def up_to_date(self):
+        inputs = [path for pattern in self.inputs for path in glob.glob(os.path.join(ROOT_DIRECTORY, pattern))]
+        outputs = [glob.glob(os.path.join(ROOT_DIRECTORY, pattern)) for pattern in self.outputs]
+        if not self.outputs or not all(outputs):
+            return False
+        newest_input = max((os.path.getmtime(path) for path in inputs), default=0)
+        return min(os.path.getmtime(path) for paths in outputs for path in paths) >= newest_input
+
+def pipeline_stages(capacity_file=None, cluster_output="./cluster/cl_log", application_output="./application/pcap"):
+    # cluster_output and application_output are where the scanners wrote (--cluster-output,
+    # --application-output); the stages read from there. Their own outputs stay in the repository.
+    cluster_output = os.path.abspath(cluster_output)
+    application_output = os.path.abspath(application_output)
+    ip_lifetimes = os.path.join(cluster_output, "pod_ip_lifetimes.jsonl")
+    stages = [
+        Stage("convert_app", "application", ["convert_app.py", "--pcap-directory", application_output],
+              [os.path.join(glob.escape(application_output), "*.pcap")],
+              ["application/app_log/.convert_app.manifest.json"]),
+        Stage("visualization", "analysis",
+              ["visualization.py", "--output", "pod_communication_graph.png", "--aggregate", "--top-k", "200",
+               "--ip-lifetimes", ip_lifetimes],
+              ["application/app_log/*_filtered.log", glob.escape(ip_lifetimes)],
+              ["analysis/pod_communication_counts.csv", "analysis/pod_communication_bytes.csv",
+               "analysis/pod_communication_graph.png"],
+              after=("convert_app",)),
+        Stage("priority", "analysis", ["priority.py", "--log-directory", cluster_output],
+              [os.path.join(glob.escape(cluster_output), "cl_*")], ["analysis/Pod_communication_dep.csv"]),
+    ]
+    if capacity_file:
+        # recommend_2 prompts for a node count when it has no capacities, so it only runs
+        # unattended with a capacity file. It prints its recommendation and writes no output.
+        stages.append(Stage("recommend", "analysis",
+                            ["recommend_2.py", "--capacity-file", os.path.abspath(capacity_file),
+                             "--log-directory", cluster_output],
+                            [], [], after=("visualization", "priority")))
+    return stages
+
+async def run_stage(stage, stop_event, running):
+    print(f"Scan_Stage {stage.name} started.")
+    # Agg keeps any plt.show() from blocking on a window.
+    environment = dict(os.environ, MPLBACKEND="Agg")
+    process = await asyncio.create_subprocess_exec(sys.executable, *stage.command,
+                                                   cwd=os.path.join(ROOT_DIRECTORY, stage.directory),
+                                                   env=environment, stdin=asyncio.subprocess.DEVNULL)
+    running.add(process)
+    try:
+        returncode = await process.wait()
+    finally:
+        running.discard(process)
+    if returncode != 0 and not stop_event.is_set():
+        raise RuntimeError(f"stage {stage.name} exited with status {returncode}")
+    print(f"Scan_Stage {stage.name} finished.")
+
+async def run_pipeline(stages, stop_event, running, force=False):
+    # Runs the stages as a DAG: each starts once the stages it comes after are done, independent
+    # stages run concurrently, and up-to-date stages are skipped. A failed stage skips the
+    # stages that depend on it.
+    tasks = {}
+
+    async def run(stage):
+        for name in stage.after:
+            if name in tasks and not await tasks[name]:
+                print(f"Scan_Stage {stage.name} skipped: {name} did not complete.")
+                return False
+        if stop_event.is_set():
+            return False
+        if not force and stage.up_to_date():
+            print(f"Scan_Stage {stage.name} is up to date.")
+            return True
+        try:
+            await run_stage(stage, stop_event, running)
+        except Exception as e:
+            print(f"Scan_Error in stage {stage.name}: {e}")
+            return False
+        return not stop_event.is_set()
+
+    for stage in stages:
+        tasks[stage.name] = asyncio.ensure_future(run(stage))
+    results = await asyncio.gather(*tasks.values())
+    return all(results)
+
+async def run_scan(args, stop_event):
+    config.load_kube_config()
+    # One API client (and urllib3 pool) and one pod watch shared by both scanners.
+    v1 = create_core_api(args.pool_size)
+    inventory = PodInventory(v1, args.namespace, args.selector or f'app={args.application}')
+    if args.metrics_port is not None:
+        start_http_server(args.metrics_port)
+
+    cluster_logger = MonitorLogger(args.cluster_output, buffer_size=10, backend="columnar")
+    live_matrix = CommunicationMatrix(args.live_matrix, args.snapshot_interval) if args.live_matrix else None
+    if args.capture_mode == "node":
+        application_logger = NodeCaptureManager(args.application_output, args.namespace,
+                                                rotate_bytes=args.rotate_mb * 1024 * 1024,
+                                                rotate_seconds=args.rotate_seconds, max_files=args.max_files,
+                                                live_matrix=live_matrix)
+    else:
+        application_logger = NetworkTrafficLogger(args.application_output, live_matrix)
+
+    try:
+        # subscribe() replays the pods already listed, so the scanners can subscribe after the
+        # shared inventory has started.
+        await asyncio.to_thread(inventory.start)
+        scanners = [
+            asyncio.to_thread(monitor_cluster_workload, args.namespace, args.application, cluster_logger,
+                              args.duration, inventory=inventory, log_interval=args.interval,
+                              max_workers=args.pool_size, metrics_port=None, stop_event=stop_event,
+                              max_interval=args.max_interval),
+            asyncio.to_thread(monitor_application_traffic, args.namespace, args.application, application_logger,
+                              args.duration, inventory=inventory, metrics_port=None, stop_event=stop_event),
+        ]
+        results = await asyncio.gather(*scanners, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"Scan_Error: {result}")
+    finally:
+        # Both scanners have returned (their own finally blocks terminated the captures and
+        # flushed), so nothing writes to the cluster logger any more.
+        inventory.stop()
+        await asyncio.to_thread(cluster_logger.close_all)
+        print("Scan_Buffers and captures drained.")
+
+def parse_target(target, default_selector):
+    # "namespace" or "namespace:label-selector".
+    namespace, _, selector = target.partition(":")
+    return namespace, selector or default_selector
+
+def sharded_targets(args):
+    default_selector = args.selector or f'app={args.application}'
+    return [parse_target(target, default_selector) for target in args.target or [args.namespace]]
+
+async def run_sharded_scan(args, stop_event):
+    # Cluster collection only: worker processes each scan the pods they own on the hash ring into
+    # <cluster-output>/shards/shard-<k>, merged into <cluster-output> once they have drained
+    # (and then removed). Targets in several namespaces get one subdirectory per namespace.
+    targets = sharded_targets(args)
+    shards_directory = os.path.join(args.cluster_output, "shards")
+    coordinator = ShardCoordinator(targets, args.workers, shards_directory, args.duration, args.interval,
+                                   args.pool_size, args.metrics_port, max_interval=args.max_interval)
+    await asyncio.to_thread(coordinator.run, stop_event)
+    await asyncio.to_thread(merge_shards, coordinator.shard_directories(), args.cluster_output,
+                            [namespace for namespace, _ in targets])
+    if os.path.isdir(shards_directory) and not os.listdir(shards_directory):
+        os.rmdir(shards_directory)
+
+async def main(args):
+    stop_event = threading.Event()
+    running = set()
+
+    def request_stop(signal_name):
+        print(f"Scan_{signal_name} received, draining...")
+        stop_event.set()
+        for process in running:
+            if process.returncode is None:
+                process.terminate()
+
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signal_number, request_stop, signal.Signals(signal_number).name)
+
+    if args.skip_scan:
+        pass
+    elif args.workers > 1 or args.target:
+        await run_sharded_scan(args, stop_event)
+    else:
+        await run_scan(args, stop_event)
+    if args.pipeline and not stop_event.is_set():
+        cluster_output = args.cluster_output
+        if args.workers > 1 or args.target:
+            # After a scan across namespaces the pipeline analyses --namespace's subdirectory.
+            namespaces = [namespace for namespace, _ in sharded_targets(args)]
+            cluster_output = namespace_directory(cluster_output, args.namespace, namespaces)
+        stages = pipeline_stages(args.capacity_file, cluster_output, args.application_output)
+        if await run_pipeline(stages, stop_event, running, args.force):
+            print("Scan_Pipeline completed.")
+        else:
+            print("Scan_Pipeline did not complete.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", help="JSON file of option defaults, keyed like the options "
+                                         "(e.g. {\"namespace\": \"teastore\", \"duration\": 600})")
+    parser.add_argument("--namespace", default="teastore")
+    parser.add_argument("--application", default="teastore")
+    parser.add_argument("--selector", help="Pod label selector (default: app=<application>)")
+    parser.add_argument("--duration", type=int, default=120)
+    parser.add_argument("--interval", type=float, default=1, help="Cluster sampling interval in seconds")
+    parser.add_argument("--max-interval", type=float,
+                        help="Let stable pods back off to this cluster sampling interval (default: --interval)")
+    parser.add_argument("--pool-size", type=int, default=16,
+                        help="Kubernetes connection pool size and cluster scan worker count")
+    parser.add_argument("--metrics-port", type=int, default=8000)
+    parser.add_argument("--cluster-output", default="./cluster/cl_log")
+    parser.add_argument("--application-output", default="./application/pcap")
+    parser.add_argument("--live-matrix", metavar="CSV_PATH")
+    parser.add_argument("--snapshot-interval", type=float, default=10)
+    parser.add_argument("--capture-mode", choices=["pod", "node"], default="pod")
+    parser.add_argument("--rotate-mb", type=int, default=100)
+    parser.add_argument("--rotate-seconds", type=int, default=300)
+    parser.add_argument("--max-files", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Shard cluster collection across this many worker processes (no captures)")
+    parser.add_argument("--target", action="append", metavar="NAMESPACE[:SELECTOR]",
+                        help="Sharded scan target; repeatable (default: --namespace with --selector)")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="After the scan, run conversion and analysis, skipping up-to-date stages")
+    parser.add_argument("--skip-scan", action="store_true", help="Only run the pipeline")
+    parser.add_argument("--capacity-file", help="Node capacity CSV; adds a recommend_2.py stage to the pipeline")
+    parser.add_argument("--force", action="store_true", help="Run every pipeline stage even if up to date")
+
+    known, _ = parser.parse_known_args()
+    if known.config:
+        with open(known.config, 'r') as f:
+            parser.set_defaults(**{key.replace('-', '_'): value for key, value in json.load(f).items()})
+    args = parser.parse_args()
+
+    # The scanners write relative to the repository root, as start_scan.sh has always run them.
+    os.chdir(ROOT_DIRECTORY)
+    asyncio.run(main(args))
@@ -2,11 +2,9 @@
 
 echo "🔥  Start scanning system"
 
-python3 ./cluster/cluster_scan.py &
-echo $! > cluster_scan_pid.txt
-
-python3 ./application/application_scan.py &
-echo $! > application_scan_pid.txt
+# Options are passed through to scan.py, e.g. ./start_scan.sh --namespace teastore --duration 600 --pipeline
+python3 ./scan.py "$@" &
+echo $! > scan_pid.txt
 
 
 
@@ -14,5 +12,5 @@ wait
 
 echo "🔥  Scanning has completed."
 
-rm -rf cluster_scan_pid.txt application_scan_pid.txt
+rm -rf scan_pid.txt
 
@@ -2,22 +2,17 @@
 
 echo "🔥  Stopping the scanning processes..."
 
-if [ -f cluster_scan_pid.txt ]; then
-    kill $(cat cluster_scan_pid.txt)
-    echo "Cluster scan process stopped."
-    rm cluster_scan_pid.txt
+if [ -f scan_pid.txt ]; then
+    PID=$(cat scan_pid.txt)
+    # SIGTERM lets scan.py stop its captures and flush the cluster logs before exiting.
+    kill -TERM $PID
+    while kill -0 $PID 2>/dev/null; do
+        sleep 1
+    done
+    echo "Scan process stopped."
+    rm -f scan_pid.txt
 else
-    echo "Cluster scan PID file not found."
-fi
-
-
-if [ -f application_scan_pid.txt ]; then
-    kill $(cat application_scan_pid.txt)
-    echo "Application scan process stopped."
-    rm application_scan_pid.txt
-else
-    echo "Application scan PID file not found."
+    echo "Scan PID file not found."
 fi
 
 echo "🔥  All processes have been stopped."
-
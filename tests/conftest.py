@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The scanners and analysis scripts import their siblings by module name; the benchmarks' fake
+# servers stand in for Kubernetes and Prometheus.
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for directory in ("cluster", "application", "analysis", "benchmarks"):
+    sys.path.insert(0, os.path.join(ROOT_DIRECTORY, directory))
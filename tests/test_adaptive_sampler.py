@@ -0,0 +1,79 @@
+from cluster_scan import AdaptiveSampler, MonitorLogger
+from pod_inventory import PodInfo
+from pod_resources import load_pod_memory
+
+def pod(name="a", start_time=0.0):
+    return PodInfo(name, "node-a", "10.0.0.1", "Running", True, start_time=start_time)
+
+def run(sampler, pods, memory, ticks, start=1000):
+    # Ticks once a second and returns {pod: [sample times]}; memory(pod, t) is None for a failed sample.
+    sampled = {name: [] for name in pods}
+    for t in range(start, start + ticks):
+        for name in sampler.due(pods, t):
+            sampled[name].append(t)
+            sampler.observe(name, pods[name], t, memory(name, t))
+    return sampled
+
+def gaps(times):
+    return [b - a for a, b in zip(times, times[1:])]
+
+def test_stable_pod_backs_off_to_max_interval():
+    sampler = AdaptiveSampler(1, 8)
+    sampled = run(sampler, {"a": pod()}, lambda name, t: 100.0, 40)
+    # The first sample has nothing to compare with, so the second comes a tick later.
+    assert gaps(sampled["a"])[:6] == [1, 2, 4, 8, 8, 8]
+    assert sampler.sampled == len(sampled["a"]) and sampler.sampled + sampler.skipped == 40
+
+def test_change_resets_the_interval():
+    sampler = AdaptiveSampler(1, 8, change_threshold=0.05)
+    # Flat, then a 10% jump at 1015: the first sample after it goes back to every tick.
+    sampled = run(sampler, {"a": pod()}, lambda name, t: 100.0 if t < 1015 else 110.0, 30)
+    times = sampled["a"]
+    first_after = next(t for t in times if t >= 1015)
+    assert times[times.index(first_after) + 1] == first_after + 1
+    # A change within the threshold keeps backing off.
+    sampler = AdaptiveSampler(1, 8, change_threshold=0.05)
+    sampled = run(sampler, {"a": pod()}, lambda name, t: 100.0 if t < 1015 else 104.0, 30)
+    assert gaps(sampled["a"]) == [1, 2, 4, 8, 8]
+
+def test_failed_sample_is_retried_next_tick():
+    sampler = AdaptiveSampler(1, 8)
+    sampled = run(sampler, {"a": pod()}, lambda name, t: None if t == 1015 else 100.0, 30)
+    assert 1015 in sampled["a"] and 1016 in sampled["a"]
+    # The failure did not forget the last value: backing off resumes from 1016.
+    assert gaps(sampled["a"][sampled["a"].index(1016):])[:2] == [2, 4]
+
+def test_new_pod_is_sampled_every_tick_during_warmup():
+    sampler = AdaptiveSampler(1, 8, warmup=60)
+    sampled = run(sampler, {"a": pod(start_time=990.0)}, lambda name, t: 100.0, 80)
+    assert sampled["a"][:50] == list(range(1000, 1050))
+    assert max(gaps(sampled["a"])) > 1
+
+def test_tick_jitter_does_not_skip_a_due_pod():
+    sampler = AdaptiveSampler(1, 8)
+    sampler.observe("a", pod(), 1000.0, 100.0)
+    sampler.observe("a", pod(), 1002.0, 100.0)
+    # Due at 1004; the tick grid lands a hair early.
+    assert sampler.due({"a": pod()}, 1003.9999999) == ["a"]
+    assert sampler.due({"a": pod()}, 1003.0) == []
+
+def test_gone_pods_are_forgotten():
+    sampler = AdaptiveSampler(1, 8)
+    run(sampler, {"a": pod(), "b": pod("b")}, lambda name, t: 100.0, 20)
+    assert sampler.due({"b": pod("b")}, 1020) in ([], ["b"])
+    assert "a" not in sampler.pods
+    # Back under the same name, it starts over as a new pod.
+    assert sampler.due({"a": pod(), "b": pod("b")}, 1021)[0] == "a"
+
+def test_p95_is_weighted_by_time_not_sample_count(tmp_path):
+    # Sampled every second during a 10 s spike, then backed off to a sample every 8 s over 390 s
+    # of low memory: by count the spike is a sixth of the samples, by time a fortieth.
+    logger = MonitorLogger(str(tmp_path), backend="columnar", background=False)
+    for t in range(0, 10):
+        logger.log(1000 + t, "a", "node-a", 1000.0)
+    for t in range(10, 400, 8):
+        logger.log(1000 + t, "a", "node-a", 10.0)
+    logger.close_all()
+    peak, p95 = load_pod_memory(str(tmp_path))["a"]
+    assert peak == 1000.0
+    assert p95 == 10.0
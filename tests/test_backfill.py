@@ -0,0 +1,54 @@
+import pytest
+import cluster_scan
+from cluster_scan import MonitorLogger, backfill_cluster_history
+from fake_prometheus import FakePrometheus
+from synthetic import SyntheticCluster
+
+@pytest.fixture
+def cluster(monkeypatch):
+    cluster = SyntheticCluster(3, seed=1)
+    prometheus = FakePrometheus(cluster).start()
+    monkeypatch.setattr(cluster_scan, "prometheus_url", prometheus.url)
+    yield cluster
+    prometheus.stop()
+
+def log_live(logger, cluster, seconds):
+    # Live samples, a second apart and off the backfill grid.
+    t0 = int(cluster.start_time)
+    for second in seconds:
+        for i, pod_name in enumerate(cluster.pods):
+            logger.log(t0 + second + 0.3, pod_name, cluster.pod_nodes[i], cluster.memory(i, t0 + second + 0.3))
+    logger.flush_all()
+
+def stored_seconds(logger, cluster, pod_name):
+    t0 = int(cluster.start_time)
+    return [round(t / 1e9 - t0, 1) for t in logger.stored_timestamps_ns(pod_name).tolist()]
+
+@pytest.mark.parametrize("backend", ["columnar", "json"])
+def test_backfill_fills_an_outage_between_live_samples(tmp_path, cluster, backend):
+    logger = MonitorLogger(str(tmp_path), backend=backend, background=False)
+    t0 = int(cluster.start_time)
+    # The scanner was down from 100s to 200s and has logged live samples since.
+    log_live(logger, cluster, list(range(0, 100)) + list(range(200, 300)))
+
+    backfill_cluster_history(cluster.namespace, cluster.application, logger, t0, t0 + 299, step=10)
+
+    live = [second + 0.3 for second in list(range(0, 100)) + list(range(200, 300))]
+    gap = [float(second) for second in range(110, 200, 10)]
+    for pod_name in cluster.pods:
+        assert stored_seconds(logger, cluster, pod_name) == sorted(live + gap)
+
+    # A second run finds nothing left to fill.
+    backfill_cluster_history(cluster.namespace, cluster.application, logger, t0, t0 + 299, step=10)
+    for pod_name in cluster.pods:
+        assert stored_seconds(logger, cluster, pod_name) == sorted(live + gap)
+    logger.close_all()
+
+def test_backfill_pages_windows_and_honours_pod_regex(tmp_path, cluster):
+    logger = MonitorLogger(str(tmp_path), backend="columnar", background=False)
+    t0 = int(cluster.start_time)
+    backfill_cluster_history(cluster.namespace, cluster.application, logger, t0, t0 + 99, step=1, max_points=7,
+                             pod_regex=cluster.pods[0])
+    assert stored_seconds(logger, cluster, cluster.pods[0]) == [float(second) for second in range(100)]
+    assert len(logger.stored_timestamps_ns(cluster.pods[1])) == 0
+    logger.close_all()
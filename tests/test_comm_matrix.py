@@ -0,0 +1,79 @@
+import numpy as np
+from comm_matrix import ROUTE_PATTERN, build_file_matrix, build_matrix
+from ip_index import IpIntervalIndex, StaticIpResolver
+from pcap_reader import format_record, KIND_HTTP_200
+
+RESOLVER = StaticIpResolver({"10.0.0.1": "a", "10.0.0.2": "b", "10.0.0.3": "c"})
+
+def line(time, src, dst, protocol="TCP", length=None, info=""):
+    # One packet line as tshark -t ud -T text prints it, frame number first.
+    fields = ["    1", time, f"{src} → {dst}"] + ([protocol, str(length)] if length is not None else []) + [info]
+    return " ".join(field for field in fields if field) + "\n"
+
+def write(tmp_path, name, lines):
+    path = tmp_path / name
+    path.write_bytes("".join(lines).encode())
+    return str(path)
+
+def test_route_pattern_fields():
+    cases = [
+        (line("2024-01-01 12:00:00.123456", "10.0.0.1", "10.0.0.2", "HTTP", 512, "HTTP/1.1 200 OK"),
+         (b"2024-01-01 12:00:00.123456", b"10.0.0.1", b"10.0.0.2", b"512")),
+        # Whole seconds, no length (older logs).
+        (line("2024-01-01 12:00:00", "10.0.0.1", "10.0.0.2"), (b"2024-01-01 12:00:00", b"10.0.0.1", b"10.0.0.2", b"")),
+        # Relative time (tshark's default -t r) is not a timestamp; the packet still counts.
+        (line("0.000131", "10.0.0.3", "10.0.0.1", "MySQL", 90), (b"", b"10.0.0.3", b"10.0.0.1", b"90")),
+        (format_record((1704110400.5, "10.0.0.2", "10.0.0.1", 1514, KIND_HTTP_200)),
+         (b"2024-01-01 12:00:00.500000", b"10.0.0.2", b"10.0.0.1", b"1514")),
+    ]
+    for text, expected in cases:
+        assert ROUTE_PATTERN.findall(text.encode()) == [expected]
+    assert ROUTE_PATTERN.findall(b"    1 0.000000 fe80::1 \xe2\x86\x92 ff02::1 ICMPv6 86\n") == []
+
+def test_file_matrix_counts_packets_and_bytes(tmp_path):
+    lines = [line("2024-01-01 12:00:00.1", "10.0.0.1", "10.0.0.2", "HTTP", 100),
+             line("2024-01-01 12:00:00.2", "10.0.0.1", "10.0.0.2", "HTTP", 50),
+             line("2024-01-01 12:00:00.3", "10.0.0.2", "10.0.0.3"),
+             # Unknown IPs on either side are not counted.
+             line("2024-01-01 12:00:00.4", "10.0.0.9", "10.0.0.2", "TCP", 60),
+             line("2024-01-01 12:00:00.5", "10.0.0.1", "192.168.0.1", "TCP", 60)]
+    path = write(tmp_path, "a_filtered.log", lines * 3)
+    for chunk_size in (1, 10, 1 << 20):
+        packets, traffic = build_file_matrix(path, RESOLVER, 3, chunk_size=chunk_size)
+        packets, traffic = packets.reshape(3, 3), traffic.reshape(3, 3)
+        assert packets.tolist() == [[0, 6, 0], [0, 0, 3], [0, 0, 0]]
+        assert traffic.tolist() == [[0, 450, 0], [0, 0, 0], [0, 0, 0]]
+
+def test_empty_file(tmp_path):
+    packets, traffic = build_file_matrix(write(tmp_path, "empty.log", []), RESOLVER, 3)
+    assert not packets.any() and not traffic.any()
+
+def test_matrix_merges_files(tmp_path):
+    files = [write(tmp_path, f"{i}_filtered.log",
+                   [line("2024-01-01 12:00:00", "10.0.0.1", "10.0.0.2", "TCP", 10 * (i + 1))] * (i + 1) +
+                   [line("2024-01-01 12:00:01", "10.0.0.3", "10.0.0.1", "MySQL", 5)])
+             for i in range(5)]
+    pods, packets, traffic = build_matrix(files, RESOLVER, workers=2)
+    assert pods == ["a", "b", "c"]
+    assert packets[0, 1] == 1 + 2 + 3 + 4 + 5 and packets[2, 0] == 5
+    assert traffic[0, 1] == sum(10 * (i + 1) ** 2 for i in range(5)) and traffic[2, 0] == 25
+    assert packets.sum() == 20
+
+def test_matrix_resolves_reused_ips_by_packet_time(tmp_path):
+    # 10.0.0.2 belonged to "old" until 12:00:10 UTC and to "new" after; undated lines go to its latest holder.
+    start = 1704110400.0
+    resolver = IpIntervalIndex([("a", "10.0.0.1", start - 60, None), ("old", "10.0.0.2", start - 60, start + 10),
+                                ("new", "10.0.0.2", start + 10, None)])
+    files = [write(tmp_path, "1.log", [line("2024-01-01 12:00:05", "10.0.0.1", "10.0.0.2", "TCP", 1)]),
+             write(tmp_path, "2.log", [line("2024-01-01 12:00:15", "10.0.0.1", "10.0.0.2", "TCP", 1),
+                                       line("0.5", "10.0.0.1", "10.0.0.2", "TCP", 1)])]
+    pods, packets, _ = build_matrix(files, resolver, workers=2)
+    index = {pod: i for i, pod in enumerate(pods)}
+    assert packets[index["a"], index["old"]] == 1
+    assert packets[index["a"], index["new"]] == 2
+
+def test_no_files_or_pods():
+    pods, packets, traffic = build_matrix([], RESOLVER)
+    assert packets.shape == (3, 3) and not packets.any()
+    pods, packets, _ = build_matrix(["unused.log"], StaticIpResolver({}))
+    assert pods == [] and packets.shape == (0, 0)
@@ -0,0 +1,74 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import convert_app2
+from convert_app2 import chunk_ranges, filter_range, filter_files
+
+LINES = [b"10:00:00 IP 10.0.0.1.80 > 10.0.0.2.5000: HTTP/1.1 200 OK\n",
+         b"10:00:01 IP 10.0.0.2.5000 > 10.0.0.1.80: GET /tools.descartes.teastore.webui/ HTTP/1.1\n",
+         b"10:00:02 IP 10.0.0.3.3306 > 10.0.0.1.4000: mysql handshake\n",
+         b"\n",
+         b"10:00:03 IP 10.0.0.1.80 > 10.0.0.2.5001: http/1.1 200 ok, lower case\n",
+         b"10:00:04 IP 10.0.0.4.53 > 10.0.0.1.5353: dns\n"]
+
+def naive_filter(data, criteria):
+    return b"".join(line for line in data.splitlines(keepends=True)
+                    if any(criterion.lower().encode() in line.lower() for criterion in criteria))
+
+def write(tmp_path, data, name="dump.log"):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+def chunked_filter(path, chunk_size, criteria):
+    return b"".join(filter_range(path, start, end, criteria) for start, end in chunk_ranges(path, chunk_size))
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 100, 4096])
+@pytest.mark.parametrize("final_newline", [True, False])
+def test_chunks_match_naive_filter(tmp_path, chunk_size, final_newline):
+    data = b"".join(LINES * 20)
+    if not final_newline:
+        data += b"10:00:05 IP 10.0.0.1.80 > 10.0.0.2.5002: HTTP/1.1 200 OK, no newline"
+    path = write(tmp_path, data)
+    ranges = chunk_ranges(path, chunk_size)
+    # Contiguous, covering the file, and cut only after a newline.
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+    assert all(end == next_start for (_, end), (next_start, _) in zip(ranges, ranges[1:]))
+    assert all(data[end - 1:end] == b"\n" for _, end in ranges[:-1])
+    assert chunked_filter(path, chunk_size, convert_app2.criteria) == naive_filter(data, convert_app2.criteria)
+
+def test_match_straddling_a_chunk_boundary(tmp_path):
+    line = b"x" * 20 + b" HTTP/1.1 200 OK\n"
+    data = b"short\n" + line + b"tail\n"
+    path = write(tmp_path, data)
+    # The nominal boundary at 30 falls inside "HTTP/1.1 200"; the range is stretched to the newline.
+    assert chunk_ranges(path, 30) == [(0, len(b"short\n") + len(line)), (len(b"short\n") + len(line), len(data))]
+    assert chunked_filter(path, 30, ["HTTP/1.1 200"]) == line
+
+def test_configurable_criteria(tmp_path):
+    data = b"".join(LINES)
+    path = write(tmp_path, data)
+    for criteria in (["GET /tools"], ["mysql", "DNS"], ["no such thing"]):
+        assert chunked_filter(path, 64, criteria) == naive_filter(data, criteria)
+    # A line matching several criteria is kept once.
+    assert chunked_filter(path, 64, ["HTTP/1.1", "200"]) == naive_filter(data, ["HTTP/1.1", "200"])
+
+def test_empty_file(tmp_path):
+    assert chunk_ranges(write(tmp_path, b""), 10) == []
+
+def test_filter_files_writes_each_file_in_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(convert_app2, "output_directory", str(tmp_path / "app_log"))
+    os.makedirs(convert_app2.output_directory)
+    contents = [b"".join(LINES * 10), b"", b"".join(reversed(LINES)) * 3]
+    files = [write(tmp_path, data, f"dump{i}.log") for i, data in enumerate(contents)]
+    missing = str(tmp_path / "missing.log")
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        results = list(filter_files(executor, files + [missing], ["HTTP/1.1 200", "MYSQL"], window=2, chunk_size=50))
+
+    assert [file for file, _, _, _ in results] == files + [missing]
+    for (file, _, output_path, error), data in zip(results, contents):
+        assert error is None
+        with open(output_path, 'rb') as f:
+            assert f.read() == naive_filter(data, ["HTTP/1.1 200", "MYSQL"])
+    assert isinstance(results[-1][3], OSError)
+    assert not os.path.exists(results[-1][2]) and not os.path.exists(results[-1][2] + ".tmp")
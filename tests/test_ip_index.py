@@ -0,0 +1,44 @@
+import json
+import numpy as np
+from ip_index import IpIntervalIndex, StaticIpResolver
+
+def times(*seconds):
+    return np.array([np.datetime64(int(s * 1e6), "us") if s is not None else np.datetime64("NaT")
+                     for s in seconds], dtype="datetime64[us]")
+
+def resolved(index, ips, seconds):
+    result = index.resolve([ip.encode() for ip in ips], times(*seconds))
+    return [index.pods[i] if i >= 0 else None for i in result.tolist()]
+
+def test_reused_ip_resolves_by_packet_time():
+    index = IpIntervalIndex([("old", "10.0.0.1", 100.0, 200.0), ("new", "10.0.0.1", 200.0, None),
+                             ("other", "10.0.0.2", 150.0, 170.0)])
+    assert resolved(index, ["10.0.0.1"] * 5, [50, 100, 199.999999, 200, 10**6]) == [
+        None, "old", "old", "new", "new"]
+    assert resolved(index, ["10.0.0.2"] * 4, [149, 150, 169, 170]) == [None, "other", "other", None]
+
+def test_unknown_ip_and_missing_time():
+    index = IpIntervalIndex([("old", "10.0.0.1", 100.0, 200.0), ("new", "10.0.0.1", 300.0, None)])
+    # NaT resolves to the IP's latest holder; a gap between holders resolves to nobody.
+    assert resolved(index, ["10.0.0.9", "10.0.0.1", "10.0.0.1"], [150, None, 250]) == [None, "new", None]
+
+def test_adjacent_ip_blocks_do_not_leak():
+    # A packet far outside the recorded span must not land in the neighbouring IP's intervals.
+    index = IpIntervalIndex([("a", "10.0.0.1", 100.0, None), ("b", "10.0.0.2", 100.0, None)])
+    assert resolved(index, ["10.0.0.1", "10.0.0.2", "10.0.0.2"], [10**9, 10**9, 0]) == ["a", "b", None]
+
+def test_empty_index():
+    index = IpIntervalIndex([])
+    assert resolved(index, ["10.0.0.1"], [1]) == [None]
+
+def test_from_file_takes_closing_lines(tmp_path):
+    path = tmp_path / "pod_ip_lifetimes.jsonl"
+    lines = [{"pod": "a", "ip": "10.0.0.1", "start": 100.0}, {"pod": "a", "ip": "10.0.0.1", "start": 100.0, "end": 200.0},
+             {"pod": "b", "ip": "10.0.0.1", "start": 200.0}]
+    path.write_text("".join(json.dumps(line) + "\n" for line in lines))
+    index = IpIntervalIndex.from_file(str(path))
+    assert resolved(index, ["10.0.0.1"] * 2, [150, 250]) == ["a", "b"]
+
+def test_static_resolver_ignores_time():
+    resolver = StaticIpResolver({"10.0.0.1": "a", "10.0.0.2": "b"})
+    assert resolver.resolve([b"10.0.0.2", b"10.0.0.3"]).tolist() == [resolver.pods.index("b"), -1]
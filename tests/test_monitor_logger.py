@@ -0,0 +1,86 @@
+import threading
+import time
+import pytest
+from cluster_scan import MonitorLogger
+from scan_metrics import DROPPED_SAMPLES
+
+def stall_writer(logger):
+    # Holds the writer thread inside its first write until release is set.
+    entered, release = threading.Event(), threading.Event()
+    write = logger.write
+
+    def stalled_write(pod_name, messages):
+        entered.set()
+        release.wait()
+        write(pod_name, messages)
+
+    logger.write = stalled_write
+    return entered, release
+
+def stored_seconds(logger, pod_name="a"):
+    return [t // 10**9 for t in logger.stored_timestamps_ns(pod_name).tolist()]
+
+def test_drop_is_the_default_and_counts_what_it_drops(tmp_path):
+    logger = MonitorLogger(str(tmp_path), backend="columnar", buffer_size=1, queue_size=2, flush_interval=0)
+    assert logger.backpressure == "drop"
+    dropped_before = DROPPED_SAMPLES.labels(str(tmp_path))._value.get()
+    entered, release = stall_writer(logger)
+    logger.log(100, "a", "node-a", 1.0)
+    assert entered.wait(5)
+    # The writer is stuck on 100; 101 and 102 fill the queue and 103 and 104 are dropped.
+    start = time.monotonic()
+    for second in range(101, 105):
+        logger.log(second, "a", "node-a", 1.0)
+    assert time.monotonic() - start < 1
+    assert logger.dropped_samples == 2
+    assert DROPPED_SAMPLES.labels(str(tmp_path))._value.get() - dropped_before == 2
+    release.set()
+    logger.close_all()
+    assert stored_seconds(logger) == [100, 101, 102]
+
+def test_block_stalls_the_caller_and_loses_nothing(tmp_path):
+    logger = MonitorLogger(str(tmp_path), backend="columnar", buffer_size=1, queue_size=2, flush_interval=0,
+                           backpressure="block")
+    entered, release = stall_writer(logger)
+    logger.log(100, "a", "node-a", 1.0)
+    assert entered.wait(5)
+    logger.log(101, "a", "node-a", 1.0)
+    logger.log(102, "a", "node-a", 1.0)
+    blocked = threading.Thread(target=logger.log, args=(103, "a", "node-a", 1.0))
+    blocked.start()
+    blocked.join(0.2)
+    assert blocked.is_alive()
+    release.set()
+    blocked.join(5)
+    logger.close_all()
+    assert logger.dropped_samples == 0
+    assert stored_seconds(logger) == [100, 101, 102, 103]
+
+@pytest.mark.parametrize("backend", ["columnar", "json"])
+def test_flush_all_drains_the_queue_and_buffers(tmp_path, backend):
+    # flush_interval is long enough that only the flush can have written anything.
+    logger = MonitorLogger(str(tmp_path), backend=backend, buffer_size=10, flush_interval=60)
+    for second in range(100, 125):
+        logger.log(second, "a", "node-a", 1.0)
+        logger.log(second, "b", "node-b", 2.0)
+    logger.flush_all()
+    assert stored_seconds(logger, "a") == list(range(100, 125))
+    assert stored_seconds(logger, "b") == list(range(100, 125))
+    logger.close_all()
+
+def test_close_all_loses_nothing_queued(tmp_path):
+    logger = MonitorLogger(str(tmp_path), backend="columnar", buffer_size=3, flush_interval=60)
+    entered, release = stall_writer(logger)
+    for second in range(100, 103):
+        logger.log(second, "a", "node-a", 1.0)
+    # Nothing was written yet at flush_interval=60, so stall the first write at close instead.
+    closing = threading.Thread(target=logger.close_all)
+    for second in range(103, 110):
+        logger.log(second, "a", "node-a", 1.0)
+    closing.start()
+    assert entered.wait(5)
+    release.set()
+    closing.join(5)
+    assert not closing.is_alive() and not logger.writer_alive()
+    assert logger.queued_samples == 0
+    assert stored_seconds(logger) == list(range(100, 110))
@@ -0,0 +1,76 @@
+import struct
+import pytest
+from pcap_reader import (PcapFormatError, PcapStreamDecoder, iter_records, LINKTYPE_ETHERNET, LINKTYPE_LINUX_SLL,
+                         LINKTYPE_LINUX_SLL2, LINKTYPE_RAW, MAGIC_NSEC, MAGIC_USEC)
+
+HTTP_200_PAYLOAD = b"HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n"
+
+def ipv4_tcp(src, dst, src_port, dst_port, payload):
+    ip_header = struct.pack(">BBHHHBBH4s4s", 0x45, 0, 40 + len(payload), 0, 0, 64, 6, 0,
+                            bytes(map(int, src.split("."))), bytes(map(int, dst.split("."))))
+    tcp_header = struct.pack(">HHIIBBHHH", src_port, dst_port, 0, 0, 5 << 4, 0x18, 65535, 0, 0)
+    return ip_header + tcp_header + payload
+
+def link_header(linktype, vlan=False):
+    if linktype == LINKTYPE_ETHERNET:
+        return bytes(12) + (b"\x81\x00\x00\x01" if vlan else b"") + b"\x08\x00"
+    if linktype == LINKTYPE_LINUX_SLL:
+        return bytes(14) + b"\x08\x00"
+    if linktype == LINKTYPE_LINUX_SLL2:
+        return b"\x08\x00" + bytes(18)
+    return b""
+
+def pcap(frames, linktype=LINKTYPE_ETHERNET, order="<", magic=MAGIC_USEC):
+    # frames: [(seconds, fraction, frame bytes)], fraction in the magic's unit.
+    data = [struct.pack(order + "IHHiIII", magic, 2, 4, 0, 0, 65535, linktype)]
+    for seconds, fraction, frame in frames:
+        data.append(struct.pack(order + "IIII", seconds, fraction, len(frame), len(frame)) + frame)
+    return b"".join(data)
+
+def sample_frames(linktype, vlan=False):
+    header = link_header(linktype, vlan)
+    return [
+        (1700000000, 250000, header + ipv4_tcp("10.0.0.1", "10.0.0.2", 8080, 41000, HTTP_200_PAYLOAD)),
+        (1700000001, 0, header + ipv4_tcp("10.0.0.2", "10.0.0.3", 41000, 3306, b"\x01\x00\x00\x00\x0e")),
+        (1700000002, 0, header + ipv4_tcp("10.0.0.3", "10.0.0.1", 41000, 8080, b"GET / HTTP/1.1\r\n\r\n")),
+    ]
+
+def write(tmp_path, data):
+    path = tmp_path / "capture.pcap"
+    path.write_bytes(data)
+    return str(path)
+
+@pytest.mark.parametrize("order", ["<", ">"])
+@pytest.mark.parametrize("linktype,vlan", [(LINKTYPE_ETHERNET, False), (LINKTYPE_ETHERNET, True),
+                                           (LINKTYPE_LINUX_SLL, False), (LINKTYPE_LINUX_SLL2, False),
+                                           (LINKTYPE_RAW, False)])
+def test_iter_records_byte_orders_and_link_types(tmp_path, order, linktype, vlan):
+    records = list(iter_records(write(tmp_path, pcap(sample_frames(linktype, vlan), linktype, order))))
+    assert [(src, dst, kind) for _, src, dst, _, kind in records] == [
+        ("10.0.0.1", "10.0.0.2", "HTTP"), ("10.0.0.2", "10.0.0.3", "MySQL")]
+    assert records[0][0] == pytest.approx(1700000000.25)
+    assert records[0][3] == len(sample_frames(linktype, vlan)[0][2])
+
+def test_all_packets_and_nanosecond_timestamps(tmp_path):
+    frames = [(seconds, fraction * 1000, frame) for seconds, fraction, frame in sample_frames(LINKTYPE_ETHERNET)]
+    records = list(iter_records(write(tmp_path, pcap(frames, magic=MAGIC_NSEC)), all_packets=True))
+    assert [kind for *_, kind in records] == ["HTTP", "MySQL", "TCP"]
+    assert records[0][0] == pytest.approx(1700000000.25)
+
+def test_unknown_link_type_and_truncated_record_are_skipped(tmp_path):
+    assert list(iter_records(write(tmp_path, pcap(sample_frames(LINKTYPE_ETHERNET), linktype=9999)))) == []
+    data = pcap(sample_frames(LINKTYPE_ETHERNET))
+    assert len(list(iter_records(write(tmp_path, data[:-10])))) == 2
+
+def test_pcapng_is_rejected(tmp_path):
+    with pytest.raises(PcapFormatError):
+        list(iter_records(write(tmp_path, b"\x0a\x0d\x0d\x0a" + bytes(40))))
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 4096])
+def test_stream_decoder_matches_file_reader(tmp_path, chunk_size):
+    data = pcap(sample_frames(LINKTYPE_LINUX_SLL), LINKTYPE_LINUX_SLL, ">")
+    decoder = PcapStreamDecoder()
+    streamed = []
+    for start in range(0, len(data), chunk_size):
+        streamed.extend(decoder.feed(data[start:start + chunk_size]))
+    assert streamed == list(iter_records(write(tmp_path, data)))
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+from placement import (CommunicationGraph, initial_partition, partition, partition_placement,
+                       resource_placement)
+
+def clique_frame(groups, weight=10, noise=1):
+    # Pods in the same group talk heavily, every other pair lightly.
+    pods = [f"{group}-{i}" for group, size in groups for i in range(size)]
+    group_of = {pod: pod.rsplit("-", 1)[0] for pod in pods}
+    matrix = [[0 if a == b else (weight if group_of[a] == group_of[b] else noise) for b in pods] for a in pods]
+    return pd.DataFrame(matrix, index=pods, columns=pods)
+
+def test_partition_keeps_cliques_together():
+    df = clique_frame([("a", 4), ("b", 4), ("c", 4)])
+    placement, cross_node, overloaded = partition_placement(df, ["n1", "n2", "n3"], imbalance=0)
+    assert overloaded == {}
+    assert sorted(sorted(pods) for pods in placement.values()) == [
+        [f"{group}-{i}" for i in range(4)] for group in "abc"]
+    # 48 cross-group pairs, each with noise traffic both ways.
+    assert cross_node == 48 * 2
+
+def test_partition_respects_capacity():
+    df = clique_frame([("a", 6), ("b", 2)])
+    graph = CommunicationGraph.from_frame(df)
+    capacity = np.array([[4.0], [4.0]])
+    part = partition(graph, capacity)
+    assert np.bincount(part, minlength=2).tolist() == [4, 4]
+
+def test_initial_partition_overflow_goes_to_least_loaded_node():
+    # Three pods of weight 2 on nodes of capacity 2 and 3: the third fits nowhere and must land
+    # on the node it overloads least (relative to capacity), not on an arbitrary one.
+    graph = CommunicationGraph(None, [{1: 5.0}, {0: 5.0}, {}], np.array([[2.0], [2.0], [2.0]]))
+    part = initial_partition(graph, np.array([[2.0], [3.0]]))
+    load = np.bincount(part, weights=[2.0, 2.0, 2.0], minlength=2)
+    assert sorted(load.tolist()) == [2.0, 4.0]
+    assert load[1] == 4.0
+
+def test_resource_placement_reports_overload():
+    df = clique_frame([("a", 3)])
+    demands = {pod: (1, 3 * 2**30) for pod in df.index}
+    capacities = {"n1": (110, 4 * 2**30), "n2": (110, 4 * 2**30)}
+    placement, _, overloaded = resource_placement(df, capacities, demands)
+    assert sum(len(pods) for pods in placement.values()) == 3
+    assert len(overloaded) == 1
+    node, excess = next(iter(overloaded.items()))
+    assert excess[0] == 0 and excess[1] == 2 * 2**30
+
+def test_resource_placement_fits_without_overload():
+    df = clique_frame([("a", 2), ("b", 2)])
+    demands = {pod: (1, 2**30) for pod in df.index}
+    capacities = {"n1": (110, 2 * 2**30), "n2": (110, 2 * 2**30)}
+    placement, cross_node, overloaded = resource_placement(df, capacities, demands)
+    assert overloaded == {}
+    assert sorted(sorted(pods) for pods in placement.values()) == [["a-0", "a-1"], ["b-0", "b-1"]]
+    assert cross_node == 4 * 2
@@ -0,0 +1,67 @@
+import itertools
+import numpy as np
+import pandas as pd
+import pytest
+from placement_sim import PlacementSimulator, PlacementState
+
+PODS = ["a", "b", "c", "d", "e"]
+
+def frames(seed=0):
+    rng = np.random.default_rng(seed)
+    packets = rng.integers(0, 5, (len(PODS), len(PODS))).astype(float)
+    np.fill_diagonal(packets, 0)
+    return pd.DataFrame(packets, index=PODS, columns=PODS), pd.DataFrame(packets * 100, index=PODS, columns=PODS)
+
+def rescored(simulator, state):
+    return simulator.cross_node(simulator.assign(state.placement())[1])
+
+def assert_totals(simulator, state):
+    expected = rescored(simulator, state)
+    for metric, value in expected.items():
+        assert state.totals[metric] == pytest.approx(value)
+
+def test_score_counts_both_directions_and_unplaced():
+    packets, traffic = frames()
+    simulator = PlacementSimulator(packets, traffic)
+    score = simulator.score({"n1": ["a", "b"], "n2": ["c", "d"]})
+    both_ways = packets + packets.T
+    cross = sum(both_ways.at[u, v] for u in ["a", "b"] for v in ["c", "d"])
+    assert score["packets"] == cross
+    assert score["bytes"] == cross * 100
+    assert score["unplaced"] == 1
+    assert score["total_packets"] == sum(both_ways.at[u, v] for u, v in itertools.combinations("abcd", 2))
+
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_deltas_match_rescoring(seed):
+    # Random moves (to existing nodes, a new node and back) and swaps, including with pods that are
+    # still unplaced, must keep the running totals equal to a full rescore.
+    packets, traffic = frames(seed)
+    simulator = PlacementSimulator(packets, traffic)
+    state = PlacementState(simulator, {"n1": ["a", "b"], "n2": ["c"]})
+    rng = np.random.default_rng(seed)
+    for _ in range(50):
+        if rng.random() < 0.5:
+            state.move(PODS[rng.integers(len(PODS))], ["n1", "n2", "n3"][rng.integers(3)])
+        else:
+            pod_a, pod_b = rng.choice(PODS, 2, replace=False)
+            state.swap(pod_a, pod_b)
+        assert_totals(simulator, state)
+
+def test_deltas_do_not_change_the_state():
+    packets, traffic = frames()
+    simulator = PlacementSimulator(packets, traffic)
+    state = PlacementState(simulator, {"n1": ["a", "b"], "n2": ["c", "d", "e"]})
+    before = dict(state.totals), state.part.copy()
+    delta = state.swap_delta("a", "c")
+    assert (dict(state.totals), state.part.tolist()) == (before[0], before[1].tolist())
+    state.swap("a", "c")
+    for metric, value in delta.items():
+        assert state.totals[metric] == pytest.approx(before[0][metric] + value)
+
+def test_random_placement_keeps_node_sizes():
+    packets, _ = frames()
+    simulator = PlacementSimulator(packets)
+    reference = {"n1": ["a", "b"], "n2": ["c", "d", "e"]}
+    shuffled = simulator.random_placement(reference, np.random.default_rng(1))
+    assert {node: len(pods) for node, pods in shuffled.items()} == {"n1": 2, "n2": 3}
+    assert sorted(pod for pods in shuffled.values() for pod in pods) == PODS
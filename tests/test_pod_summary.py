@@ -0,0 +1,69 @@
+import json
+import numpy as np
+from cluster_scan import MonitorLogger
+from pod_summary import iter_pod_logs, load_summary, summary_path, pod_log_files
+
+def write_json_log(path, seconds, node_name="node-a"):
+    with open(path, 'w') as f:
+        for second in seconds:
+            f.write(json.dumps({"timestamp": f"1970-01-01 00:{second // 60:02d}:{second % 60:02d}.000000",
+                                "pod_name": "a", "node_name": node_name, "memory_usage": float(second)}) + "\n")
+
+def test_json_history_and_store_are_read_together(tmp_path):
+    # cl_a.log predates the store; 105-109 are in both.
+    write_json_log(tmp_path / "cl_a.log.1", range(90, 100))
+    write_json_log(tmp_path / "cl_a.log", range(100, 110))
+    logger = MonitorLogger(str(tmp_path), backend="columnar", background=False, summaries=False)
+    for second in range(105, 120):
+        logger.log(second, "a", "node-b", float(second) + (0.5 if second < 110 else 0))
+    logger.close_all()
+
+    pod_logs, = iter_pod_logs(str(tmp_path))
+    timestamps, memory = pod_logs.read_series()
+    assert (timestamps // 10**9).tolist() == list(range(90, 120))
+    # The store's sample wins where both have one.
+    assert memory.tolist() == [float(s) for s in range(90, 105)] + [s + 0.5 for s in range(105, 110)] + \
+        [float(s) for s in range(110, 120)]
+    assert pod_logs.last_node() == "node-b"
+
+def test_read_memory_on_a_grid_weights_by_time(tmp_path):
+    # Dense samples while busy (high), then one sample held for 90 s (low).
+    logger = MonitorLogger(str(tmp_path), backend="columnar", background=False, summaries=False)
+    for second in range(100, 110):
+        logger.log(second, "a", "node-a", 1000.0)
+    logger.log(110, "a", "node-a", 10.0)
+    logger.log(200, "a", "node-a", 10.0)
+    logger.close_all()
+    pod_logs, = iter_pod_logs(str(tmp_path))
+    assert np.percentile(pod_logs.read_memory(), 50) == 1000.0
+    assert np.percentile(pod_logs.read_memory(step_ns=10**9), 50) == 10.0
+
+def test_last_node_prefers_the_newer_source(tmp_path):
+    logger = MonitorLogger(str(tmp_path), backend="columnar", background=False, summaries=False)
+    logger.log(100, "a", "node-store", 1.0)
+    logger.close_all()
+    write_json_log(tmp_path / "cl_a.log", [200], node_name="node-json")
+    assert pod_log_files(str(tmp_path), "a").last_node() == "node-json"
+
+def test_new_sidecar_starts_from_existing_history(tmp_path):
+    write_json_log(tmp_path / "cl_a.log.1", range(90, 100))
+    write_json_log(tmp_path / "cl_a.log", range(100, 110))
+    logger = MonitorLogger(str(tmp_path), backend="columnar", background=False)
+    for second in range(110, 115):
+        logger.log(second, "a", "node-b", float(second))
+    logger.close_all()
+    summary = load_summary(summary_path(str(tmp_path), "a"))
+    assert (summary.count, summary.min, summary.max, summary.node_name) == (25, 90.0, 114.0, "node-b")
+    assert summary.first_ns == 90 * 10**9
+
+def test_pod_log_files_matches_directory_listing(tmp_path):
+    write_json_log(tmp_path / "cl_a.log", range(100, 102))
+    write_json_log(tmp_path / "cl_a.log.1", range(90, 92))
+    write_json_log(tmp_path / "cl_a.log.2", range(80, 82))
+    logger = MonitorLogger(str(tmp_path), backend="columnar", background=False)
+    logger.log(110, "a", "node-a", 1.0)
+    logger.close_all()
+    listed, = iter_pod_logs(str(tmp_path))
+    found = pod_log_files(str(tmp_path), "a")
+    assert (found.summary_file, found.store_file, found.json_files) == \
+        (listed.summary_file, listed.store_file, listed.json_files)
@@ -0,0 +1,78 @@
+import re
+import cluster_scan
+from cluster_scan import get_pods_metrics, get_pods_metrics_range
+from fake_prometheus import FakePrometheus, MATCHER_PATTERN
+from synthetic import SyntheticCluster
+
+class CannedResponse:
+    def __init__(self, result):
+        self.result = result
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"status": "success", "data": {"resultType": "vector", "result": self.result}}
+
+class RecordingSession:
+    # Stands in for prometheus_session: records each query and answers with canned series.
+    def __init__(self, result=None, error=None):
+        self.result = result or []
+        self.error = error
+        self.queries = []
+
+    def post(self, url, data=None, timeout=None):
+        self.queries.append(data["query"])
+        if self.error is not None:
+            raise self.error
+        return CannedResponse(self.result)
+
+def series(pod, node, value):
+    return {"metric": {"pod": pod, "node": node}, "value": [1704110400.0, str(value)]}
+
+def pod_matcher(query):
+    # The pod=~ value as Prometheus reads it: the string literal unescaped, then compiled.
+    value = dict((label, value) for label, _, value in MATCHER_PATTERN.findall(query))["pod"]
+    return re.compile(re.sub(r'\\(.)', r'\1', value))
+
+def test_pod_names_are_matched_literally(monkeypatch):
+    session = RecordingSession()
+    monkeypatch.setattr(cluster_scan, "prometheus_session", session)
+    get_pods_metrics("teastore", ["web.1", "db-0"])
+    matcher = pod_matcher(session.queries[0])
+    assert matcher.fullmatch("web.1") and matcher.fullmatch("db-0")
+    assert not matcher.fullmatch("webx1")
+
+def test_response_is_summed_per_pod_and_filtered(monkeypatch, capsys):
+    session = RecordingSession([series("a", "node-1", 100), series("a", "node-1", 50),
+                                series("b", "node-2", 7), series("other", "node-1", 1),
+                                {"metric": {"node": "node-1"}, "value": [0, "3"]}])
+    monkeypatch.setattr(cluster_scan, "prometheus_session", session)
+    assert get_pods_metrics("teastore", ["a", "b"]) == {"a": (150.0, "node-1"), "b": (7.0, "node-2")}
+    assert "Error" not in capsys.readouterr().out
+
+def test_missing_pods_are_reported_and_left_out(monkeypatch, capsys):
+    monkeypatch.setattr(cluster_scan, "prometheus_session", RecordingSession([series("a", "node-1", 100)]))
+    assert get_pods_metrics("teastore", ["a", "b", "c"]) == {"a": (100.0, "node-1")}
+    assert "2 pod(s)" in capsys.readouterr().out
+
+def test_failed_query_returns_nothing(monkeypatch, capsys):
+    monkeypatch.setattr(cluster_scan, "prometheus_session", RecordingSession(error=OSError("connection refused")))
+    assert get_pods_metrics("teastore", ["a"]) == {}
+    assert "connection refused" in capsys.readouterr().out
+    assert get_pods_metrics("teastore", []) == {}
+
+def test_against_fake_prometheus(monkeypatch):
+    cluster = SyntheticCluster(5, seed=2)
+    prometheus = FakePrometheus(cluster).start()
+    monkeypatch.setattr(cluster_scan, "prometheus_url", prometheus.url)
+    try:
+        sample_time = cluster.start_time + 60
+        metrics = get_pods_metrics(cluster.namespace, cluster.pods[:3], sample_time=sample_time)
+        assert metrics == {pod: (cluster.memory(i, sample_time), cluster.pod_nodes[i])
+                           for i, pod in enumerate(cluster.pods[:3])}
+        # A user regex for backfill goes through the string escaping too.
+        series_by_pod = get_pods_metrics_range(cluster.namespace, r"\w+-svc0-.*", sample_time, sample_time + 2, 1)
+        assert series_by_pod and sorted(series_by_pod) == sorted(pod for pod in cluster.pods if "-svc0-" in pod)
+    finally:
+        prometheus.stop()
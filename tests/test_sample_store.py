@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+from sample_store import (SampleStoreReader, SampleStoreWriter, decode_delta_xor, encode_delta_xor, read_pod_grid,
+                          read_pod_series, TRAILER)
+
+SECOND = 10**9
+
+def series(count, start=1_700_000_000 * SECOND, step=SECOND):
+    return start + np.arange(count, dtype=np.int64) * step
+
+@pytest.mark.parametrize("memory", [
+    np.array([1.5e8, 1.5e8, 1.6e8, 1.4e8, 2.0e8]),
+    np.full(5, 123456789.0),
+    np.array([-1.0, -2.5, 0.0, -0.0, 3.25]),
+    np.array([np.nan, 1.0, np.nan, np.inf, -np.inf]),
+    np.array([7.0]),
+])
+def test_delta_xor_round_trip(memory):
+    timestamps = series(len(memory))
+    decoded_timestamps, decoded_memory = decode_delta_xor(encode_delta_xor(timestamps, memory), len(memory))
+    np.testing.assert_array_equal(decoded_timestamps, timestamps)
+    # Bit-for-bit, so NaN payloads and the sign of zero survive too.
+    np.testing.assert_array_equal(decoded_memory.view(np.uint64), memory.view(np.uint64))
+
+def test_delta_xor_irregular_and_decreasing_timestamps():
+    timestamps = np.array([5 * SECOND, 6 * SECOND, 6 * SECOND, 3 * SECOND, 10**18, -SECOND], dtype=np.int64)
+    memory = np.arange(len(timestamps), dtype=np.float64)
+    decoded_timestamps, _ = decode_delta_xor(encode_delta_xor(timestamps, memory), len(timestamps))
+    np.testing.assert_array_equal(decoded_timestamps, timestamps)
+
+@pytest.mark.parametrize("compress", [True, False])
+@pytest.mark.parametrize("delta_xor", [True, False])
+def test_store_round_trip(tmp_path, compress, delta_xor):
+    path = str(tmp_path / "cl_pod.cls")
+    timestamps = series(30)
+    memory = np.concatenate([np.full(10, 2.0e8), -np.arange(10, dtype=np.float64), [np.nan] * 10])
+    writer = SampleStoreWriter(path, "pod", compress=compress, delta_xor=delta_xor)
+    writer.append(timestamps[:10], memory[:10], "worker1")
+    writer.append(timestamps[10:], memory[10:], "worker2")
+    writer.close()
+
+    reader = SampleStoreReader(path)
+    try:
+        assert reader.pod_name == "pod"
+        assert reader.node_names() == ["worker1", "worker2"]
+        assert reader.time_range() == (timestamps[0], timestamps[-1])
+    finally:
+        reader.close()
+    read_timestamps, read_memory = read_pod_series(path)
+    np.testing.assert_array_equal(read_timestamps, timestamps)
+    np.testing.assert_array_equal(read_memory, memory)
+    window_timestamps, _ = read_pod_series(path, timestamps[5], timestamps[15])
+    np.testing.assert_array_equal(window_timestamps, timestamps[5:15])
+
+def test_store_reopen_mixes_layouts(tmp_path):
+    path = str(tmp_path / "cl_pod.cls")
+    writer = SampleStoreWriter(path, "pod", delta_xor=False)
+    writer.append(series(3), [1.0, 2.0, 3.0])
+    writer.close()
+    writer = SampleStoreWriter(path, "pod", delta_xor=True)
+    writer.append(series(3, start=series(4)[-1]), [4.0, 5.0, 6.0])
+    writer.close()
+    _, memory = read_pod_series(path)
+    np.testing.assert_array_equal(memory, [1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+
+def test_store_without_footer_is_readable(tmp_path):
+    path = str(tmp_path / "cl_pod.cls")
+    writer = SampleStoreWriter(path, "pod")
+    writer.append(series(4), [1.0, 2.0, 3.0, 4.0])
+    writer.close()
+    # As if the scanner had been killed before rewriting the footer.
+    with open(path, "r+b") as f:
+        f.truncate(f.seek(0, 2) - TRAILER.size - 1)
+    timestamps, memory = read_pod_series(path)
+    np.testing.assert_array_equal(timestamps, series(4))
+    np.testing.assert_array_equal(memory, [1.0, 2.0, 3.0, 4.0])
+
+def test_read_grid_carries_samples_forward(tmp_path):
+    path = str(tmp_path / "cl_pod.cls")
+    start = series(1)[0]
+    writer = SampleStoreWriter(path, "pod")
+    writer.append([start, start + 4 * SECOND, start + 5 * SECOND], [1.0, 2.0, 3.0])
+    writer.close()
+    grid, values = read_pod_grid(path, SECOND, start - SECOND, start + 9 * SECOND, max_gap_ns=2 * SECOND)
+    np.testing.assert_array_equal(grid, start + np.arange(-1, 9) * SECOND)
+    np.testing.assert_array_equal(values, [np.nan, 1.0, 1.0, 1.0, np.nan, 2.0, 3.0, 3.0, 3.0, np.nan])
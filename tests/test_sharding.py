@@ -0,0 +1,146 @@
+import json
+import os
+from cluster_scan import MonitorLogger
+from ip_lifetimes import IpLifetimeRecorder, load_ip_lifetimes
+from pod_inventory import PodInfo
+from pod_summary import iter_pod_logs, load_summary, summary_path
+from sample_store import read_pod_series
+from sharding import HashRing, ShardedInventory, merge_shards, namespace_directory
+
+KEYS = [f"pod-{i}" for i in range(4000)]
+
+def owners(ring):
+    return {key: ring.owner(key) for key in KEYS}
+
+def test_member_joining_takes_only_its_share():
+    before = owners(HashRing(["shard-0", "shard-1", "shard-2", "shard-3"]))
+    after = owners(HashRing(["shard-0", "shard-1", "shard-2", "shard-3", "shard-4"]))
+    moved = [key for key in KEYS if before[key] != after[key]]
+    assert all(after[key] == "shard-4" for key in moved)
+    assert 0.1 < len(moved) / len(KEYS) < 0.3
+
+def test_member_leaving_hands_over_only_its_keys():
+    before = owners(HashRing(["shard-0", "shard-1", "shard-2", "shard-3"]))
+    after = owners(HashRing(["shard-0", "shard-1", "shard-3"]))
+    for key in KEYS:
+        if before[key] != "shard-2":
+            assert after[key] == before[key]
+        else:
+            assert after[key] in ("shard-0", "shard-1", "shard-3")
+
+def test_empty_ring_has_no_owner():
+    assert HashRing().owner("pod-0") is None
+
+def write_samples(directory, pod_name, seconds, node_name="node-a"):
+    logger = MonitorLogger(str(directory), backend="columnar", background=False)
+    for second in seconds:
+        logger.log(second, pod_name, node_name, float(second * 10))
+    logger.close_all()
+
+def write_lifetimes(directory, entries):
+    with open(os.path.join(directory, "pod_ip_lifetimes.0.jsonl"), 'w') as f:
+        f.writelines(json.dumps(entry) + "\n" for entry in entries)
+
+def stored_seconds(directory, pod_name):
+    timestamps, memory = read_pod_series(os.path.join(directory, f"cl_{pod_name}.cls"))
+    assert memory.tolist() == [t / 1e8 for t in timestamps.tolist()]
+    return [t // 10**9 for t in timestamps.tolist()]
+
+def test_merge_keeps_existing_outputs_and_skips_stored_timestamps(tmp_path):
+    output = tmp_path / "cl_log"
+    write_samples(output, "a", range(100, 110))
+    shard_0, shard_1 = tmp_path / "shard-0", tmp_path / "shard-1"
+    # "a" was handed from shard-0 to shard-1 around 115; both overlap what is already stored.
+    write_samples(shard_0, "a", range(105, 116))
+    write_samples(shard_1, "a", range(115, 120), node_name="node-b")
+    write_samples(shard_1, "b", range(100, 103))
+    entry = {"pod": "a", "ip": "10.0.0.1", "start": 100.0}
+    write_lifetimes(shard_0, [entry])
+    write_lifetimes(shard_1, [entry, {"pod": "b", "ip": "10.0.0.2", "start": 100.0}])
+
+    merge_shards([str(shard_0), str(shard_1), str(tmp_path / "shard-2")], str(output))
+
+    assert stored_seconds(output, "a") == list(range(100, 120))
+    assert stored_seconds(output, "b") == [100, 101, 102]
+    summary = load_summary(summary_path(str(output), "a"))
+    assert (summary.count, summary.min, summary.max, summary.node_name) == (20, 1000, 1190, "node-b")
+    with open(output / "pod_ip_lifetimes.jsonl") as f:
+        assert len(f.readlines()) == 2
+    assert not shard_0.exists() and not shard_1.exists()
+
+def test_merging_again_adds_nothing(tmp_path):
+    output = tmp_path / "cl_log"
+    write_samples(tmp_path / "shard-0", "a", range(100, 110))
+    merge_shards([str(tmp_path / "shard-0")], str(output))
+    # The same shard again, as after a merge that was interrupted before removing it.
+    write_samples(tmp_path / "shard-0", "a", range(100, 110))
+    merge_shards([str(tmp_path / "shard-0")], str(output))
+    assert stored_seconds(output, "a") == list(range(100, 110))
+    assert load_summary(summary_path(str(output), "a")).count == 10
+    assert [pod_logs.pod_name for pod_logs in iter_pod_logs(str(output))] == ["a"]
+
+def test_merge_summarizes_existing_samples_without_a_sidecar(tmp_path):
+    output = tmp_path / "cl_log"
+    output.mkdir()
+    with open(output / "cl_a.log", 'w') as f:
+        f.write(json.dumps({"timestamp": "1970-01-01 00:01:40.000000", "pod_name": "a", "node_name": "node-a",
+                            "memory_usage": 1000.0}) + "\n")
+    write_samples(tmp_path / "shard-0", "a", range(100, 103))
+    merge_shards([str(tmp_path / "shard-0")], str(output))
+    assert stored_seconds(output, "a") == [101, 102]
+    assert load_summary(summary_path(str(output), "a")).count == 3
+
+def test_same_pod_name_in_two_namespaces_stays_apart(tmp_path):
+    output = tmp_path / "cl_log"
+    shard = tmp_path / "shard-0"
+    namespaces = ["teastore", "sockshop"]
+    write_samples(namespace_directory(str(shard), "teastore", namespaces), "db-0", range(100, 103))
+    write_samples(namespace_directory(str(shard), "sockshop", namespaces), "db-0", range(100, 105))
+    merge_shards([str(shard)], str(output), namespaces)
+    assert stored_seconds(output / "teastore", "db-0") == [100, 101, 102]
+    assert stored_seconds(output / "sockshop", "db-0") == [100, 101, 102, 103, 104]
+    assert not shard.exists()
+
+def test_single_namespace_keeps_flat_layout():
+    assert namespace_directory("cl_log", "teastore", ["teastore", "teastore"]) == "cl_log"
+
+class StaticInventory:
+    # The parts of PodInventory a ShardedInventory uses; events are fed in by the test.
+    def __init__(self, pods):
+        self.v1 = None
+        self.namespace = "teastore"
+        self.pods = {info.name: info for info in pods}
+
+    def subscribe(self, callback):
+        pass
+
+    def snapshot(self):
+        return dict(self.pods)
+
+    def get(self, pod_name):
+        return self.pods.get(pod_name)
+
+def test_handoff_keeps_the_ip_lifetime_open(tmp_path):
+    info = PodInfo("a", "node-a", "10.0.0.1", "Running", True, start_time=100.0, uid="uid-a", namespace="teastore")
+    inventory = StaticInventory([info])
+    ring = HashRing(["shard-0", "shard-1"])
+    old_owner = ring.owner(info.uid)
+    new_owner = "shard-1" if old_owner == "shard-0" else "shard-0"
+    views, recorders = [], []
+    for shard in ("shard-0", "shard-1"):
+        view = ShardedInventory(inventory, ring, shard)
+        recorder = IpLifetimeRecorder(str(tmp_path / shard / "pod_ip_lifetimes.0.jsonl"))
+        view.subscribe(recorder.handle_pod_event)
+        for event in ("added", "ip", "ready"):
+            view.handle_pod_event(event, info)
+        views.append(view)
+        recorders.append(recorder)
+
+    ring.set_members([new_owner])
+    for view in views:
+        view.rebalance()
+    for recorder in recorders:
+        recorder.close()
+    merge_shards([str(tmp_path / "shard-0"), str(tmp_path / "shard-1")], str(tmp_path / "cl_log"))
+
+    assert load_ip_lifetimes(str(tmp_path / "cl_log" / "pod_ip_lifetimes.jsonl")) == [("a", "10.0.0.1", 100.0, None)]